@@ -0,0 +1,29 @@
+"""Add element allocation sequences
+
+Revision ID: 4a7d2c9e1b58
+Revises: 9b4e2f7a6c13
+Create Date: 2024-08-27 09:40:17.362815+00:00
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7d2c9e1b58'
+down_revision: str | None = '9b4e2f7a6c13'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+_sequences = ('element_sequence_id_seq', 'element_node_id_seq', 'element_way_id_seq', 'element_relation_id_seq')
+
+
+def upgrade() -> None:
+    # the last allocated values, raised to the table maximum on allocation
+    for name in _sequences:
+        op.execute(f'CREATE SEQUENCE {name} AS bigint MINVALUE 0 START 0')
+
+
+def downgrade() -> None:
+    for name in _sequences:
+        op.execute(f'DROP SEQUENCE {name}')
@@ -1,4 +1,3 @@
-from collections.abc import Sequence
 from typing import Annotated, Literal
 
 import cython
@@ -6,6 +5,7 @@ from fastapi import APIRouter, Query, Response, status
 from pydantic import PositiveInt
 from sqlalchemy.orm import joinedload, raiseload
 
+from app.exceptions.api_error import APIError
 from app.format import Format06
 from app.lib.auth_context import api_user
 from app.lib.date_utils import parse_date
@@ -14,6 +14,7 @@ from app.lib.geo_utils import parse_bbox
 from app.lib.options_context import options_context
 from app.lib.xml_body import xml_body
 from app.limits import CHANGESET_QUERY_DEFAULT_LIMIT, CHANGESET_QUERY_MAX_LIMIT
+from app.middlewares.request_context_middleware import get_request
 from app.models.db.changeset import Changeset
 from app.models.db.changeset_comment import ChangesetComment
 from app.models.db.user import User
@@ -79,7 +80,7 @@ async def download_changeset(
 
     elements = await ElementQuery.get_by_changeset(changeset_id, sort_by='sequence_id')
     await UserQuery.resolve_elements_users(elements, display_name=True)
-    return Format06.encode_osmchange(elements)
+    return Format06.encode_osmchange(elements, stream=True)
 
 
 @router.put('/changeset/{changeset_id:int}')
@@ -107,12 +108,14 @@ async def update_changeset(
 @router.post('/changeset/{changeset_id:int}/upload', response_class=DiffResultResponse)
 async def upload_diff(
     changeset_id: PositiveInt,
-    data: Annotated[Sequence, xml_body('osmChange')],
     _: Annotated[User, api_user(Scope.write_api)],
 ):
     try:
-        # implicitly assume stings are proper types
-        elements = Format06.decode_osmchange(data, changeset_id=changeset_id)
+        # decode incrementally, the document tree is never built
+        xml = get_request()._body  # noqa: SLF001
+        elements = Format06.decode_osmchange_stream(xml, changeset_id=changeset_id)
+    except APIError:
+        raise
     except Exception as e:
         raise_for().bad_xml('osmChange', str(e))
 
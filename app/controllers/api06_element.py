@@ -172,7 +172,7 @@ async def get_history(type: ElementType, id: Annotated[ElementId, PositiveInt]):
     elements = await ElementQuery.get_versions_by_ref(ref, limit=None)
     if not elements:
         raise_for().element_not_found(ref)
-    return await _encode_elements(elements)
+    return await _encode_elements(elements, stream=True)
 
 
 @router.get('/{type:element_type}/{id:int}/full')
@@ -249,11 +249,11 @@ async def _encode_element(element: Element):
     return Format06.encode_element(element)
 
 
-async def _encode_elements(elements: Collection[Element]):
+async def _encode_elements(elements: Collection[Element], *, stream: bool = False):
     """
     Resolve required data fields for elements and encode them.
     """
     async with TaskGroup() as tg:
         tg.create_task(UserQuery.resolve_elements_users(elements, display_name=True))
         tg.create_task(ElementMemberQuery.resolve_members(elements))
-    return Format06.encode_elements(elements)
+    return Format06.encode_elements(elements, stream=stream)
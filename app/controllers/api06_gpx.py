@@ -1,6 +1,4 @@
-from asyncio import TaskGroup
 from collections.abc import Sequence
-from itertools import chain
 from typing import Annotated
 
 from fastapi import APIRouter, File, Form, Query, Response, UploadFile
@@ -14,15 +12,15 @@ from app.lib.exceptions_context import raise_for
 from app.lib.geo_utils import parse_bbox
 from app.lib.options_context import options_context
 from app.lib.xml_body import xml_body
-from app.limits import TRACE_POINT_QUERY_AREA_MAX_SIZE, TRACE_POINT_QUERY_DEFAULT_LIMIT
+from app.limits import TRACE_POINT_QUERY_AREA_MAX_SIZE
 from app.models.db.trace_ import Trace, TraceVisibility
-from app.models.db.trace_segment import TraceSegment
 from app.models.db.user import User
 from app.models.scope import Scope
 from app.models.types import Str255
 from app.queries.trace_query import TraceQuery
 from app.queries.trace_segment_query import TraceSegmentQuery
 from app.responses.osm_response import GPXResponse
+from app.services.trace_point_service import TracePointService
 from app.services.trace_service import TraceService
 
 router = APIRouter(prefix='/api/0.6')
@@ -135,32 +133,18 @@ async def delete_trace(
 async def trackpoints(
     bbox: Annotated[str, Query()],
     page_number: Annotated[NonNegativeInt, Query(alias='pageNumber')] = 0,
+    cursor: Annotated[str | None, Query(max_length=255)] = None,
 ):
     geometry = parse_bbox(bbox)
     if geometry.area > TRACE_POINT_QUERY_AREA_MAX_SIZE:
         raise_for().trace_points_query_area_too_big()
 
-    async def public_task():
-        with options_context(joinedload(TraceSegment.trace).load_only(Trace.name, Trace.description, Trace.visibility)):
-            return await TraceSegmentQuery.find_many_by_geometry(
-                geometry,
-                identifiable_trackable=True,
-                limit=TRACE_POINT_QUERY_DEFAULT_LIMIT,
-                legacy_offset=page_number * TRACE_POINT_QUERY_DEFAULT_LIMIT,
-            )
-
-    async def private_task():
-        return await TraceSegmentQuery.find_many_by_geometry(
-            geometry,
-            identifiable_trackable=False,
-            limit=TRACE_POINT_QUERY_DEFAULT_LIMIT,
-            legacy_offset=page_number * TRACE_POINT_QUERY_DEFAULT_LIMIT,
-        )
-
-    async with TaskGroup() as tg:
-        public_t = tg.create_task(public_task())
-        private_t = tg.create_task(private_task())
-
-    public_segments = public_t.result()
-    private_segments = private_t.result()
-    return FormatGPX.encode_track(chain(public_segments, private_segments))
+    segments, next_cursor = await TracePointService.find_many_by_geometry(
+        geometry,
+        cursor=cursor,
+        legacy_page=page_number,
+    )
+    response = GPXResponse.serialize(FormatGPX.encode_track(segments))
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
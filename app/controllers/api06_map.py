@@ -1,4 +1,3 @@
-from asyncio import TaskGroup
 from typing import Annotated
 
 from fastapi import APIRouter, Query
@@ -8,9 +7,8 @@ from app.lib.exceptions_context import raise_for
 from app.lib.geo_utils import parse_bbox
 from app.lib.xmltodict import get_xattr
 from app.limits import MAP_QUERY_AREA_MAX_SIZE, MAP_QUERY_LEGACY_NODES_LIMIT
-from app.queries.element_member_query import ElementMemberQuery
-from app.queries.element_query import ElementQuery
 from app.queries.user_query import UserQuery
+from app.services.map_tile_cache_service import MapTileCacheService
 
 router = APIRouter(prefix='/api/0.6')
 
@@ -23,15 +21,12 @@ async def get_map(bbox: Annotated[str, Query()]):
     if geometry.area > MAP_QUERY_AREA_MAX_SIZE:
         raise_for().map_query_area_too_big()
 
-    elements = await ElementQuery.find_many_by_geom(
+    elements = await MapTileCacheService.find_many_by_geom(
         geometry,
         nodes_limit=MAP_QUERY_LEGACY_NODES_LIMIT,
         legacy_nodes_limit=True,
     )
-
-    async with TaskGroup() as tg:
-        tg.create_task(UserQuery.resolve_elements_users(elements, display_name=True))
-        tg.create_task(ElementMemberQuery.resolve_members(elements))
+    await UserQuery.resolve_elements_users(elements, display_name=True)
 
     xattr = get_xattr()
     minx, miny, maxx, maxy = geometry.bounds
@@ -42,5 +37,5 @@ async def get_map(bbox: Annotated[str, Query()]):
             xattr('maxlon'): maxx,
             xattr('maxlat'): maxy,
         },
-        **Format06.encode_elements(elements),
+        **Format06.encode_elements(elements, stream=True),
     }
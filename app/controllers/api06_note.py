@@ -1,4 +1,3 @@
-from asyncio import TaskGroup
 from collections import defaultdict
 from collections.abc import Sequence
 from datetime import datetime
@@ -16,6 +15,7 @@ from app.lib.exceptions_context import raise_for
 from app.lib.format_style_context import format_is_rss
 from app.lib.geo_utils import parse_bbox
 from app.lib.options_context import options_context
+from app.lib.rich_text import resolve_rich_text_many
 from app.lib.translation import t
 from app.limits import (
     NOTE_QUERY_AREA_MAX_SIZE,
@@ -343,6 +343,4 @@ async def _resolve_comments_full(notes_or_comments: Sequence[Note] | Sequence[No
             await NoteCommentQuery.resolve_comments(notes, per_note_limit=None)
     else:
         comments: Sequence[NoteComment] = notes_or_comments  # pyright: ignore[reportAssignmentType]
-        async with TaskGroup() as tg:
-            for comment in comments:
-                tg.create_task(comment.resolve_rich_text())
+        await resolve_rich_text_many(comments)
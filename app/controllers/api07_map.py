@@ -1,4 +1,3 @@
-from asyncio import TaskGroup
 from typing import Annotated
 
 from fastapi import APIRouter, Query
@@ -7,9 +6,8 @@ from app.format import Format07
 from app.lib.exceptions_context import raise_for
 from app.lib.geo_utils import parse_bbox
 from app.limits import MAP_QUERY_AREA_MAX_SIZE, MAP_QUERY_LEGACY_NODES_LIMIT
-from app.queries.element_member_query import ElementMemberQuery
-from app.queries.element_query import ElementQuery
 from app.queries.user_query import UserQuery
+from app.services.map_tile_cache_service import MapTileCacheService
 
 router = APIRouter(prefix='/api/0.7')
 
@@ -21,14 +19,11 @@ async def get_map(bbox: Annotated[str, Query()]):
     if geometry.area > MAP_QUERY_AREA_MAX_SIZE:
         raise_for().map_query_area_too_big()
 
-    elements = await ElementQuery.find_many_by_geom(
+    elements = await MapTileCacheService.find_many_by_geom(
         geometry,
         nodes_limit=MAP_QUERY_LEGACY_NODES_LIMIT,
         legacy_nodes_limit=True,
     )
-
-    async with TaskGroup() as tg:
-        tg.create_task(UserQuery.resolve_elements_users(elements, display_name=False))
-        tg.create_task(ElementMemberQuery.resolve_members(elements))
+    await UserQuery.resolve_elements_users(elements, display_name=False)
 
     return Format07.encode_elements(elements)
@@ -5,6 +5,7 @@ from typing import Annotated
 
 from fastapi import APIRouter, Query
 from pydantic import PositiveInt
+from shapely import LineString
 from sqlalchemy.orm import joinedload
 
 from app.format import FormatLeaflet
@@ -23,6 +24,8 @@ from app.models.tags_format import TagFormat
 from app.queries.changeset_query import ChangesetQuery
 from app.queries.element_member_query import ElementMemberQuery
 from app.queries.element_query import ElementQuery
+from app.queries.way_geometry_query import WayGeometryQuery
+from app.services.element_sequence_service import ElementSequenceService
 from app.utils import JSON_ENCODE
 
 router = APIRouter(prefix='/api/partial')
@@ -30,7 +33,7 @@ router = APIRouter(prefix='/api/partial')
 
 @router.get('/{type:element_type}/{id:int}')
 async def get_latest(type: ElementType, id: Annotated[ElementId, PositiveInt]):
-    at_sequence_id = await ElementQuery.get_current_sequence_id()
+    at_sequence_id = await ElementSequenceService.get_current_sequence_id()
 
     ref = ElementRef(type, id)
     elements = await ElementQuery.get_by_refs(
@@ -62,7 +65,7 @@ async def get_version(
     id: Annotated[ElementId, PositiveInt],
     version: Annotated[int, PositiveInt],
 ):
-    at_sequence_id = await ElementQuery.get_current_sequence_id()
+    at_sequence_id = await ElementSequenceService.get_current_sequence_id()
     include_parents = True
 
     ref = VersionedElementRef(type, id, version)
@@ -98,7 +101,7 @@ async def get_history(
     page: Annotated[PositiveInt, Query()] = 1,
 ):
     ref = ElementRef(type, id)
-    at_sequence_id = await ElementQuery.get_current_sequence_id()
+    at_sequence_id = await ElementSequenceService.get_current_sequence_id()
     current_version = await ElementQuery.get_current_version_by_ref(ref, at_sequence_id=at_sequence_id)
 
     if current_version == 0:
@@ -157,6 +160,7 @@ async def _get_element_data(element: Element, at_sequence_id: int, *, include_pa
     full_data: Iterable[Element] = ()
     list_elements: Collection[MemberListEntry] = ()
     list_parents: Collection[MemberListEntry] = ()
+    way_geometries: dict[ElementId, LineString] = {}
 
     async def changeset_task():
         with options_context(
@@ -173,15 +177,32 @@ async def _get_element_data(element: Element, at_sequence_id: int, *, include_pa
             return changeset
 
     async def data_task():
-        nonlocal full_data, list_elements
+        nonlocal full_data, list_elements, way_geometries
         members_refs = {ElementRef(member.type, member.id) for member in members}
         members_elements = await ElementQuery.get_by_refs(
             members_refs,
             at_sequence_id=at_sequence_id,
-            recurse_ways=True,
             limit=None,
         )
         await ElementMemberQuery.resolve_members(members_elements)
+
+        # recurse only the ways without the cached geometry
+        way_geometries = await WayGeometryQuery.get_by_ids(
+            tuple(e.id for e in members_elements if e.type == 'way'),
+            at_sequence_id=at_sequence_id,
+        )
+        nodes_refs = {
+            ElementRef('node', member.id)
+            for e in members_elements
+            if e.type == 'way' and e.id not in way_geometries
+            for member in e.members  # pyright: ignore[reportOptionalIterable]
+        }
+        nodes_refs.difference_update(members_refs)
+        if nodes_refs:
+            nodes = await ElementQuery.get_by_refs(nodes_refs, at_sequence_id=at_sequence_id, limit=None)
+            await ElementMemberQuery.resolve_members(nodes)
+            members_elements.extend(nodes)
+
         full_data = chain((element,), members_elements)
         list_elements = FormatElementList.element_members(members, members_elements)
 
@@ -215,7 +236,7 @@ async def _get_element_data(element: Element, at_sequence_id: int, *, include_pa
     next_version = element.version + 1 if (element.next_sequence_id is not None) else None
     name = features_names((element,))[0]
     tags = tags_format(element.tags)
-    leaflet = FormatLeaflet.encode_elements(full_data, detailed=False)
+    leaflet = FormatLeaflet.encode_elements(full_data, detailed=False, way_geometries=way_geometries)
 
     return {
         'element': element,
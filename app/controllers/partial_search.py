@@ -22,6 +22,7 @@ from app.models.leaflet import ElementLeaflet, ElementLeafletNode
 from app.queries.element_member_query import ElementMemberQuery
 from app.queries.element_query import ElementQuery
 from app.queries.nominatim_query import NominatimQuery
+from app.services.element_sequence_service import ElementSequenceService
 from app.utils import JSON_ENCODE
 
 router = APIRouter(prefix='/api/partial')
@@ -34,7 +35,7 @@ async def get_search(
     local_only: Annotated[bool, Query()] = False,
 ):
     search_bounds = Search.get_search_bounds(bbox, local_only=local_only)
-    at_sequence_id = await ElementQuery.get_current_sequence_id()
+    at_sequence_id = await ElementSequenceService.get_current_sequence_id()
 
     async with TaskGroup() as tg:
         tasks = tuple(
@@ -14,7 +14,6 @@ from app.limits import DISPLAY_NAME_MAX_LENGTH, TRACE_TAG_MAX_LENGTH
 from app.models.db.trace_ import Trace
 from app.models.db.user import User
 from app.queries.trace_query import TraceQuery
-from app.queries.trace_segment_query import TraceSegmentQuery
 from app.queries.user_query import UserQuery
 from app.utils import JSON_ENCODE
 
@@ -62,7 +61,7 @@ async def _get_traces_data(
 
     if traces:
         async with TaskGroup() as tg:
-            tg.create_task(TraceSegmentQuery.resolve_coords(traces, limit_per_trace=100, resolution=100))
+            tg.create_task(TraceQuery.resolve_preview_coords(traces))
             new_after_t = tg.create_task(new_after_task())
             new_before_t = tg.create_task(new_before_task())
         new_after = new_after_t.result()
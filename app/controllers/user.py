@@ -1,4 +1,4 @@
-from datetime import UTC, datetime, timedelta
+from datetime import datetime, timedelta
 from itertools import cycle
 from typing import Annotated
 
@@ -8,7 +8,7 @@ from fastapi import APIRouter, Path
 from starlette import status
 from starlette.responses import RedirectResponse
 
-from app.lib.auth_context import auth_user, web_user
+from app.lib.auth_context import auth_user, auth_user_scopes, web_user
 from app.lib.date_utils import format_short_date, get_month_name, get_weekday_name, utcnow
 from app.lib.legal import legal_terms
 from app.lib.render_response import render_response
@@ -29,8 +29,8 @@ from app.queries.changeset_query import ChangesetQuery
 from app.queries.note_comment_query import NoteCommentQuery
 from app.queries.note_query import NoteQuery
 from app.queries.trace_query import TraceQuery
-from app.queries.trace_segment_query import TraceSegmentQuery
 from app.queries.user_query import UserQuery
+from app.queries.user_stats_query import UserStatsQuery
 from app.utils import JSON_ENCODE
 
 router = APIRouter()
@@ -54,8 +54,8 @@ async def index(display_name: Annotated[str, Path(min_length=1, max_length=DISPL
     account_age = utcnow() - user.created_at
     is_new_user = account_age < timedelta(days=USER_NEW_DAYS)
 
-    changesets_count = await ChangesetQuery.count_by_user_id(user.id)
-    changeset_comments_count = 0  # TODO:
+    stats = await UserStatsQuery.get_by_user_id(user.id)
+
     changesets = await ChangesetQuery.find_many_by_query(
         user_id=user.id,
         sort='desc',
@@ -63,8 +63,6 @@ async def index(display_name: Annotated[str, Path(min_length=1, max_length=DISPL
     )
     await ChangesetCommentQuery.resolve_num_comments(changesets)
 
-    notes_count = await NoteQuery.count_by_user_id(user.id)
-    note_comments_count = 0  # TODO:
     notes = await NoteQuery.find_many_by_query(
         user_id=user.id,
         event=NoteEvent.opened,
@@ -73,13 +71,12 @@ async def index(display_name: Annotated[str, Path(min_length=1, max_length=DISPL
     )
     await NoteCommentQuery.resolve_comments(notes, per_note_sort='asc', per_note_limit=1)
 
-    traces_count = await TraceQuery.count_by_user_id(user.id)
     traces = await TraceQuery.find_many_by_user_id(
         user.id,
         sort='desc',
         limit=USER_RECENT_ACTIVITY_ENTRIES,
     )
-    await TraceSegmentQuery.resolve_coords(traces, limit_per_trace=100, resolution=100)
+    await TraceQuery.resolve_preview_coords(traces)
     traces_coords = JSON_ENCODE(tuple(trace.coords for trace in traces)).decode()
 
     # TODO: diaries
@@ -98,13 +95,13 @@ async def index(display_name: Annotated[str, Path(min_length=1, max_length=DISPL
             'profile': user,
             'is_self': is_self,
             'is_new_user': is_new_user,
-            'changesets_count': changesets_count,
-            'changeset_comments_count': changeset_comments_count,
+            'changesets_count': stats.changesets,
+            'changeset_comments_count': stats.changeset_comments,
             'changesets': changesets,
-            'notes_count': notes_count,
-            'note_comments_count': note_comments_count,
+            'notes_count': stats.notes,
+            'note_comments_count': stats.note_comments,
             'notes': notes,
-            'traces_count': traces_count,
+            'traces_count': stats.traces_visible_to(*auth_user_scopes()),
             'traces': traces,
             'traces_coords': traces_coords,
             'diaries_count': diaries_count,
@@ -126,7 +123,7 @@ async def _get_activity_data(user: User) -> dict:
     today = utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     weekday = (today.weekday() + 1) % 7  # put sunday on top
     created_since = today - timedelta(days=USER_ACTIVITY_CHART_WEEKS * 7 + weekday)
-    changesets_count_per_day = await ChangesetQuery.count_per_day_by_user_id(user.id, created_since)
+    changesets_count_per_day = await UserStatsQuery.get_activity_by_user_id(user.id, created_since.date())
     dates_range = np.arange(
         created_since,
         today + timedelta(days=1),
@@ -134,7 +131,7 @@ async def _get_activity_data(user: User) -> dict:
         dtype=datetime,
     )
     activity = np.array(
-        tuple(changesets_count_per_day.get(date.replace(tzinfo=UTC), 0) for date in dates_range),
+        tuple(changesets_count_per_day.get(date.date(), 0) for date in dates_range),
         dtype=np.uint64,
     )
     max_activity_clip = np.clip(np.percentile(activity, 95), 1, None)
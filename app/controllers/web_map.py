@@ -27,4 +27,6 @@ async def get_map(bbox: Annotated[str, Query()]):
     )
 
     await ElementMemberQuery.resolve_members(elements)
+    # the cached way geometries are not used here (yet): partial ways are rendered from the nodes
+    # within the bbox, which are fetched regardless, while the cached geometries would render them whole
     return FormatLeaflet.encode_elements(elements, detailed=True, areas=False)
@@ -9,8 +9,8 @@ from app.lib.geo_utils import try_parse_point
 from app.lib.message_collector import MessageCollector
 from app.lib.search import Search
 from app.lib.translation import t
-from app.queries.element_query import ElementQuery
 from app.queries.nominatim_query import NominatimQuery
+from app.services.element_sequence_service import ElementSequenceService
 
 
 class _ResolveResult(NamedTuple):
@@ -30,7 +30,7 @@ async def resolve_names(
     from_loaded: Annotated[str, Form()] = '',
     to_loaded: Annotated[str, Form()] = '',
 ) -> dict:
-    at_sequence_id = await ElementQuery.get_current_sequence_id()
+    at_sequence_id = await ElementSequenceService.get_current_sequence_id()
 
     async with TaskGroup() as tg:
         from_task = (
@@ -1,5 +1,5 @@
 from collections import defaultdict
-from collections.abc import Collection, Iterable, Sequence
+from collections.abc import Collection, Iterable
 from typing import Any
 
 import cython
@@ -9,6 +9,7 @@ from shapely import Point, lib
 from app.lib.date_utils import legacy_date
 from app.lib.exceptions_context import raise_for
 from app.lib.format_style_context import format_is_json
+from app.lib.xmltodict import XMLToDict
 from app.limits import GEO_COORDINATE_PRECISION
 from app.models.db.element import Element
 from app.models.db.element_member import ElementMember
@@ -30,8 +31,10 @@ class Element06Mixin:
             return {element.type: _encode_element(element, is_json=False)}
 
     @staticmethod
-    def encode_elements(elements: Iterable[Element]) -> dict[str, Sequence[dict]]:
+    def encode_elements(elements: Iterable[Element], *, stream: bool = False) -> dict[str, Iterable[dict]]:
         """
+        If stream is True, the elements are encoded lazily (see OSMResponse streaming).
+
         >>> encode_elements([
         ...     Element(type='node', id=1, version=1, ...),
         ...     Element(type=ElementType.way, id=2, version=1,
@@ -39,8 +42,20 @@ class Element06Mixin:
         {'node': [{'@id': 1, '@version': 1, ...}], 'way': [{'@id': 2, '@version': 1, ...}]}
         """
         if format_is_json():
+            if stream:
+                return {'elements': (_encode_element(element, is_json=True) for element in elements)}
             return {'elements': tuple(_encode_element(element, is_json=True) for element in elements)}
         else:
+            if stream:
+                # merge elements of the same type together, encode on demand
+                type_elements_map: dict[ElementType, list[Element]] = defaultdict(list)
+                for element in elements:
+                    type_elements_map[element.type].append(element)
+                return {
+                    type: (_encode_element(element, is_json=False) for element in type_elements)
+                    for type, type_elements in type_elements_map.items()
+                }
+
             result: dict[ElementType, list[dict]] = defaultdict(list)
             # merge elements of the same type together
             for element in elements:
@@ -58,8 +73,14 @@ class Element06Mixin:
         return _decode_element(type, data, changeset_id=None)
 
     @staticmethod
-    def encode_osmchange(elements: Collection[Element]) -> list[tuple[OSMChangeAction, dict[ElementType, dict]]]:
+    def encode_osmchange(
+        elements: Collection[Element],
+        *,
+        stream: bool = False,
+    ) -> Iterable[tuple[OSMChangeAction, dict[ElementType, dict]]]:
         """
+        If stream is True, the elements are encoded lazily (see OSMResponse streaming).
+
         >>> encode_osmchange([
         ...     Element(type='node', id=1, version=1, ...),
         ...     Element(type=ElementType.way, id=2, version=2, ...)
@@ -69,20 +90,13 @@ class Element06Mixin:
             ('modify', {'way': {'@id': 2, '@version': 2, ...}}),
         ]
         """
+        if stream:
+            return (_encode_osmchange_element(element) for element in elements)
+
         result: list[tuple[OSMChangeAction, dict[ElementType, dict]]] = [None] * len(elements)  # pyright: ignore[reportAssignmentType]
-        action: OSMChangeAction
         i: cython.int
         for i, element in enumerate(elements):
-            # determine the action automatically
-            if element.version == 1:
-                action = 'create'
-            elif element.visible:
-                action = 'modify'
-            else:
-                action = 'delete'
-            result_: tuple[OSMChangeAction, dict[ElementType, dict]]
-            result_ = (action, {element.type: _encode_element(element, is_json=False)})
-            result[i] = result_
+            result[i] = _encode_osmchange_element(element)
         return result
 
     @staticmethod
@@ -113,47 +127,107 @@ class Element06Mixin:
             if isinstance(elements_data, dict):
                 continue
 
-            if action == 'create':
-                for key, data in elements_data:
-                    data['@version'] = 0
-                    element = _decode_element(key, data, changeset_id=changeset_id)
+            if action not in {'create', 'modify', 'delete'}:
+                raise_for().diff_unsupported_action(action)
 
-                    if element.id > 0:
-                        raise_for().diff_create_bad_id(element)
+            delete_if_unused: cython.char = False
+            for key, data in elements_data:
+                if key == '@if-unused':  # pyright: ignore[reportUnnecessaryComparison]
+                    delete_if_unused = True
+                    continue
+                result.append(_decode_osmchange_element(action, key, data, changeset_id, delete_if_unused))
 
-                    result.append(element)
+        return result
 
-            elif action == 'modify':
-                for key, data in elements_data:
-                    element = _decode_element(key, data, changeset_id=changeset_id)
+    @staticmethod
+    def decode_osmchange_stream(xml_bytes: bytes, *, changeset_id: int | None) -> list[Element]:
+        """
+        Decode the osmChange XML document incrementally, without building the document tree.
 
-                    if element.version <= 1:
-                        raise_for().diff_update_bad_version(element)
+        The elements are validated as they are parsed, the first error aborts the parsing.
+        If changeset_id is None, it will be extracted from the element data.
+        """
+        result: list[Element] = []
+        action: str = ''
+        delete_if_unused: cython.char = False
+        empty: cython.char = True
+
+        for depth, tag, value in XMLToDict.parse_stream(xml_bytes, depth=2):
+            if depth == 2:
+                result.append(_decode_osmchange_element(action, tag, value, changeset_id, delete_if_unused))  # pyright: ignore[reportArgumentType]
+            elif depth == 1:
+                if tag not in {'create', 'modify', 'delete'}:
+                    raise_for().diff_unsupported_action(tag)  # pyright: ignore[reportArgumentType]
+                action = tag
+                delete_if_unused = '@if-unused' in value
+                empty = False
+            elif tag != 'osmChange':
+                raise_for().bad_xml('osmChange', "XML doesn't contain an osmChange element.", xml_bytes)
+            elif value:
+                empty = False
+
+        # don't allow empty documents
+        if empty:
+            raise_for().bad_xml('osmChange', "XML doesn't contain an osmChange element.", xml_bytes)
 
-                    result.append(element)
+        return result
 
-            elif action == 'delete':
-                delete_if_unused: cython.char = False
 
-                for key, data in elements_data:
-                    if key == '@if-unused':  # pyright: ignore[reportUnnecessaryComparison]
-                        delete_if_unused = True
-                        continue
+@cython.cfunc
+def _decode_osmchange_element(
+    action: OSMChangeAction,
+    type: ElementType,
+    data: dict,
+    changeset_id: int | None,
+    delete_if_unused: cython.char,
+) -> Element:
+    """
+    >>> _decode_osmchange_element('modify', 'way', {'@id': 2, '@version': 2, ...}, None, False)
+    Element(type='way', ...)
+    """
+    if action == 'create':
+        data['@version'] = 0
+        element = _decode_element(type, data, changeset_id=changeset_id)
 
-                    data['@visible'] = False
-                    element = _decode_element(key, data, changeset_id=changeset_id)
+        if element.id > 0:
+            raise_for().diff_create_bad_id(element)
 
-                    if element.version <= 1:
-                        raise_for().diff_update_bad_version(element)
-                    if delete_if_unused:
-                        element.delete_if_unused = True
+    elif action == 'modify':
+        element = _decode_element(type, data, changeset_id=changeset_id)
 
-                    result.append(element)
+        if element.version <= 1:
+            raise_for().diff_update_bad_version(element)
 
-            else:
-                raise_for().diff_unsupported_action(action)
+    elif action == 'delete':
+        data['@visible'] = False
+        element = _decode_element(type, data, changeset_id=changeset_id)
 
-        return result
+        if element.version <= 1:
+            raise_for().diff_update_bad_version(element)
+        if delete_if_unused:
+            element.delete_if_unused = True
+
+    else:
+        raise_for().diff_unsupported_action(action)
+
+    return element
+
+
+@cython.cfunc
+def _encode_osmchange_element(element: Element) -> tuple[OSMChangeAction, dict[ElementType, dict]]:
+    """
+    >>> _encode_osmchange_element(Element(type='node', id=1, version=1, ...))
+    ('create', {'node': {'@id': 1, '@version': 1, ...}})
+    """
+    # determine the action automatically
+    action: OSMChangeAction
+    if element.version == 1:
+        action = 'create'
+    elif element.visible:
+        action = 'modify'
+    else:
+        action = 'delete'
+    return (action, {element.type: _encode_element(element, is_json=False)})
 
 
 @cython.cfunc
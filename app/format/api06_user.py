@@ -5,7 +5,7 @@ import cython
 import numpy as np
 from shapely import Point, lib
 
-from app.lib.auth_context import auth_user
+from app.lib.auth_context import auth_user, auth_user_scopes
 from app.lib.date_utils import legacy_date
 from app.lib.exceptions_context import raise_for
 from app.lib.format_style_context import format_is_json
@@ -13,10 +13,8 @@ from app.lib.xmltodict import get_xattr
 from app.models.db.user import User
 from app.models.db.user_pref import UserPref
 from app.models.validating.user_pref import UserPrefValidating
-from app.queries.changeset_query import ChangesetQuery
-from app.queries.message_query import MessageQuery
-from app.queries.trace_query import TraceQuery
 from app.queries.user_block_query import UserBlockQuery
+from app.queries.user_stats_query import UserStatsQuery
 
 
 class User06Mixin:
@@ -90,29 +88,24 @@ async def _encode_user(user: User, *, is_json: cython.char) -> dict:
     >>> _encode_user(User(...))
     {'@id': 1234, '@display_name': 'userName', ...}
     """
-    current_user = auth_user()
+    current_user, current_scopes = auth_user_scopes()
     access_private: cython.char = (current_user is not None) and (current_user.id == user.id)
     xattr = get_xattr(is_json=is_json)
 
     async with TaskGroup() as tg:
-        changesets_task = tg.create_task(ChangesetQuery.count_by_user_id(user.id))
-        traces_task = tg.create_task(TraceQuery.count_by_user_id(user.id))
+        stats_task = tg.create_task(UserStatsQuery.get_by_user_id(user.id))
         block_received_task = tg.create_task(UserBlockQuery.count_received_by_user_id(user.id))
         block_issued_task = tg.create_task(UserBlockQuery.count_given_by_user_id(user.id))
-        if access_private:
-            messages_received_task = tg.create_task(MessageQuery.count_received_by_user_id(user.id))
-            messages_sent_task = tg.create_task(MessageQuery.count_sent_by_user_id(user.id))
-        else:
-            messages_received_task = None
-            messages_sent_task = None
 
-    changesets_num = changesets_task.result()
-    traces_num = traces_task.result()
+    stats = stats_task.result()
+    changesets_num = stats.changesets
+    traces_num = stats.traces_visible_to(current_user, current_scopes)
     block_received_num, block_received_active_num = block_received_task.result()
     block_issued_num, block_issued_active_num = block_issued_task.result()
-    if messages_received_task is not None and messages_sent_task is not None:
-        messages_received_num, messages_unread_num = messages_received_task.result()
-        messages_sent_num = messages_sent_task.result()
+    if access_private:
+        messages_received_num = stats.messages_received
+        messages_unread_num = stats.messages_unread
+        messages_sent_num = stats.messages_sent
     else:
         messages_received_num = messages_unread_num = 0
         messages_sent_num = 0
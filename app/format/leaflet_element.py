@@ -1,9 +1,9 @@
 import logging
-from collections.abc import Iterable, Sequence
+from collections.abc import Iterable, Mapping, Sequence
 
 import cython
 import numpy as np
-from shapely import Point, lib
+from shapely import LineString, lib
 
 from app.models.db.element import Element
 from app.models.db.element_member import ElementMember
@@ -22,13 +22,15 @@ class LeafletElementMixin:
         *,
         detailed: cython.char,
         areas: cython.char = True,
+        way_geometries: Mapping[ElementId, LineString] | None = None,
     ) -> list[ElementLeaflet]:
         """
         Format elements into a minimal structure, suitable for Leaflet rendering.
+
+        Ways with the cached geometry are encoded without their nodes.
         """
         node_id_map: dict[ElementId, Element] = {}
         way_id_map: dict[ElementId, Element] = {}
-        way_nodes_ids: set[ElementId] = set()
         result: list[ElementLeaflet] = []
 
         for element in elements:
@@ -37,55 +39,141 @@ class LeafletElementMixin:
             elif element.type == 'way':
                 way_id_map[element.id] = element
 
-        for way_id, way in way_id_map.items():
+        nodes = tuple(node_id_map.values())
+        ways = tuple(way_id_map.values())
+        num_nodes: cython.Py_ssize_t = len(nodes)
+        num_ways: cython.Py_ssize_t = len(ways)
+
+        node_ids = np.fromiter(node_id_map, np.int64, num_nodes)
+        node_has_point = np.fromiter((node.point is not None for node in nodes), np.bool_, num_nodes)
+        # fromiter avoids the slow sequence detection of np.asarray on geometries
+        node_points = np.fromiter(
+            (node.point for node in nodes if node.point is not None),
+            object,
+            np.count_nonzero(node_has_point),
+        )
+        node_coords = np.fliplr(lib.get_coordinates(node_points, False, False))  # [[lat, lon], ...]
+        # index into node_coords, valid only for the nodes with a point
+        node_coords_indices = np.cumsum(node_has_point) - 1
+
+        ways_members: list[Sequence[ElementMember]] = []
+        for way in ways:
             way_members = way.members
             if way_members is None:
                 raise AssertionError('Way members must be set')
+            ways_members.append(way_members)
+
+        # the members of all ways, concatenated
+        ways_num_members = np.fromiter(map(len, ways_members), np.int64, num_ways)
+        member_ids = np.fromiter(
+            (member.id for way_members in ways_members for member in way_members),
+            np.int64,
+            ways_num_members.sum(),
+        )
+        member_way_indices = np.repeat(np.arange(num_ways), ways_num_members)
+        member_node_indices, member_found = _lookup_indices(node_ids, member_ids)
+        member_valid = member_found.copy()
+        member_valid[member_found] = node_has_point[member_node_indices[member_found]]
+        if not np.array_equal(member_found, member_valid):
+            _warn_missing_points(nodes, ways, member_found & ~member_valid, member_node_indices, member_way_indices)
+
+        # split ways on gaps: runs of members delimited by way starts and missing nodes
+        way_starts = np.zeros(len(member_ids), np.bool_)
+        way_starts[(np.cumsum(ways_num_members) - ways_num_members)[ways_num_members > 0]] = True
+        member_gaps = ~member_found
+        member_run_ids = np.cumsum(member_gaps | way_starts)
+
+        # segments are the runs with valid members, members without a point are skipped
+        valid_positions = np.flatnonzero(member_valid)
+        valid_run_ids = member_run_ids[valid_positions]
+        segment_starts = np.flatnonzero(np.diff(valid_run_ids, prepend=-1))
+        segment_way_indices: list[int] = member_way_indices[valid_positions[segment_starts]].tolist()
+        segment_bounds: list[int] = np.append(segment_starts, len(valid_positions)).tolist()
+        segments_coords: list[list[float]] = node_coords[
+            node_coords_indices[member_node_indices[valid_positions]]
+        ].tolist()
+
+        # gaps after a segment start a new one, only unsplit ways may be areas
+        run_has_valid = np.zeros(member_run_ids[-1] + 1 if len(member_run_ids) else 0, np.bool_)
+        run_has_valid[valid_run_ids] = True
+        split_positions = np.flatnonzero(member_gaps & ~way_starts)
+        split_positions = split_positions[run_has_valid[member_run_ids[split_positions] - 1]]
+        way_is_split = np.bincount(member_way_indices[split_positions], minlength=num_ways).astype(np.bool_)
+
+        segment_i: cython.Py_ssize_t = 0
+        num_segments: cython.Py_ssize_t = len(segment_way_indices)
+        i: cython.Py_ssize_t
+        for i in range(num_ways):
+            way = ways[i]
+            way_id = way.id
+            way_members = ways_members[i]
+            way_segment_start = segment_i
+            while segment_i < num_segments and segment_way_indices[segment_i] == i:
+                segment_i += 1
+
+            way_geometry = way_geometries.get(way_id) if (way_geometries is not None) else None
+            if way_geometry is not None:
+                is_area = _is_way_area(way.tags, way_members) if areas else False
+                geom = np.fliplr(lib.get_coordinates(np.asarray(way_geometry, dtype=object), False, False)).tolist()
+                result.append(ElementLeafletWay('way', way_id, geom, is_area))
+                continue
 
-            way_nodes_ids.update(member.id for member in way_members)
-            current_segment: list[Point] = []
-            segments: list[list[Point]] = [current_segment]
-
-            for node_ref in way_members:
-                node = node_id_map.get(node_ref.id)
-                if node is None:
-                    # split way on gap
-                    if current_segment:
-                        current_segment = []
-                        segments.append(current_segment)
-                    continue
-
-                point = node.point
-                if point is None:
-                    logging.warning(
-                        'Missing point for node %d version %d (part of way %d version %d)',
-                        node.id,
-                        node.version,
-                        way.id,
-                        way.version,
-                    )
-                    continue
-
-                current_segment.append(point)
-
-            is_area = _is_way_area(way.tags, way_members) if areas and len(segments) == 1 else False
-            for segment in segments:
-                if not segment:
-                    continue
-                geom = np.fliplr(lib.get_coordinates(np.asarray(segment, dtype=object), False, False)).tolist()
+            is_area = _is_way_area(way.tags, way_members) if areas and not way_is_split[i] else False
+            for j in range(way_segment_start, segment_i):
+                geom = segments_coords[segment_bounds[j] : segment_bounds[j + 1]]
                 result.append(ElementLeafletWay('way', way_id, geom, is_area))
 
-        encode_nodes = tuple(
-            node
-            for node in node_id_map.values()
-            if _is_node_interesting(node, way_nodes_ids, detailed=detailed) and node.point is not None
+        node_is_member = np.isin(node_ids, member_ids)
+        if detailed:
+            node_has_tags = np.fromiter((bool(node.tags) for node in nodes), np.bool_, num_nodes)
+            encode_mask = (~node_is_member | node_has_tags) & node_has_point
+        else:
+            encode_mask = ~node_is_member & node_has_point
+        encode_indices: list[int] = np.flatnonzero(encode_mask).tolist()
+        geoms: list[list[float]] = node_coords[node_coords_indices[encode_indices]].tolist()
+        result.extend(
+            ElementLeafletNode('node', nodes[node_i].id, geom)  #
+            for node_i, geom in zip(encode_indices, geoms, strict=True)
         )
-        encode_points = tuple(node.point for node in encode_nodes)
-        geoms = np.fliplr(lib.get_coordinates(np.asarray(encode_points, dtype=object), False, False)).tolist()
-        result.extend(ElementLeafletNode('node', node.id, geom) for node, geom in zip(encode_nodes, geoms, strict=True))
         return result
 
 
+@cython.cfunc
+def _lookup_indices(ids: np.ndarray, lookup_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find the indices of the lookup ids in the ids array.
+
+    Returns a tuple of (indices, found mask), the indices of not found ids are undefined.
+    """
+    if not len(ids):
+        return np.zeros(len(lookup_ids), np.intp), np.zeros(len(lookup_ids), np.bool_)
+    sorter = np.argsort(ids)
+    sorted_indices = np.searchsorted(ids, lookup_ids, sorter=sorter)
+    sorted_indices[sorted_indices == len(ids)] = 0
+    indices = sorter[sorted_indices]
+    return indices, ids[indices] == lookup_ids
+
+
+@cython.cfunc
+def _warn_missing_points(
+    nodes: Sequence[Element],
+    ways: Sequence[Element],
+    mask: np.ndarray,
+    member_node_indices: np.ndarray,
+    member_way_indices: np.ndarray,
+) -> None:
+    for node_i, way_i in zip(member_node_indices[mask].tolist(), member_way_indices[mask].tolist(), strict=True):
+        node = nodes[node_i]
+        way = ways[way_i]
+        logging.warning(
+            'Missing point for node %d version %d (part of way %d version %d)',
+            node.id,
+            node.version,
+            way.id,
+            way.version,
+        )
+
+
 @cython.cfunc
 def _is_way_area(tags: dict[str, str], members: Sequence[ElementMember]) -> cython.char:
     """
@@ -102,19 +190,6 @@ def _is_way_area(tags: dict[str, str], members: Sequence[ElementMember]) -> cyth
     return any(key.startswith(_area_prefixes) for key in tags)
 
 
-@cython.cfunc
-def _is_node_interesting(node: Element, way_nodes_ids: set[ElementId], *, detailed: cython.char) -> cython.char:
-    """
-    Check if the node is interesting enough to be displayed.
-    """
-    is_member: cython.char = node.id in way_nodes_ids
-    if not detailed:
-        return not is_member
-    if not is_member:
-        return True
-    return bool(node.tags)
-
-
 _area_tags: frozenset[str] = frozenset(
     (
         'amenity',
@@ -2,10 +2,8 @@ from collections.abc import Collection, Sequence
 
 import cython
 import numpy as np
-from numpy.typing import NDArray
 from rtree.index import Index
 from shapely import Point, box, get_coordinates, measurement
-from sklearn.cluster import AgglomerativeClustering
 
 from app.limits import CHANGESET_BBOX_LIMIT, CHANGESET_NEW_BBOX_MIN_DISTANCE, CHANGESET_NEW_BBOX_MIN_RATIO
 from app.models.db.changeset_bounds import ChangesetBounds
@@ -15,7 +13,9 @@ def change_bounds(bounds: Collection[ChangesetBounds], points: Sequence[Point])
     bbox_limit: cython.int = CHANGESET_BBOX_LIMIT
     bboxes: list[tuple[float, float, float, float]]
     bboxes = measurement.bounds(tuple(cb.bounds for cb in bounds)).tolist()
-    dirty_mask: list[bool] = [False] * bbox_limit
+    dirty_mask: list[bool] = [False] * len(bboxes)
+    deleted_mask: list[bool] = [False] * len(bboxes)
+    num_active: cython.int = len(bboxes)
 
     # create index
     index = Index()
@@ -23,19 +23,10 @@ def change_bounds(bounds: Collection[ChangesetBounds], points: Sequence[Point])
     for i, bbox in enumerate(bboxes):
         index.insert(i, bbox)
 
-    # process clusters
-    for cluster in _cluster_points(points):
-        cluster_ = np.array(cluster, np.float64)
-        minx, miny = cluster_.min(axis=0).tolist()
-        maxx, maxy = cluster_.max(axis=0).tolist()
+    # process cells, each one is merged online into the bounded set of bboxes
+    for minx, miny, maxx, maxy in _reduce_points(points):
         bbox = (minx, miny, maxx, maxy)
-
-        if len(bboxes) < bbox_limit:
-            # below the limit, find the intersection
-            i = next(index.intersection(_get_buffer_bbox(bbox), False), None)
-        else:
-            # limit is reached, find the nearest
-            i = next(index.nearest(_get_buffer_bbox(bbox), 1, False))
+        i = next(index.intersection(_get_buffer_bbox(bbox), False), None)
 
         if i is not None:
             # merge with the existing bbox
@@ -43,17 +34,33 @@ def change_bounds(bounds: Collection[ChangesetBounds], points: Sequence[Point])
             bbox = bboxes[i] = _union_bbox(bbox, bboxes[i])
             index.insert(i, bbox)
             dirty_mask[i] = True
-        else:
-            # add new bbox
-            i = len(bboxes)
-            bboxes.append(bbox)
-            index.insert(i, bbox)
+            continue
+
+        # add new bbox
+        i = len(bboxes)
+        bboxes.append(bbox)
+        dirty_mask.append(False)
+        deleted_mask.append(False)
+        index.insert(i, bbox)
+        num_active += 1
+
+        if num_active > bbox_limit:
+            # limit is exceeded, merge the closest pair (like single-linkage clustering)
+            i, j = _find_closest_pair(bboxes, deleted_mask)
+            index.delete(j, bboxes[j])
+            deleted_mask[j] = True
+            index.delete(i, bboxes[i])
+            bboxes[i] = _union_bbox(bboxes[i], bboxes[j])
+            index.insert(i, bboxes[i])
+            dirty_mask[i] = True
+            num_active -= 1
 
     # recheck dirty bboxes
-    check_queue: list[int] = list(range(len(bboxes)))
-    deleted_mask: list[bool] = [False] * len(bboxes)
+    check_queue: list[int] = [i for i in range(len(bboxes)) if not deleted_mask[i]]
     while check_queue:
         check_i = check_queue.pop()
+        if deleted_mask[check_i]:
+            continue
         bbox = bboxes[check_i]
         i = next((idx for idx in index.intersection(_get_buffer_bbox(bbox), False) if idx != check_i), None)
         if i is None:
@@ -86,27 +93,55 @@ def change_bounds(bounds: Collection[ChangesetBounds], points: Sequence[Point])
 
 
 @cython.cfunc
-def _cluster_points(points: Sequence[Point]) -> tuple[list[NDArray[np.float64]], ...]:
+def _reduce_points(points: Sequence[Point]) -> list[list[float]]:
+    """
+    Reduce the points to the bounding boxes of the occupied grid cells.
+
+    The cell size is CHANGESET_NEW_BBOX_MIN_DISTANCE, so points within a cell would always be merged.
+    """
     coords = get_coordinates(points)
-    if len(coords) == 1:
-        return ([coords[0]],)
-    if len(coords) <= CHANGESET_BBOX_LIMIT:
-        n_clusters = None
-        distance_threshold = CHANGESET_NEW_BBOX_MIN_DISTANCE
-    else:
-        n_clusters = CHANGESET_BBOX_LIMIT
-        distance_threshold = None
-    clustering = AgglomerativeClustering(
-        n_clusters=n_clusters,  # pyright: ignore[reportArgumentType]
-        metric='chebyshev',
-        linkage='single',
-        distance_threshold=distance_threshold,
+    if not len(coords):
+        return []
+    cells = np.floor(coords / CHANGESET_NEW_BBOX_MIN_DISTANCE).astype(np.int64)
+    _, inverse = np.unique(cells, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    num_cells = int(inverse.max()) + 1
+    mins = np.full((num_cells, 2), np.inf)
+    maxs = np.full((num_cells, 2), -np.inf)
+    np.minimum.at(mins, inverse, coords)
+    np.maximum.at(maxs, inverse, coords)
+    return np.hstack((mins, maxs)).tolist()
+
+
+@cython.cfunc
+def _find_closest_pair(
+    bboxes: list[tuple[float, float, float, float]],
+    deleted_mask: list[bool],
+) -> tuple[int, int]:
+    """
+    Find the pair of bboxes with the smallest gap between them.
+
+    The gap is the chebyshev distance, ties are broken by the smallest area increase after the union.
+    """
+    indices = np.array([i for i, deleted in enumerate(deleted_mask) if not deleted], np.int64)
+    arr = np.array(bboxes, np.float64)[indices]
+    minx, miny, maxx, maxy = arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3]
+    gapx = np.maximum(minx[:, None] - maxx[None, :], minx[None, :] - maxx[:, None])
+    gapy = np.maximum(miny[:, None] - maxy[None, :], miny[None, :] - maxy[:, None])
+    gap = np.maximum(np.maximum(gapx, gapy), 0)
+    area = (maxx - minx) * (maxy - miny)
+    union_area = (np.maximum(maxx[:, None], maxx[None, :]) - np.minimum(minx[:, None], minx[None, :])) * (
+        np.maximum(maxy[:, None], maxy[None, :]) - np.minimum(miny[:, None], miny[None, :])
     )
-    clustering.fit(coords)
-    clusters: tuple[list[NDArray[np.float64]], ...] = tuple([] for _ in range(clustering.n_clusters_))
-    for label, coord in zip(clustering.labels_, coords, strict=True):
-        clusters[label].append(coord)
-    return clusters
+    increase = union_area - area[:, None] - area[None, :]
+    np.fill_diagonal(gap, np.inf)
+    # lexicographic order: the gap first, then the area increase
+    candidates = np.flatnonzero(gap == gap.min())
+    best = candidates[np.argmin(increase.ravel()[candidates])]
+    i, j = divmod(int(best), len(indices))
+    if i > j:
+        i, j = j, i
+    return int(indices[i]), int(indices[j])
 
 
 @cython.cfunc
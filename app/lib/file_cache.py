@@ -1,10 +1,13 @@
+import fcntl
 import logging
+import sqlite3
 import time
-from asyncio import get_running_loop
+from asyncio import get_running_loop, sleep
+from contextlib import asynccontextmanager
 from datetime import timedelta
 from functools import lru_cache
 from pathlib import Path
-from typing import NamedTuple
+from threading import Lock
 
 from google.protobuf.message import DecodeError
 
@@ -12,20 +15,63 @@ from app.config import FILE_CACHE_DIR, FILE_CACHE_SIZE_GB
 from app.lib.buffered_random import buffered_randbytes
 from app.lib.crypto import hash_hex
 from app.lib.naturalsize import naturalsize
+from app.limits import FILE_CACHE_ACCESS_UPDATE_INTERVAL, FILE_CACHE_CLEANUP_INTERVAL
 from app.models.messages_pb2 import FileCacheMeta
 
+_index_name = 'index.sqlite'
+_index_schema = """
+CREATE TABLE IF NOT EXISTS entry (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entry_expires_at_idx ON entry (expires_at);
+CREATE INDEX IF NOT EXISTS entry_accessed_at_idx ON entry (accessed_at);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
 
-class _CleanupInfo(NamedTuple):
-    expires_at: int | float
-    size: int
-    path: Path
+# bound the memory of the in-process access throttling
+_touched_limit = 100_000
+
+# the file caches by base directory, the cleanup runner respects their settings
+_caches: dict[Path, 'FileCache'] = {}
 
 
 class FileCache:
-    __slots__ = ('_base_dir',)
+    __slots__ = ('_base_dir', '_max_size')
 
-    def __init__(self, context: str, *, cache_dir: Path = FILE_CACHE_DIR):
+    def __init__(
+        self,
+        context: str,
+        *,
+        cache_dir: Path = FILE_CACHE_DIR,
+        max_size: int = FILE_CACHE_SIZE_GB * 1024 * 1024 * 1024,
+    ):
         self._base_dir: Path = cache_dir.joinpath(context)
+        self._max_size = max_size
+        _caches[self._base_dir] = self
+
+    @property
+    def _index(self) -> '_FileCacheIndex':
+        # opened on first use, file caches are created at import time
+        return _get_index(self._base_dir)
+
+    @asynccontextmanager
+    @staticmethod
+    async def context():
+        """
+        Context manager for the file cache cleanup runner.
+
+        Only one process runs the cleanup at a time, the others wait for the file lock.
+        """
+        loop = get_running_loop()
+        task = loop.create_task(_cleanup_runner())
+        yield
+        task.cancel()  # avoid "Task was destroyed" warning during tests
 
     async def get(self, key: str) -> bytes | None:
         """
@@ -44,12 +90,17 @@ class FileCache:
             return None
 
         # if provided, check time-to-live
-        if entry.HasField('expires_at') and entry.expires_at < time.time():
+        now = time.time()
+        if entry.HasField('expires_at') and entry.expires_at < now:
             logging.debug('Cache miss for %r', key)
             path.unlink(missing_ok=True)
+            await loop.run_in_executor(None, self._index.remove, path.name)
             return None
 
         logging.debug('Cache hit for %r', key)
+        index = self._index
+        if index.should_touch(path.name, now):
+            await loop.run_in_executor(None, index.touch, path.name, now)
         return entry.data
 
     async def set(self, key: str, data: bytes, *, ttl: timedelta | None) -> None:
@@ -59,7 +110,8 @@ class FileCache:
         path = _get_path(self._base_dir, key)
         path.parent.mkdir(parents=True, exist_ok=True)
 
-        expires_at = int(time.time() + ttl.total_seconds()) if (ttl is not None) else None
+        now = time.time()
+        expires_at = int(now + ttl.total_seconds()) if (ttl is not None) else None
         entry = FileCacheMeta(data=data, expires_at=expires_at)
         entry_bytes = entry.SerializeToString()
 
@@ -71,6 +123,14 @@ class FileCache:
             await loop.run_in_executor(None, f.write, entry_bytes)
 
         temp_path.rename(path)
+        await loop.run_in_executor(
+            None,
+            self._index.put,
+            path.name,
+            expires_at if (expires_at is not None) else float('inf'),
+            len(entry_bytes),
+            now,
+        )
 
     def delete(self, key: str) -> None:
         """
@@ -78,54 +138,190 @@ class FileCache:
         """
         path = _get_path(self._base_dir, key)
         path.unlink(missing_ok=True)
+        self._index.remove(path.name)
 
-    # TODO: runner, with lock
-    async def cleanup(self):
+    async def cleanup(self) -> None:
         """
-        Cleanup the file cache, removing stale entries.
+        Cleanup the file cache, removing expired and least recently used entries.
         """
-        infos: list[_CleanupInfo] = []
-        total_size: int = 0
-        limit_size: int = FILE_CACHE_SIZE_GB * 1024 * 1024 * 1024
-        now = time.time()
+        loop = get_running_loop()
+        await loop.run_in_executor(None, self._cleanup)
+
+    def _cleanup(self) -> None:
+        index = self._index
+        if not index.is_complete():
+            self._rebuild_index()
+
+        for name in index.pop_expired(time.time()):
+            logging.debug('Cache cleanup for %r (reason: time)', name)
+            _get_name_path(self._base_dir, name).unlink(missing_ok=True)
+
+        total_size = index.total_size()
+        logging.debug('File cache usage is %s of %s', naturalsize(total_size), naturalsize(self._max_size))
+        if total_size <= self._max_size:
+            return
 
-        for path in self._base_dir.rglob('*'):
-            key = path.name
+        for name in index.pop_least_recent(total_size - self._max_size):
+            logging.debug('Cache cleanup for %r (reason: size)', name)
+            _get_name_path(self._base_dir, name).unlink(missing_ok=True)
 
+    def _rebuild_index(self) -> None:
+        """
+        Index the entries which were created before the index existed, or whose index write failed.
+        """
+        logging.info('Indexing file cache %r', self._base_dir.name)
+        index = self._index
+        token = index.begin_rebuild()
+        for path in self._base_dir.glob('*/*/*'):
+            if path.name.startswith('.'):
+                continue  # skip temporary files
             try:
-                loop = get_running_loop()
-                entry_bytes = await loop.run_in_executor(None, path.read_bytes)
-                entry = FileCacheMeta.FromString(entry_bytes)
+                stat = path.stat()
+                entry = FileCacheMeta.FromString(path.read_bytes())
             except (OSError, DecodeError):
-                logging.debug('Cache read error for %r', key)
+                logging.debug('Cache read error for %r', path.name)
                 continue
+            expires_at = entry.expires_at if entry.HasField('expires_at') else float('inf')
+            index.put(path.name, expires_at, stat.st_size, stat.st_mtime, replace=False)
+        index.set_complete(token)
 
-            if entry.HasField('expires_at'):
-                if entry.expires_at < now:
-                    logging.debug('Cache cleanup for %r (reason: time)', key)
-                    path.unlink(missing_ok=True)
-                    continue
-                expires_at = entry.expires_at
-            else:
-                expires_at = float('inf')
 
-            size = path.stat().st_size
-            infos.append(_CleanupInfo(expires_at, size, path))
-            total_size += size
+class _FileCacheIndex:
+    """
+    Local metadata index of the file cache entries, shared by the processes.
+    """
 
-        logging.debug('File cache usage is %s of %s', naturalsize(total_size), naturalsize(limit_size))
-        if total_size <= limit_size:
-            return
+    __slots__ = ('_conn', '_lock', '_touched')
 
-        # prioritize cleanup of entries closer to expiration (iterating in reverse)
-        infos.sort(key=lambda info: info.expires_at, reverse=True)
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._lock = Lock()
+        self._touched: dict[str, float] = {}
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_index_schema)
 
-        while total_size > limit_size:
-            info = infos.pop()
-            key = info.path.name
-            logging.debug('Cache cleanup for %r (reason: size)', key)
-            info.path.unlink(missing_ok=True)
-            total_size -= info.size
+    def put(self, name: str, expires_at: float, size: int, accessed_at: float, *, replace: bool = True) -> None:
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        sql = f'{verb} INTO entry VALUES (?, ?, ?, ?)'  # noqa: S608
+        if not self._execute(sql, (name, expires_at, size, accessed_at)):
+            # the entry is not indexed, let the next cleanup rebuild the index
+            self._execute("DELETE FROM meta WHERE name = 'complete'", ())
+
+    def should_touch(self, name: str, accessed_at: float) -> bool:
+        """
+        Check if the entry access should be written, throttled in memory per process.
+        """
+        touched = self._touched
+        last_accessed_at = touched.get(name)
+        interval = FILE_CACHE_ACCESS_UPDATE_INTERVAL.total_seconds()
+        if (last_accessed_at is not None) and last_accessed_at + interval > accessed_at:
+            return False
+        if len(touched) >= _touched_limit:
+            touched.clear()
+        touched[name] = accessed_at
+        return True
+
+    def touch(self, name: str, accessed_at: float) -> None:
+        # limit the writes of the entries accessed by the other processes
+        self._execute(
+            'UPDATE entry SET accessed_at = ? WHERE key = ? AND accessed_at < ?',
+            (accessed_at, name, accessed_at - FILE_CACHE_ACCESS_UPDATE_INTERVAL.total_seconds()),
+        )
+
+    def remove(self, name: str) -> None:
+        self._execute('DELETE FROM entry WHERE key = ?', (name,))
+
+    def is_complete(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM meta WHERE name = 'complete' AND value = '1'").fetchone()
+        return row is not None
+
+    def begin_rebuild(self) -> str:
+        """
+        Start the index rebuild, returning the token for set_complete.
+        """
+        token = buffered_randbytes(16).hex()
+        self._execute("INSERT OR REPLACE INTO meta VALUES ('complete', ?)", (token,))
+        return token
+
+    def set_complete(self, token: str) -> None:
+        """
+        Mark the index as complete, unless an entry write failed since the rebuild started.
+        """
+        self._execute("UPDATE meta SET value = '1' WHERE name = 'complete' AND value = ?", (token,))
+
+    def pop_expired(self, now: float) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute('DELETE FROM entry WHERE expires_at < ? RETURNING key', (now,)).fetchall()
+        return [row[0] for row in rows]
+
+    def total_size(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entry').fetchone()[0]
+
+    def pop_least_recent(self, min_size: int) -> list[str]:
+        """
+        Remove the least recently accessed entries of at least the given total size.
+        """
+        result: list[str] = []
+        with self._lock:
+            freed_size = 0
+            for name, size in self._conn.execute('SELECT key, size FROM entry ORDER BY accessed_at'):
+                result.append(name)
+                freed_size += size
+                if freed_size >= min_size:
+                    break
+            self._conn.executemany('DELETE FROM entry WHERE key = ?', ((name,) for name in result))
+        return result
+
+    def _execute(self, sql: str, parameters: tuple) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute(sql, parameters)
+        except sqlite3.Error:
+            # the index is advisory, failed entry writes mark it incomplete for the next cleanup to rebuild
+            logging.warning('File cache index write failed', exc_info=True)
+            return False
+        return True
+
+
+async def _cleanup_runner() -> None:
+    """
+    Periodically cleanup all the file cache contexts, in a single process.
+    """
+    loop = get_running_loop()
+    interval = FILE_CACHE_CLEANUP_INTERVAL.total_seconds()
+    with FILE_CACHE_DIR.joinpath('.cleanup.lock').open('a') as lock_file:
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await sleep(interval)
+
+        logging.debug('Acquired the file cache cleanup lock')
+        while True:
+            caches = _caches.copy()
+            for base_dir in await loop.run_in_executor(None, tuple, FILE_CACHE_DIR.iterdir()):
+                if base_dir.is_dir() and base_dir not in caches:
+                    # not used by this process, assume the default settings
+                    caches[base_dir] = FileCache(base_dir.name)
+
+            for base_dir, cache in caches.items():
+                if not base_dir.is_dir():
+                    continue
+                try:
+                    await cache.cleanup()
+                except Exception:
+                    logging.warning('File cache cleanup failed for %r', base_dir.name, exc_info=True)
+            await sleep(interval)
+
+
+@lru_cache(maxsize=None)
+def _get_index(base_dir: Path) -> _FileCacheIndex:
+    return _FileCacheIndex(base_dir.joinpath(_index_name))
 
 
 @lru_cache(maxsize=1024)
@@ -136,5 +332,8 @@ def _get_path(base_dir: Path, key_str: str) -> Path:
     >>> _get_path(Path('context'), 'file_key')
     Path('.../context/46/8e/468e5f...')
     """
-    key: str = hash_hex(key_str)
-    return base_dir.joinpath(key[:2], key[2:4], key)
+    return _get_name_path(base_dir, hash_hex(key_str))
+
+
+def _get_name_path(base_dir: Path, name: str) -> Path:
+    return base_dir.joinpath(name[:2], name[2:4], name)
@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from time import monotonic
 from typing import Generic, TypeVar, overload
 
 K = TypeVar('K')
@@ -19,10 +20,12 @@ class LRUCache(Generic[K, V]):
         cache = self._cache  # read property once for performance
         if key in cache:
             cache.move_to_end(key)
-        else:
-            if len(cache) >= self._maxsize:
-                cache.popitem(last=False)
-            cache[key] = value
+        elif len(cache) >= self._maxsize:
+            cache.popitem(last=False)
+        cache[key] = value
+
+    def __len__(self) -> int:
+        return len(self._cache)
 
     @overload
     def get(self, key: K, /) -> V | None: ...
@@ -40,3 +43,64 @@ class LRUCache(Generic[K, V]):
             return default
         cache.move_to_end(key)
         return value  # pyright: ignore[reportReturnType]
+
+    def pop(self, key: K, /) -> V | None:
+        return self._cache.pop(key, None)
+
+    def items(self) -> list[tuple[K, V]]:
+        return list(self._cache.items())
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class SizedLRUCache(Generic[K]):
+    """
+    LRU cache of bytes values, bounded by the total values size, with per-entry expiration.
+    """
+
+    __slots__ = ('_maxsize', '_size', '_cache')
+
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._size = 0
+        self._cache: OrderedDict[K, tuple[bytes, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def set(self, key: K, value: bytes, ttl: float) -> None:
+        value_size = len(value)
+        if value_size > self._maxsize:
+            return
+
+        cache = self._cache  # read property once for performance
+        entry = cache.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+        while cache and self._size + value_size > self._maxsize:
+            _, (evicted, _) = cache.popitem(last=False)
+            self._size -= len(evicted)
+
+        cache[key] = (value, monotonic() + ttl)
+        self._size += value_size
+
+    def get(self, key: K, /) -> bytes | None:
+        cache = self._cache  # read property once for performance
+        entry = cache.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= monotonic():
+            del cache[key]
+            self._size -= len(value)
+            return None
+
+        cache.move_to_end(key)
+        return value
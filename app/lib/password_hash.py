@@ -1,4 +1,9 @@
 import base64
+import logging
+import time
+from asyncio import Task, create_task, get_running_loop, shield
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import md5, pbkdf2_hmac
 from hmac import compare_digest
 from typing import NamedTuple
@@ -7,6 +12,10 @@ from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
 from argon2.profiles import RFC_9106_LOW_MEMORY
 
+from app.config import SECRET
+from app.lib.crypto import hash_bytes
+from app.lib.exceptions_context import raise_for
+from app.limits import PASSWORD_HASH_QUEUE_LIMIT, PASSWORD_HASH_WORKERS
 from app.models.types import PasswordType
 
 
@@ -17,54 +26,112 @@ class VerifyResult(NamedTuple):
 
 _hasher = PasswordHasher.from_parameters(RFC_9106_LOW_MEMORY)
 
+# argon2 and hashlib release the GIL, so a thread pool is enough to keep the event loop responsive
+_executor = ThreadPoolExecutor(PASSWORD_HASH_WORKERS, thread_name_prefix='PasswordHash')
+_queue_depth: int = 0
+# keyed by the secret hash of the credentials, never holding the plaintext password
+_verify_inflight: dict[bytes, Task[VerifyResult]] = {}
+
 
 class PasswordHash:
     @staticmethod
-    def verify(password_hashed: str, password: PasswordType) -> VerifyResult:
+    async def verify(password_hashed: str, password: PasswordType) -> VerifyResult:
         """
         Verify a password against a hash and optional extra data.
+
+        Concurrent verifications of the same credentials share a single computation.
         """
-        # argon2
-        if password_hashed.startswith('$argon2'):
-            try:
-                _hasher.verify(password_hashed, password.get_secret_value())
-            except VerifyMismatchError:
-                return VerifyResult(False, False)
-            else:
-                rehash_needed = _hasher.check_needs_rehash(password_hashed)
-                return VerifyResult(True, rehash_needed)
-
-        password_hashed, _, extra = password_hashed.partition('.')
-
-        # md5 (deprecated)
-        if len(password_hashed) == 32:
-            salt = extra or ''
-            valid_hash = md5((salt + password.get_secret_value()).encode()).hexdigest()  # noqa: S324
-            success = compare_digest(password_hashed, valid_hash)
-            return VerifyResult(success, True)
-
-        # pbkdf2 (deprecated)
-        if '!' in extra:
-            password_hashed_b = base64.b64decode(password_hashed)
-            algorithm, iterations_, salt = extra.split('!')
-            iterations = int(iterations_)
-            valid_hash_b = pbkdf2_hmac(
-                hash_name=algorithm,
-                password=password.get_secret_value().encode(),
-                salt=salt.encode(),
-                iterations=iterations,
-                dklen=len(password_hashed_b),
-            )
-            success = compare_digest(password_hashed_b, valid_hash_b)
-            return VerifyResult(success, True)
-
-        raise NotImplementedError(
-            f'Unsupported password hash format: {password_hashed[:10]}***, len={len(password_hashed)}'
-        )
+        key = hash_bytes(SECRET + password_hashed + password.get_secret_value())
+        task = _verify_inflight.get(key)
+        if task is None:
+            task = create_task(_run(_verify, password_hashed, password))
+            task.add_done_callback(lambda _: _verify_inflight.pop(key, None))
+            _verify_inflight[key] = task
+        else:
+            logging.debug('Password verification coalesced')
+
+        # shield the shared computation from the cancellation of a single waiter
+        return await shield(task)
 
     @staticmethod
-    def hash(password: PasswordType) -> str:
+    async def hash(password: PasswordType) -> str:
         """
         Hash a password using latest recommended algorithm.
         """
-        return _hasher.hash(password.get_secret_value())
+        return await _run(_hasher.hash, password.get_secret_value())
+
+    @staticmethod
+    def get_queue_depth() -> int:
+        """
+        Get the number of pending and running password hash operations.
+        """
+        return _queue_depth
+
+
+async def _run[T](func: Callable[..., T], *args) -> T:
+    """
+    Run the hashing function in the bounded executor.
+
+    Raises too_many_requests if the queue is full.
+    """
+    global _queue_depth
+    if _queue_depth >= PASSWORD_HASH_QUEUE_LIMIT:
+        logging.warning('Password hash queue is full (queue depth: %d)', _queue_depth)
+        raise_for().too_many_requests()
+
+    _queue_depth += 1
+    try:
+        ts = time.perf_counter()
+        result = await get_running_loop().run_in_executor(_executor, func, *args)
+        logging.debug(
+            'Password hash %s took %.1f ms (queue depth: %d)',
+            func.__name__,
+            (time.perf_counter() - ts) * 1000,
+            _queue_depth,
+        )
+        return result
+    finally:
+        _queue_depth -= 1
+
+
+def _verify(password_hashed: str, password: PasswordType) -> VerifyResult:
+    """
+    Verify a password against a hash and optional extra data.
+    """
+    # argon2
+    if password_hashed.startswith('$argon2'):
+        try:
+            _hasher.verify(password_hashed, password.get_secret_value())
+        except VerifyMismatchError:
+            return VerifyResult(False, False)
+        else:
+            rehash_needed = _hasher.check_needs_rehash(password_hashed)
+            return VerifyResult(True, rehash_needed)
+
+    password_hashed, _, extra = password_hashed.partition('.')
+
+    # md5 (deprecated)
+    if len(password_hashed) == 32:
+        salt = extra or ''
+        valid_hash = md5((salt + password.get_secret_value()).encode()).hexdigest()  # noqa: S324
+        success = compare_digest(password_hashed, valid_hash)
+        return VerifyResult(success, True)
+
+    # pbkdf2 (deprecated)
+    if '!' in extra:
+        password_hashed_b = base64.b64decode(password_hashed)
+        algorithm, iterations_, salt = extra.split('!')
+        iterations = int(iterations_)
+        valid_hash_b = pbkdf2_hmac(
+            hash_name=algorithm,
+            password=password.get_secret_value().encode(),
+            salt=salt.encode(),
+            iterations=iterations,
+            dklen=len(password_hashed_b),
+        )
+        success = compare_digest(password_hashed_b, valid_hash_b)
+        return VerifyResult(success, True)
+
+    raise NotImplementedError(
+        f'Unsupported password hash format: {password_hashed[:10]}***, len={len(password_hashed)}'
+    )
@@ -1,16 +1,19 @@
 import logging
 import tomllib
-from asyncio import TaskGroup
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
 from enum import Enum
 from html import escape
 from pathlib import Path
+from typing import Any
 
 import bleach
 import cython
 from markdown_it import MarkdownIt
-from sqlalchemy import update
+from sqlalchemy import bindparam, update
 
 from app.db import db_commit
+from app.lib.crypto import hash_bytes
 from app.limits import RICH_TEXT_CACHE_EXPIRE
 from app.services.cache_service import CacheContext, CacheEntry, CacheService
 
@@ -34,6 +37,10 @@ _global_allowed_attributes = _allowed_attributes['*']
 _linkify_skip_tags = ('code', 'kbd', 'pre', 'samp', 'var')
 _md = MarkdownIt(options_update={'typographer': True})
 _md.enable(('replacements', 'smartquotes'))
+_cache_contexts: dict[TextFormat, CacheContext] = {
+    text_format: CacheService.enable_local(CacheContext(f'RichText:{text_format.value}'))  #
+    for text_format in TextFormat
+}
 
 
 def process_rich_text(text: str, text_format: TextFormat) -> str:
@@ -68,10 +75,8 @@ async def rich_text(text: str, cache_id: bytes | None, text_format: TextFormat)
 
     If cache_id is provided, it will be used to accelerate cache lookup.
     """
-    cache_context = CacheContext(f'RichText:{text_format.value}')
-
-    async def factory() -> bytes:
-        return process_rich_text(text, text_format).encode()
+    cache_context = _cache_contexts[text_format]
+    factory = _get_factory(text, text_format)
 
     # accelerate cache lookup by id if available
     if cache_id is not None:
@@ -98,50 +103,90 @@ class RichTextMixin:
         """
         Resolve rich text fields.
         """
-        fields = self.__rich_text_fields__
-        num_fields: int = len(fields)
-        if num_fields == 0:
-            logging.warning('%s has not defined rich text fields', type(self).__qualname__)
-            return
-
-        logging.debug('Resolving %d rich text fields', num_fields)
-        async with TaskGroup() as tg:
-            for field_name, text_format in fields:
-                tg.create_task(self._resolve_rich_text_task(field_name, text_format))
-
-    async def _resolve_rich_text_task(self, field_name: str, text_format: TextFormat) -> None:
-        rich_field_name = field_name + '_rich'
-        rich_hash_field_name = field_name + '_rich_hash'
+        await resolve_rich_text_many((self,))
+
+
+async def resolve_rich_text_many(objects: Iterable[RichTextMixin]) -> None:
+    """
+    Resolve rich text fields of many objects.
+
+    Fetches the cached values in bulk and updates the changed hashes with one statement per table and field.
+    """
+    items: list[tuple[bytes, CacheContext, Callable[[], Awaitable[bytes]]]] = []
+    targets: list[tuple[RichTextMixin, str]] = []
+
+    for obj in objects:
+        fields = obj.__rich_text_fields__
+        if not fields:
+            logging.warning('%s has not defined rich text fields', type(obj).__qualname__)
+            continue
+
+        for field_name, text_format in fields:
+            # skip if already resolved
+            if getattr(obj, field_name + '_rich') is not None:
+                continue
+
+            text: str = getattr(obj, field_name)
+            text_rich_hash: bytes | None = getattr(obj, field_name + '_rich_hash')
+
+            # accelerate cache lookup by id if available
+            cache_id = text_rich_hash if (text_rich_hash is not None) else hash_bytes(text)
+            items.append((cache_id, _cache_contexts[text_format], _get_factory(text, text_format)))
+            targets.append((obj, field_name))
 
-        # skip if already resolved
-        if getattr(self, rich_field_name) is not None:
-            return
+    if not items:
+        return
 
-        text = getattr(self, field_name)
-        text_rich_hash: bytes | None = getattr(self, rich_hash_field_name)
-        cache_entry = await rich_text(text, text_rich_hash, text_format)
-        cache_entry_id: bytes = cache_entry.id
+    logging.debug('Resolving %d rich text fields', len(items))
+    cache_entries = await CacheService.get_many(items, ttl=RICH_TEXT_CACHE_EXPIRE)
+    updates: dict[tuple[type, str], list[dict[str, Any]]] = defaultdict(list)
+
+    for (obj, field_name), cache_entry in zip(targets, cache_entries, strict=True):
+        rich_hash_field_name = field_name + '_rich_hash'
+        text_rich_hash = getattr(obj, rich_hash_field_name)
+        cache_entry_id = cache_entry.id
 
         # assign new hash if changed
         if text_rich_hash != cache_entry_id:
-            async with db_commit() as session:
-                cls = type(self)
+            updates[type(obj), rich_hash_field_name].append(
+                {
+                    '_id': obj.id,  # pyright: ignore[reportAttributeAccessIssue]
+                    '_old_hash': text_rich_hash,
+                    '_new_hash': cache_entry_id,
+                }
+            )
+            setattr(obj, rich_hash_field_name, cache_entry_id)
+
+        # assign value to instance
+        setattr(obj, field_name + '_rich', cache_entry.value.decode())
+
+    if updates:
+        async with db_commit() as session:
+            for (cls, rich_hash_field_name), params in updates.items():
+                logging.debug('Updating %d %s.%s values', len(params), cls.__qualname__, rich_hash_field_name)
+                table = cls.__table__  # pyright: ignore[reportAttributeAccessIssue]
+                column = table.c[rich_hash_field_name]
                 stmt = (
-                    update(cls)
+                    update(table)
                     .where(
-                        cls.id == self.id,  # pyright: ignore[reportAttributeAccessIssue]
-                        getattr(cls, rich_hash_field_name) == text_rich_hash,
+                        table.c.id == bindparam('_id'),
+                        column.is_not_distinct_from(bindparam('_old_hash')),
                     )
-                    .values({rich_hash_field_name: cache_entry_id})
-                    .inline()
+                    .values({column: bindparam('_new_hash')})
                 )
-                await session.execute(stmt)
+                await session.execute(stmt, params)
 
-            logging.debug('Rich text field %r hash was changed', field_name)
-            setattr(self, rich_hash_field_name, cache_entry_id)
 
-        # assign value to instance
-        setattr(self, rich_field_name, cache_entry.value.decode())
+@cython.cfunc
+def _get_factory(text: str, text_format: TextFormat) -> Callable[[], Awaitable[bytes]]:
+    """
+    Get the cache factory generating the rich text.
+    """
+
+    async def factory() -> bytes:
+        return process_rich_text(text, text_format).encode()
+
+    return factory
 
 
 @cython.cfunc
@@ -36,6 +36,14 @@ class StorageBase(ABC):
         """
         raise NotImplementedError
 
+    async def create(self, key: StorageKey, data: bytes) -> None:
+        """
+        Save a file to storage under the given key.
+
+        Raises FileExistsError if the key already exists, files are never overwritten.
+        """
+        raise NotImplementedError
+
     async def delete(self, key: StorageKey) -> None:
         """
         Delete a key from storage.
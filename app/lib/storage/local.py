@@ -42,6 +42,24 @@ class LocalStorage(StorageBase):
         temp_path.rename(path)
         return key
 
+    @override
+    async def create(self, key: StorageKey, data: bytes) -> None:
+        path = _get_path(self._base_dir, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        temp_name = f'.{buffered_randbytes(16).hex()}.tmp'
+        temp_path = path.with_name(temp_name)
+
+        with temp_path.open('xb') as f:
+            loop = get_running_loop()
+            await loop.run_in_executor(None, f.write, data)
+
+        try:
+            # unlike rename, link fails if the path exists
+            path.hardlink_to(temp_path)
+        finally:
+            temp_path.unlink()
+
     @override
     async def delete(self, key: StorageKey) -> None:
         path = _get_path(self._base_dir, key)
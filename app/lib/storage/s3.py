@@ -1,6 +1,7 @@
 from typing import override
 
 import aioboto3
+from botocore.exceptions import ClientError
 
 from app.lib.file_cache import FileCache
 from app.lib.storage.base import StorageBase
@@ -43,6 +44,16 @@ class S3Storage(StorageBase):
 
         return key
 
+    @override
+    async def create(self, key: StorageKey, data: bytes) -> None:
+        async with _s3.client('s3') as s3:
+            try:
+                await s3.put_object(Bucket=self._context, Key=key, Body=data, IfNoneMatch='*')
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'PreconditionFailed':
+                    raise FileExistsError(key) from e
+                raise
+
     @override
     async def delete(self, key: StorageKey) -> None:
         async with _s3.client('s3') as s3:
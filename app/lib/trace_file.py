@@ -6,11 +6,19 @@ import zipfile
 from abc import ABC, abstractmethod
 from collections.abc import Collection
 from io import BytesIO
+from secrets import randbelow
 from typing import ClassVar, override
 
 import cython
 import magic
-from zstandard import ZstdCompressor, ZstdDecompressor, ZstdError
+from zstandard import (
+    ZstdCompressionDict,
+    ZstdCompressor,
+    ZstdDecompressor,
+    ZstdError,
+    get_frame_parameters,
+    train_dictionary,
+)
 
 from app.lib.exceptions_context import raise_for
 from app.lib.naturalsize import naturalsize
@@ -19,8 +27,15 @@ from app.limits import (
     TRACE_FILE_COMPRESS_ZSTD_LEVEL,
     TRACE_FILE_COMPRESS_ZSTD_THREADS,
     TRACE_FILE_MAX_LAYERS,
+    TRACE_FILE_RECOMPRESS_ZSTD_LEVEL,
     TRACE_FILE_UNCOMPRESSED_MAX_SIZE,
+    TRACE_FILE_ZSTD_DICT_SIZE,
 )
+from app.models.types import StorageKey
+from app.storage import TRACE_DICTS_STORAGE
+
+# dictionaries are immutable, so they are safe to cache indefinitely
+_dicts: dict[int, ZstdCompressionDict] = {}
 
 
 class TraceFile:
@@ -64,15 +79,93 @@ class TraceFile:
         return _ZstdProcessor.compress(buffer), _ZstdProcessor.suffix
 
     @staticmethod
-    def decompress_if_needed(buffer: bytes, file_id: str) -> bytes:
+    def decompress_if_needed(
+        buffer: bytes,
+        file_id: str,
+        dict_data: ZstdCompressionDict | None = None,
+    ) -> bytes:
         """
         Decompress the trace file buffer if needed.
+
+        Recompressed files may need their dictionary, see TraceFile.get_dictionary.
         """
         if file_id.endswith(_ZstdProcessor.suffix):
-            return _ZstdProcessor.decompress(buffer)
+            return _ZstdProcessor.decompress(buffer, dict_data)
 
         return buffer
 
+    @staticmethod
+    def recompress(
+        buffer: bytes,
+        file_id: str,
+        *,
+        source_dict: ZstdCompressionDict | None = None,
+        dict_data: ZstdCompressionDict | None = None,
+    ) -> tuple[bytes, str] | None:
+        """
+        Recompress the stored trace file buffer at the high compression level.
+
+        The source_dict is used for decoding, the dict_data for encoding.
+
+        Returns the compressed buffer and the file name suffix, or None if not smaller.
+        """
+        result = _ZstdProcessor.compress(
+            TraceFile.decompress_if_needed(buffer, file_id, source_dict),
+            level=TRACE_FILE_RECOMPRESS_ZSTD_LEVEL,
+            dict_data=dict_data,
+        )
+        if len(result) >= len(buffer):
+            return None
+        return result, _ZstdProcessor.suffix
+
+    @staticmethod
+    async def get_dictionary(buffer: bytes, file_id: str) -> ZstdCompressionDict | None:
+        """
+        Get the compression dictionary referenced by the stored trace file frame header.
+
+        Returns None if the file does not use a dictionary.
+        """
+        if not file_id.endswith(_ZstdProcessor.suffix):
+            return None
+        try:
+            dict_id = get_frame_parameters(buffer).dict_id
+        except ZstdError:
+            raise_for().trace_file_archive_corrupted(_ZstdProcessor.media_type)
+        return (await TraceFile.load_dictionary(dict_id)) if dict_id else None
+
+    @staticmethod
+    async def load_dictionary(dict_id: int) -> ZstdCompressionDict:
+        """
+        Load the compression dictionary by id.
+        """
+        dict_data = _dicts.get(dict_id)
+        if dict_data is None:
+            dict_data = ZstdCompressionDict(await TRACE_DICTS_STORAGE.load(_get_dict_key(dict_id)))
+            _dicts[dict_id] = dict_data
+        return dict_data
+
+    @staticmethod
+    async def train_dictionary(samples: list[bytes]) -> int:
+        """
+        Train and store a new compression dictionary.
+
+        Dictionaries are immutable and never deleted, as stored files may reference them indefinitely.
+
+        Returns the dictionary id.
+        """
+        while True:
+            # ids outside of this range are reserved by the zstd format
+            dict_id = 32768 + randbelow((1 << 31) - 32768)
+            dict_data = train_dictionary(TRACE_FILE_ZSTD_DICT_SIZE, samples, dict_id=dict_id)
+            try:
+                await TRACE_DICTS_STORAGE.create(_get_dict_key(dict_id), dict_data.as_bytes())
+            except FileExistsError:
+                logging.debug('Trace compression dictionary %d already exists, retrying', dict_id)
+                continue
+            _dicts[dict_id] = dict_data
+            logging.info('Trained trace compression dictionary %d', dict_id)
+            return dict_id
+
 
 class _TraceProcessor(ABC):
     media_type: ClassVar[str]
@@ -193,9 +286,10 @@ class _ZstdProcessor(_TraceProcessor):
 
     @override
     @classmethod
-    def decompress(cls, buffer: bytes) -> bytes:
+    def decompress(cls, buffer: bytes, dict_data: ZstdCompressionDict | None = None) -> bytes:
         try:
-            result = ZstdDecompressor().decompress(buffer, allow_extra_data=False)
+            # files recompressed in the background may use a dictionary
+            result = ZstdDecompressor(dict_data=dict_data).decompress(buffer, allow_extra_data=False)
         except ZstdError:
             raise_for().trace_file_archive_corrupted(cls.media_type)
 
@@ -206,9 +300,16 @@ class _ZstdProcessor(_TraceProcessor):
         return result
 
     @classmethod
-    def compress(cls, buffer: bytes) -> bytes:
+    def compress(
+        cls,
+        buffer: bytes,
+        *,
+        level: int = TRACE_FILE_COMPRESS_ZSTD_LEVEL,
+        dict_data: ZstdCompressionDict | None = None,
+    ) -> bytes:
         result = ZstdCompressor(
-            level=TRACE_FILE_COMPRESS_ZSTD_LEVEL,
+            level=level,
+            dict_data=dict_data,
             threads=TRACE_FILE_COMPRESS_ZSTD_THREADS,
         ).compress(buffer)
 
@@ -227,3 +328,8 @@ _trace_processors: dict[str, type[_TraceProcessor]] = {
         _ZstdProcessor,
     )
 }
+
+
+@cython.cfunc
+def _get_dict_key(dict_id: int) -> StorageKey:
+    return StorageKey(f'{dict_id}.zstd-dict')
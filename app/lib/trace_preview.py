@@ -0,0 +1,45 @@
+import numpy as np
+from numpy.typing import NDArray
+
+from app.lib.mercator import mercator
+from app.limits import TRACE_PREVIEW_MAX_POINTS, TRACE_PREVIEW_RESOLUTION
+
+
+class TracePreview:
+    @staticmethod
+    def get_coords(coords: NDArray[np.float64]) -> NDArray[np.int64]:
+        """
+        Get the simplified mercator polyline of the trace coordinates.
+
+        Returns the pixel coordinates, without consecutive duplicates.
+        """
+        if len(coords) > TRACE_PREVIEW_MAX_POINTS:
+            indices = np.round(np.linspace(0, len(coords) - 1, TRACE_PREVIEW_MAX_POINTS)).astype(int)
+            coords = coords[indices]
+        if len(coords) < 2:
+            return np.empty((0, 2), dtype=np.int64)
+
+        result = mercator(coords, TRACE_PREVIEW_RESOLUTION, TRACE_PREVIEW_RESOLUTION).astype(np.int64)
+        mask = np.empty(len(result), dtype=bool)
+        mask[0] = True
+        mask[1:] = np.any(result[1:] != result[:-1], axis=1)
+        return result[mask]
+
+    @staticmethod
+    def encode(coords: NDArray[np.float64]) -> bytes:
+        """
+        Encode the preview polyline of the trace coordinates.
+
+        The pixel coordinates fit in a byte each, stored as the flattened x, y pairs.
+        """
+        return TracePreview.get_coords(coords).astype(np.uint8).tobytes()
+
+    @staticmethod
+    def decode(data: bytes) -> list[int]:
+        """
+        Decode the preview polyline into the flattened pixel coordinates.
+
+        >>> TracePreview.decode(bytes((1, 2, 3, 4)))
+        [1, 2, 3, 4]
+        """
+        return np.frombuffer(data, np.uint8).tolist()
@@ -1,6 +1,7 @@
 import logging
-from collections.abc import Callable, Sequence
+from collections.abc import Callable, Iterator, Sequence
 from datetime import UTC, datetime
+from io import BytesIO
 from typing import Any, Literal, Protocol, overload
 
 import cython
@@ -9,7 +10,7 @@ import lxml.etree as ET
 from app.lib.exceptions_context import raise_for
 from app.lib.format_style_context import format_is_json
 from app.lib.naturalsize import naturalsize
-from app.limits import XML_PARSE_MAX_SIZE
+from app.limits import RESPONSE_STREAM_CHUNK_SIZE, XML_PARSE_MAX_SIZE
 
 _parser = ET.XMLParser(
     ns_clean=True,
@@ -34,6 +35,44 @@ class XMLToDict:
         root = ET.fromstring(xml_bytes, parser=_parser)  # noqa: S320
         return {_strip_namespace(root.tag): _parse_element(root)}
 
+    @staticmethod
+    def parse_stream(xml_bytes: bytes, *, depth: int) -> Iterator[tuple[int, str, Any]]:
+        """
+        Parse XML string incrementally, yielding (depth, tag, value) tuples.
+
+        Elements shallower than depth are yielded on open, with their attributes only.
+        Elements at depth are yielded on close, fully parsed, and then freed.
+        """
+        if len(xml_bytes) > XML_PARSE_MAX_SIZE:
+            raise_for().input_too_big(len(xml_bytes))
+
+        logging.debug('Parsing %s XML stream', naturalsize(len(xml_bytes)))
+        max_depth: cython.int = depth
+        current_depth: cython.int = -1
+        for event, element in ET.iterparse(  # noqa: S320
+            BytesIO(xml_bytes),
+            events=('start', 'end'),
+            resolve_entities=False,
+            remove_comments=True,
+            remove_pis=True,
+            collect_ids=False,
+        ):
+            if event == 'start':
+                current_depth += 1
+                if current_depth < max_depth:
+                    yield current_depth, _strip_namespace(element.tag), _parse_attributes(element)
+                continue
+
+            if current_depth == max_depth:
+                yield current_depth, _strip_namespace(element.tag), _parse_element(element)
+
+                # free memory of the parsed elements
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+            current_depth -= 1
+
     @overload
     @staticmethod
     def unparse(d: dict[str, Any]) -> str: ...
@@ -70,6 +109,64 @@ class XMLToDict:
         else:
             return result.decode()
 
+    @staticmethod
+    def unparse_stream(d: dict[str, Any]) -> Iterator[bytes]:
+        """
+        Unparse dict to XML string chunks.
+
+        Iterator values of the root element are consumed lazily, one element at a time.
+        """
+        if len(d) != 1:
+            raise ValueError(f'Invalid root element count {len(d)}')
+
+        root_k, root_v = next(iter(d.items()))
+        root = ET.Element(root_k)
+        root_attrib = root.attrib  # read property once for performance
+        chunk_size_limit: cython.int = RESPONSE_STREAM_CHUNK_SIZE
+        chunk: list[bytes] = []
+        chunk_size: cython.int = 0
+        total_size: int = 0
+        is_open: cython.char = False
+
+        k: str
+        v: Any
+        for k, v in root_v.items() if isinstance(root_v, dict) else root_v:
+            if k and k[0] == '@':
+                if is_open:
+                    raise ValueError(f'Root attribute {k!r} must precede the children')
+                root_attrib[k[1:]] = _to_string(v)
+                continue
+            if k == '#text':
+                raise NotImplementedError('Root text is not supported when streaming')
+
+            values = v if isinstance(v, Iterator) else (v,)
+            for value in values:
+                for element in _unparse_element(k, value):
+                    # attributes are complete, write the opening tag (strip the self-closing "/>")
+                    if not is_open:
+                        is_open = True
+                        chunk.append(ET.tostring(root, encoding='UTF-8', xml_declaration=True)[:-2] + b'>')
+
+                    element_bytes = ET.tostring(element, encoding='UTF-8')
+                    chunk.append(element_bytes)
+                    chunk_size += len(element_bytes)
+
+                if chunk_size >= chunk_size_limit:
+                    total_size += chunk_size
+                    yield b''.join(chunk)
+                    chunk.clear()
+                    chunk_size = 0
+
+        # always return the root element, even if it's empty
+        if is_open:
+            chunk.append(f'</{root_k}>'.encode())
+        else:
+            chunk.append(ET.tostring(root, encoding='UTF-8', xml_declaration=True))
+
+        total_size += chunk_size
+        logging.debug('Unparsed %s XML stream', naturalsize(total_size))
+        yield b''.join(chunk)
+
 
 @cython.cfunc
 def _parse_element(element: ET._Element):
@@ -136,6 +233,19 @@ def _parse_element(element: ET._Element):
         return dict(parsed)
 
 
+@cython.cfunc
+def _parse_attributes(element: ET._Element) -> dict[str, Any]:
+    value_postprocessor: dict[str, Callable[[str], Any]] = _value_postprocessor
+    result: dict[str, Any] = {}
+    k: str
+    v_str: str
+    for k, v_str in element.attrib.items():  # pyright: ignore[reportAssignmentType]
+        k = '@' + k
+        call = value_postprocessor.get(k)
+        result[k] = call(v_str) if (call is not None) else v_str
+    return result
+
+
 @cython.cfunc
 def _unparse_element(key: str, value: Any) -> tuple[ET._Element, ...]:
     k: str
@@ -4,6 +4,9 @@ _kb = 1024
 _mb = 1024 * _kb
 
 AUTH_CREDENTIALS_CACHE_EXPIRE = timedelta(hours=8)
+AUTH_TOKEN_CACHE_EXPIRE = timedelta(seconds=30)  # upper bound for revocation to take effect
+AUTH_TOKEN_CACHE_MAX_SIZE = 10_000  # per process
+AUTH_TOKEN_INVALIDATE_RETRY_INTERVAL = timedelta(seconds=5)
 
 AVATAR_MAX_RATIO = 2
 AVATAR_MAX_MEGAPIXELS = 384 * 384  # (resolution)
@@ -18,6 +21,10 @@ CACHE_DEFAULT_EXPIRE = timedelta(days=3)
 CACHE_COMPRESS_MIN_SIZE = 512
 CACHE_COMPRESS_ZSTD_LEVEL = 1
 CACHE_COMPRESS_ZSTD_THREADS = 0  # disabled
+CACHE_LOCAL_MAX_EXPIRE = timedelta(minutes=10)
+CACHE_LOCAL_MAX_SIZE = 64 * _mb  # per process
+CACHE_LOCK_EXPIRE = timedelta(seconds=30)
+CACHE_LOCK_POLL_INTERVAL = timedelta(milliseconds=100)
 
 CHANGESET_IDLE_TIMEOUT = timedelta(hours=1)
 CHANGESET_OPEN_TIMEOUT = timedelta(days=1)
@@ -48,6 +55,8 @@ EMAIL_DELIVERABILITY_CACHE_EXPIRE = timedelta(hours=1)
 EMAIL_DELIVERABILITY_DNS_TIMEOUT = timedelta(seconds=10)
 
 ELEMENT_HISTORY_PAGE_SIZE = 10
+ELEMENT_SEQUENCE_HEAD_EXPIRE = timedelta(seconds=10)
+ELEMENT_SEQUENCE_HEAD_POLL_INTERVAL = timedelta(milliseconds=100)
 ELEMENT_TAGS_LIMIT = 600
 ELEMENT_TAGS_MAX_SIZE = 64 * _kb
 ELEMENT_TAGS_KEY_MAX_LENGTH = 63
@@ -56,6 +65,9 @@ ELEMENT_RELATION_MEMBERS_LIMIT = 32_000
 
 FEATURE_PREFIX_TAGS_LIMIT = 100
 
+FILE_CACHE_ACCESS_UPDATE_INTERVAL = timedelta(hours=1)
+FILE_CACHE_CLEANUP_INTERVAL = timedelta(minutes=15)
+
 FIND_LIMIT = 100
 
 GEO_COORDINATE_PRECISION = 7
@@ -72,6 +84,10 @@ MAIL_UNPROCESSED_EXPIRE = timedelta(days=3)
 
 MAP_QUERY_AREA_MAX_SIZE = 0.25  # in square degrees
 MAP_QUERY_LEGACY_NODES_LIMIT = 50_000
+MAP_TILE_CACHE_BUILD_CONCURRENCY = 4  # per request
+MAP_TILE_CACHE_EXPIRE = timedelta(hours=1)
+MAP_TILE_CACHE_MAX_TILES = 64
+MAP_TILE_CACHE_SIZE = 0.01  # in degrees
 
 MESSAGE_BODY_MAX_LENGTH = 50_000  # NOTE: value TBD
 
@@ -98,6 +114,7 @@ OAUTH2_APP_USER_LIMIT = 100
 OAUTH2_CODE_CHALLENGE_MAX_LENGTH = 255  # TODO:
 OAUTH2_SILENT_AUTH_QUERY_SESSION_LIMIT = 10
 
+OPTIMISTIC_DIFF_LOCK_MAX_REFS = 10_000  # above, the diff locks exclusively (bounded by max_locks_per_transaction)
 OPTIMISTIC_DIFF_RETRY_TIMEOUT = timedelta(seconds=30)
 
 OVERPASS_CACHE_EXPIRE = timedelta(hours=1)
@@ -106,8 +123,15 @@ OVERPASS_CACHE_EXPIRE = timedelta(hours=1)
 EMAIL_MIN_LENGTH = 5
 PASSWORD_MIN_LENGTH = 6
 PASSWORD_MAX_LENGTH = 255  # TODO:
+PASSWORD_HASH_QUEUE_LIMIT = 64  # pending + running
+PASSWORD_HASH_WORKERS = 4
 ACTIVE_SESSIONS_DISPLAY_LIMIT = 100
 
+RATE_LIMIT_WINDOW = timedelta(hours=1)  # time to refill the entire quota
+RATE_LIMIT_LOCAL_TOLERANCE = 0.01  # fraction of quota, consumed locally before syncing (per process)
+RATE_LIMIT_LOCAL_SYNC_INTERVAL = timedelta(seconds=1)
+RATE_LIMIT_LOCAL_MAX_KEYS = 100_000  # per process
+
 REPORT_BODY_MAX_LENGTH = 50_000  # NOTE: value TBD
 
 RICH_TEXT_CACHE_EXPIRE = timedelta(hours=8)
@@ -130,8 +154,13 @@ TRACE_FILE_UNCOMPRESSED_MAX_SIZE = 80 * _mb
 TRACE_FILE_ARCHIVE_MAX_FILES = 10
 TRACE_FILE_MAX_LAYERS = 2
 TRACE_FILE_COMPRESS_ZSTD_THREADS = 0  # disabled
-# TODO: background trask to recompress files on disk
-TRACE_FILE_COMPRESS_ZSTD_LEVEL = 1
+TRACE_FILE_COMPRESS_ZSTD_LEVEL = 1  # recompressed in the background
+TRACE_FILE_RECOMPRESS_ZSTD_LEVEL = 19
+TRACE_FILE_RECOMPRESS_WORKERS = 1
+TRACE_FILE_ZSTD_DICT_SIZE = 112 * _kb
+
+TRACE_PREVIEW_MAX_POINTS = 100
+TRACE_PREVIEW_RESOLUTION = 100  # in pixels
 
 TRACE_POINT_QUERY_AREA_MAX_SIZE = 0.25  # in square degrees
 TRACE_POINT_QUERY_DEFAULT_LIMIT = 5_000
@@ -166,3 +195,5 @@ XML_PARSE_MAX_SIZE = 50 * _mb  # the same as CGImap
 
 REQUEST_BODY_MAX_SIZE = max(TRACE_FILE_UPLOAD_MAX_SIZE, XML_PARSE_MAX_SIZE) + 5 * _mb  # MAX + 5 MB
 REQUEST_PATH_QUERY_MAX_LENGTH = 2 * _kb
+
+RESPONSE_STREAM_CHUNK_SIZE = 64 * _kb
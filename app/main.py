@@ -20,6 +20,7 @@ from app.config import (
     NAME,
     TEST_ENV,
 )
+from app.lib.file_cache import FileCache
 from app.lib.starlette_convertor import ElementTypeConvertor
 from app.lib.yarn_lock import ID_VERSION, RAPID_VERSION
 from app.limits import (
@@ -43,6 +44,7 @@ from app.middlewares.unsupported_browser_middleware import UnsupportedBrowserMid
 from app.middlewares.version_middleware import VersionMiddleware
 from app.responses.osm_response import setup_api_router_response
 from app.responses.precompressed_static_files import PrecompressedStaticFiles
+from app.services.auth_service import AuthService
 from app.services.email_service import EmailService
 from app.services.system_app_service import SystemAppService
 from app.services.test_service import TestService
@@ -80,7 +82,7 @@ async def lifespan(_):
     await TestService.on_startup()
     await SystemAppService.on_startup()
 
-    async with EmailService.context():
+    async with AuthService.context(), EmailService.context(), FileCache.context():
         yield
 
 
@@ -1,17 +1,75 @@
 import logging
 from functools import wraps
+from hashlib import sha1
+from math import ceil
+from time import monotonic
 
 import cython
 from fastapi import HTTPException
+from redis.exceptions import NoScriptError
 from starlette import status
 from starlette.datastructures import MutableHeaders
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.db import valkey
 from app.lib.auth_context import auth_user
+from app.lib.lru_cache import LRUCache
 from app.lib.user_role_limits import UserRoleLimits
+from app.limits import (
+    RATE_LIMIT_LOCAL_MAX_KEYS,
+    RATE_LIMIT_LOCAL_SYNC_INTERVAL,
+    RATE_LIMIT_LOCAL_TOLERANCE,
+    RATE_LIMIT_WINDOW,
+)
 from app.middlewares.request_context_middleware import get_request
 
+_window_seconds = int(RATE_LIMIT_WINDOW.total_seconds())
+_sync_interval_seconds = RATE_LIMIT_LOCAL_SYNC_INTERVAL.total_seconds()
+
+# token bucket refilling at quota per window
+# the pending tokens were already consumed locally and are always subtracted (going negative on weight overrides,
+# down to -quota), the requested tokens are only subtracted if available, so rejected requests consume nothing
+# KEYS: bucket key, ARGV: quota, refill rate (per second), pending tokens, requested tokens
+# returns: remaining tokens, 1 if the requested tokens were consumed
+_token_bucket_script = b"""
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local quota = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[4])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tokens = quota
+if state[1] then
+    tokens = math.min(quota, tonumber(state[1]) + (now - tonumber(state[2])) * rate)
+end
+tokens = math.max(-quota, tokens - tonumber(ARGV[3]))
+local consumed = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    consumed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((quota - tokens) / rate) + 1)
+return {tostring(tokens), consumed}
+"""
+_token_bucket_sha = sha1(_token_bucket_script, usedforsecurity=False).hexdigest()
+
+
+class _LocalBucket:
+    """
+    Last known state of the shared bucket, with the locally consumed tokens.
+    """
+
+    __slots__ = ('tokens', 'synced_at', 'pending')
+
+    def __init__(self) -> None:
+        self.tokens: float = 0
+        self.synced_at: float = float('-inf')  # never synced
+        self.pending: int = 0
+
+
+_local_buckets: LRUCache[str, _LocalBucket] = LRUCache(RATE_LIMIT_LOCAL_MAX_KEYS)
+
 
 class RateLimitMiddleware:
     """
@@ -47,7 +105,7 @@ def rate_limit(*, weight: int = 1):
     """
     Decorator to rate-limit an endpoint.
 
-    The rate limit quota is global and per-deployment.
+    The rate limit quota is global and per-deployment, refilled continuously over RATE_LIMIT_WINDOW.
 
     The weight can be overridden during execution using set_rate_limit_weight method.
     """
@@ -87,34 +145,59 @@ def rate_limit(*, weight: int = 1):
 
 async def _increase_counter(key: str, change: int, quota: cython.int, *, raise_on_limit: bool) -> dict[str, str]:
     """
-    Increase the rate limit counter and raise HTTPException if the limit is exceeded.
+    Consume the rate limit tokens and raise HTTPException if the limit is exceeded.
 
-    Returns the rate limit response headers.
-    """
-    async with valkey() as conn, conn.pipeline() as pipe:
-        pipe.incrby(key, change)
-        pipe.expire(key, 3600, nx=True)
-        pipe.ttl(key)
-        result = await pipe.execute()
+    A rejected request consumes no tokens, so a client retrying while limited recovers at the refill rate.
 
-    current_usage: cython.int = result[0]
-    expires_in_str: str = str(result[2])
-    remaining_quota: cython.int = quota - current_usage
-    if remaining_quota < 0:
-        remaining_quota = 0
+    Consumption is aggregated locally and synced with Valkey once it exceeds the tolerance,
+    the sync interval passes, or the quota is nearly exhausted. A steadily active client is
+    therefore synced about once per sync interval, and on every request near the limit.
 
-    rate_limit_header = f'limit={quota}, remaining={remaining_quota}, reset={expires_in_str}'
-    rate_limit_policy_header = f'{quota};w=3600;burst=0'
+    Returns the rate limit response headers.
+    """
+    rate: cython.double = quota / _window_seconds
+    tolerance: cython.double = quota * RATE_LIMIT_LOCAL_TOLERANCE
+    now: cython.double = monotonic()
+
+    bucket = _local_buckets.get(key)
+    if bucket is None:
+        bucket = _local_buckets[key] = _LocalBucket()
+
+    # estimate the shared bucket state
+    remaining: cython.double = min(quota, bucket.tokens + (now - bucket.synced_at) * rate) - bucket.pending - change
+
+    consumed: bool = True
+
+    if (
+        bucket.pending + change > tolerance  #
+        or now - bucket.synced_at > _sync_interval_seconds
+        or remaining < tolerance
+    ):
+        pending = bucket.pending
+        bucket.pending = 0  # concurrent requests aggregate into the next sync
+        if raise_on_limit:
+            remaining, consumed = await _sync_bucket(key, pending, change, quota, rate)
+        else:
+            remaining, consumed = await _sync_bucket(key, pending + change, 0, quota, rate)
+        bucket.tokens = remaining
+        bucket.synced_at = now
+    else:
+        bucket.pending += change
+
+    remaining_quota: cython.int = int(remaining) if remaining > 0 else 0
+    reset_str = str(ceil((quota - remaining) / rate))
+    rate_limit_header = f'limit={quota}, remaining={remaining_quota}, reset={reset_str}'
+    rate_limit_policy_header = f'{quota};w={_window_seconds}'
 
     # check if the rate limit is exceeded
-    if current_usage > quota and raise_on_limit:
+    if not consumed:
         raise HTTPException(
             status.HTTP_429_TOO_MANY_REQUESTS,
             detail='Rate limit exceeded',
             headers={
                 'RateLimit': rate_limit_header,
                 'RateLimit-Policy': rate_limit_policy_header,
-                'Retry-After': expires_in_str,
+                'Retry-After': str(ceil((change - remaining) / rate)),
             },
         )
 
@@ -124,6 +207,22 @@ async def _increase_counter(key: str, change: int, quota: cython.int, *, raise_o
     }
 
 
+async def _sync_bucket(key: str, pending: int, requested: int, quota: int, rate: float) -> tuple[float, bool]:
+    """
+    Consume the tokens from the shared bucket.
+
+    Returns the remaining tokens and whether the requested tokens were consumed.
+    """
+    async with valkey() as conn:
+        try:
+            result: list = await conn.evalsha(_token_bucket_sha, 1, key, quota, rate, pending, requested)
+        except NoScriptError:
+            # the script cache is empty after a server restart
+            await conn.script_load(_token_bucket_script)
+            result = await conn.evalsha(_token_bucket_sha, 1, key, quota, rate, pending, requested)
+    return float(result[0]), bool(result[1])
+
+
 def set_rate_limit_weight(weight: int) -> None:
     """
     Override the request weight for rate limiting.
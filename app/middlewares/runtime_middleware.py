@@ -1,12 +1,15 @@
 import time
+from contextvars import ContextVar
 
 from starlette.datastructures import MutableHeaders
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+_timings_context: ContextVar[dict[str, float]] = ContextVar('Timings')
+
 
 class RuntimeMiddleware:
     """
-    Add X-Runtime header to responses.
+    Add X-Runtime and Server-Timing headers to responses.
     """
 
     __slots__ = ('app',)
@@ -20,13 +23,33 @@ class RuntimeMiddleware:
             return
 
         ts = time.perf_counter()
+        timings: dict[str, float] = {}
 
         async def wrapper(message: Message) -> None:
             if message['type'] == 'http.response.start':
                 te = time.perf_counter()
                 headers = MutableHeaders(raw=message['headers'])
                 headers['X-Runtime'] = f'{te - ts:.5f}'
+                if timings:
+                    headers['Server-Timing'] = ', '.join(
+                        f'{name};dur={duration * 1000:.3f}' for name, duration in timings.items()
+                    )
 
             await send(message)
 
-        await self.app(scope, receive, wrapper)
+        token = _timings_context.set(timings)
+        try:
+            await self.app(scope, receive, wrapper)
+        finally:
+            _timings_context.reset(token)
+
+
+def record_timing(name: str, duration: float) -> None:
+    """
+    Add the duration (in seconds) to the named timing of the current request.
+
+    The timings are reported in the Server-Timing header, only when the middleware is enabled.
+    """
+    timings = _timings_context.get(None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0) + duration
@@ -1,7 +1,7 @@
 import enum
 from ipaddress import IPv4Address, IPv6Address
 
-from sqlalchemy import Computed, Enum, ForeignKey, LargeBinary, UnicodeText
+from sqlalchemy import Computed, Enum, ForeignKey, Index, LargeBinary, UnicodeText
 from sqlalchemy.dialects.postgresql import INET, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
@@ -50,6 +50,8 @@ class NoteComment(Base.Sequential, CreatedAtMixin, RichTextMixin):
     body_rich: str | None = None
     legacy_note: Note | None = None
 
+    __table_args__ = (Index('note_comment_body_idx', body_tsvector, postgresql_using='gin'),)
+
     @validates('body')
     def validate_body(self, _: str, value: str) -> str:
         if len(value) > NOTE_COMMENT_BODY_MAX_LENGTH:
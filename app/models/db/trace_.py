@@ -1,7 +1,7 @@
 from collections.abc import Collection, Container
 from typing import Literal, get_args
 
-from sqlalchemy import ARRAY, ColumnElement, Enum, ForeignKey, Integer, Unicode, true
+from sqlalchemy import ARRAY, ColumnElement, Enum, ForeignKey, Integer, LargeBinary, Unicode, true
 from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
@@ -30,6 +30,12 @@ class Trace(Base.Sequential, CreatedAtMixin, UpdatedAtMixin):
 
     size: Mapped[int] = mapped_column(Integer, nullable=False)
     file_id: Mapped[StorageKey] = mapped_column(Unicode(STORAGE_KEY_MAX_LENGTH), init=False, nullable=False)
+    preview: Mapped[bytes | None] = mapped_column(
+        LargeBinary,
+        init=False,
+        nullable=True,
+        server_default=None,
+    )
 
     # defaults
     tags: Mapped[list[str]] = mapped_column(
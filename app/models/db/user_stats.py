@@ -0,0 +1,45 @@
+from collections.abc import Container
+from datetime import date
+
+from sqlalchemy import Date, ForeignKey, Integer, PrimaryKeyConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.db.base import Base
+from app.models.db.user import User
+from app.models.scope import Scope
+
+
+class UserStats(Base.NoID):
+    __tablename__ = 'user_stats'
+
+    user_id: Mapped[int] = mapped_column(ForeignKey(User.id, ondelete='CASCADE'), nullable=False)
+    changesets: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    changeset_comments: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    notes: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    # excluding the opening comments
+    note_comments: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    traces: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    traces_public: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    messages_received: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    messages_unread: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    messages_sent: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (PrimaryKeyConstraint(user_id),)
+
+    def traces_visible_to(self, user: User | None, scopes: Container[Scope]) -> int:
+        """
+        Count the traces visible to the given user, consistent with Trace.visible_to.
+        """
+        if (user is not None) and Scope.read_gpx in scopes and user.id == self.user_id:
+            return self.traces
+        return self.traces_public
+
+
+class UserActivity(Base.NoID):
+    __tablename__ = 'user_activity'
+
+    user_id: Mapped[int] = mapped_column(ForeignKey(User.id, ondelete='CASCADE'), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    changesets: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (PrimaryKeyConstraint(user_id, day),)
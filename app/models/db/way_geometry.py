@@ -0,0 +1,18 @@
+from shapely import LineString
+from sqlalchemy import BigInteger, PrimaryKeyConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.db.base import Base
+from app.models.element import ElementId
+from app.models.geometry import LineStringType
+
+
+class WayGeometry(Base.NoID):
+    __tablename__ = 'way_geometry'
+
+    id: Mapped[ElementId] = mapped_column(BigInteger, nullable=False)
+    # the geometry is valid when reading at this sequence_id or later
+    sequence_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    geometry: Mapped[LineString] = mapped_column(LineStringType, nullable=False)
+
+    __table_args__ = (PrimaryKeyConstraint(id, name='way_geometry_pkey'),)
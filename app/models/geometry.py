@@ -80,3 +80,8 @@ class PolygonType(_GeometryType):
 class MultiPointType(_GeometryType):
     geometry_type = 'MultiPoint'
     cache_ok = True
+
+
+class LineStringType(_GeometryType):
+    geometry_type = 'LineString'
+    cache_ok = True
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import msgspec
+
+from app.models.element import ElementType
+
+
+class MapTileElement(msgspec.Struct, array_like=True, forbid_unknown_fields=True):
+    sequence_id: int
+    changeset_id: int
+    type: ElementType
+    id: int
+    version: int
+    visible: bool
+    tags: dict[str, str]
+    point: tuple[float, float] | None
+    members: list[tuple[ElementType, int, str]]
+    created_at: datetime
+
+
+class MapTile(msgspec.Struct, array_like=True, forbid_unknown_fields=True):
+    built_at: int  # sequence_id read before querying the elements
+    elements: list[MapTileElement]
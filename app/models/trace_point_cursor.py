@@ -0,0 +1,16 @@
+from typing import NamedTuple
+
+import msgspec
+
+
+class TraceSegmentPosition(NamedTuple):
+    trace_id: int
+    track_num: int
+    segment_num: int
+    point_offset: int  # among the segment points within the query geometry
+
+
+class TracePointCursor(msgspec.Struct, array_like=True, forbid_unknown_fields=True):
+    created_at: int  # unix timestamp
+    public: TraceSegmentPosition | None  # None when exhausted
+    private: TraceSegmentPosition | None  # None when exhausted
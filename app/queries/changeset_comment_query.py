@@ -1,12 +1,12 @@
-from asyncio import TaskGroup
 from collections.abc import Collection, Iterable
 
-import cython
-from sqlalchemy import Select, func, select, text, union_all
+from sqlalchemy import BigInteger, func, literal, select, text, true
+from sqlalchemy.dialects.postgresql import ARRAY, TIMESTAMP
 
 from app.db import db
 from app.lib.auth_context import auth_user
 from app.lib.options_context import apply_options_context
+from app.lib.rich_text import resolve_rich_text_many
 from app.models.db.changeset import Changeset
 from app.models.db.changeset_comment import ChangesetComment
 from app.models.db.changeset_subscription import ChangesetSubscription
@@ -68,25 +68,25 @@ class ChangesetCommentQuery:
             id_comments_map[changeset.id] = changeset.comments = []
 
         async with db() as session:
-            stmts: list[Select] = [None] * len(changesets)  # pyright: ignore[reportAssignmentType]
-            i: cython.int
-            for i, changeset in enumerate(changesets):
-                stmt_ = select(ChangesetComment.id).where(
-                    ChangesetComment.changeset_id == changeset.id,
-                    ChangesetComment.created_at <= changeset.updated_at,
+            parents = (
+                func.unnest(
+                    literal([changeset.id for changeset in changesets], ARRAY(BigInteger)),
+                    literal([changeset.updated_at for changeset in changesets], ARRAY(TIMESTAMP(True))),
                 )
-                if limit_per_changeset is not None:
-                    subq = (
-                        stmt_.order_by(ChangesetComment.created_at.desc())
-                        .limit(limit_per_changeset)  #
-                        .subquery()
-                    )
-                    stmt_ = select(subq.c.id).select_from(subq)
-                stmts[i] = stmt_
+                .table_valued('id', 'updated_at')
+                .render_derived()
+            )
+            subq = select(ChangesetComment.id).where(
+                ChangesetComment.changeset_id == parents.c.id,
+                ChangesetComment.created_at <= parents.c.updated_at,
+            )
+            if limit_per_changeset is not None:
+                subq = subq.order_by(ChangesetComment.created_at.desc()).limit(limit_per_changeset)
+            subq = subq.lateral()
 
             stmt = (
                 select(ChangesetComment)
-                .where(ChangesetComment.id.in_(union_all(*stmts).subquery().select()))
+                .where(ChangesetComment.id.in_(select(subq.c.id).select_from(parents).join(subq, true())))
                 .order_by(ChangesetComment.created_at.asc())
             )
             stmt = apply_options_context(stmt)
@@ -105,6 +105,4 @@ class ChangesetCommentQuery:
             changeset.num_comments = len(changeset.comments)  # pyright: ignore[reportArgumentType]
 
         if resolve_rich_text:
-            async with TaskGroup() as tg:
-                for comment in comments:
-                    tg.create_task(comment.resolve_rich_text())
+            await resolve_rich_text_many(comments)
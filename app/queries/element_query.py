@@ -7,7 +7,22 @@ from typing import Literal
 
 import cython
 from shapely.geometry.base import BaseGeometry
-from sqlalchemy import Select, and_, func, null, or_, select, text, true, union_all
+from sqlalchemy import (
+    ARRAY,
+    BigInteger,
+    Select,
+    Unicode,
+    and_,
+    cast,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    text,
+    true,
+    union_all,
+)
 
 from app.config import LEGACY_SEQUENCE_ID_MARGIN
 from app.db import db
@@ -66,22 +81,28 @@ class ElementQuery:
         if not versioned_refs:
             return True
 
+        refs = _unnest(
+            ('type', 'id', 'version'),
+            (
+                [versioned_ref.type for versioned_ref in versioned_refs],
+                [versioned_ref.id for versioned_ref in versioned_refs],
+                [versioned_ref.version for versioned_ref in versioned_refs],
+            ),
+        )
+
         async with db() as session:
             stmt = (
                 select(text('1'))
-                .where(
-                    Element.next_sequence_id != null(),
-                    or_(
-                        *(
-                            and_(
-                                Element.type == versioned_ref.type,
-                                Element.id == versioned_ref.id,
-                                Element.version == versioned_ref.version,
-                            )
-                            for versioned_ref in versioned_refs
-                        ),
+                .select_from(refs)
+                .join(
+                    Element,
+                    and_(
+                        Element.type == refs.c.type,
+                        Element.id == refs.c.id,
+                        Element.version == refs.c.version,
                     ),
                 )
+                .where(Element.next_sequence_id != null())
                 .limit(1)
             )
             return await session.scalar(stmt) is None
@@ -96,21 +117,26 @@ class ElementQuery:
         if not member_refs:
             return True
 
+        refs = _unnest(
+            ('type', 'id'),
+            (
+                [member_ref.type for member_ref in member_refs],
+                [member_ref.id for member_ref in member_refs],
+            ),
+        )
+
         async with db() as session:
             stmt = (
                 select(text('1'))
-                .where(
-                    ElementMember.sequence_id > after_sequence_id,
-                    or_(
-                        *(
-                            and_(
-                                ElementMember.type == member_ref.type,
-                                ElementMember.id == member_ref.id,
-                            )
-                            for member_ref in member_refs
-                        ),
+                .select_from(refs)
+                .join(
+                    ElementMember,
+                    and_(
+                        ElementMember.type == refs.c.type,
+                        ElementMember.id == refs.c.id,
                     ),
                 )
+                .where(ElementMember.sequence_id > after_sequence_id)
                 .limit(1)
             )
             return await session.scalar(stmt) is None
@@ -245,6 +271,18 @@ class ElementQuery:
 
             return (await session.scalars(stmt)).all()
 
+    @staticmethod
+    async def get_by_sequence_ids(sequence_ids: Collection[int]) -> Sequence[Element]:
+        """
+        Get elements by the sequence ids.
+        """
+        if not sequence_ids:
+            return ()
+
+        async with db() as session:
+            stmt = _select().where(Element.sequence_id.in_(text(','.join(map(str, sequence_ids)))))
+            return (await session.scalars(stmt)).all()
+
     @staticmethod
     async def get_by_refs(
         element_refs: Collection[ElementRef],
@@ -700,3 +738,21 @@ def _select():
     )
     result: Select[Element] = select(bundle)  # pyright: ignore
     return result
+
+
+@cython.cfunc
+def _unnest(names: tuple[str, ...], arrays: tuple[list, ...]):
+    """
+    Create a table of element refs from the parallel arrays, bound as single parameters.
+
+    Unlike a chain of OR predicates, the statement size does not depend on the number of refs.
+    """
+    type_array, *other_arrays = arrays
+    return (
+        func.unnest(
+            cast(literal(type_array, ARRAY(Unicode)), ARRAY(Element.type.type)),
+            *(literal(array, ARRAY(BigInteger)) for array in other_arrays),
+        )
+        .table_valued(*names)
+        .render_derived()
+    )
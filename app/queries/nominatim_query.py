@@ -54,6 +54,7 @@ class NominatimQuery:
             context=_cache_context,
             factory=factory,
             ttl=NOMINATIM_CACHE_LONG_EXPIRE,
+            lock=True,
         )
         response_entries = (JSON_DECODE(cache.value),)
         result = await _get_result(at_sequence_id=None, response_entries=response_entries)
@@ -131,6 +132,7 @@ async def _search(
             factory=factory,
             hash_key=True,
             ttl=NOMINATIM_CACHE_SHORT_EXPIRE,
+            lock=True,
         )
         response = cache.value
     else:
@@ -1,14 +1,14 @@
-from asyncio import TaskGroup
 from collections.abc import Collection, Sequence
 from typing import Literal
 
-import cython
 from shapely.geometry.base import BaseGeometry
-from sqlalchemy import Select, func, select, text, union_all
+from sqlalchemy import BigInteger, func, literal, select, text, true
+from sqlalchemy.dialects.postgresql import ARRAY, TIMESTAMP
 
 from app.db import db
 from app.lib.auth_context import auth_user
 from app.lib.options_context import apply_options_context
+from app.lib.rich_text import resolve_rich_text_many
 from app.models.db.note import Note
 from app.models.db.note_comment import NoteComment
 from app.models.db.note_subscription import NoteSubscription
@@ -69,27 +69,27 @@ class NoteCommentQuery:
             id_comments_map[note.id] = note.comments = []
 
         async with db() as session:
-            stmts: list[Select] = [None] * len(notes)  # pyright: ignore[reportAssignmentType]
-            i: cython.int
-            for i, note in enumerate(notes):
-                stmt_ = select(NoteComment.id).where(
-                    NoteComment.note_id == note.id,
-                    NoteComment.created_at <= note.updated_at,
+            parents = (
+                func.unnest(
+                    literal([note.id for note in notes], ARRAY(BigInteger)),
+                    literal([note.updated_at for note in notes], ARRAY(TIMESTAMP(True))),
                 )
-                if per_note_limit is not None:
-                    subq = (
-                        stmt_.order_by(
-                            NoteComment.created_at.asc() if per_note_sort == 'asc' else NoteComment.created_at.desc()
-                        )
-                        .limit(per_note_limit)
-                        .subquery()
-                    )
-                    stmt_ = select(subq.c.id).select_from(subq)
-                stmts[i] = stmt_
+                .table_valued('id', 'updated_at')
+                .render_derived()
+            )
+            subq = select(NoteComment.id).where(
+                NoteComment.note_id == parents.c.id,
+                NoteComment.created_at <= parents.c.updated_at,
+            )
+            if per_note_limit is not None:
+                subq = subq.order_by(
+                    NoteComment.created_at.asc() if per_note_sort == 'asc' else NoteComment.created_at.desc()
+                ).limit(per_note_limit)
+            subq = subq.lateral()
 
             stmt = (
                 select(NoteComment)
-                .where(NoteComment.id.in_(union_all(*stmts).subquery().select()))
+                .where(NoteComment.id.in_(select(subq.c.id).select_from(parents).join(subq, true())))
                 .order_by(NoteComment.created_at.asc())
             )
             stmt = apply_options_context(stmt)
@@ -105,8 +105,6 @@ class NoteCommentQuery:
             current_comments.append(comment)
 
         if resolve_rich_text:
-            async with TaskGroup() as tg:
-                for comment in comments:
-                    tg.create_task(comment.resolve_rich_text())
+            await resolve_rich_text_many(comments)
 
         return comments
@@ -3,7 +3,8 @@ from datetime import datetime, timedelta
 from typing import Literal
 
 from shapely.geometry.base import BaseGeometry
-from sqlalchemy import func, null, or_, select, text
+from sqlalchemy import cast, func, null, or_, select, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
 
 from app.db import db
 from app.lib.auth_context import auth_user
@@ -52,7 +53,9 @@ class NoteQuery:
             cte_where_and: list = []
 
             if phrase is not None:
-                cte_where_and.append(func.to_tsvector(NoteComment.body).bool_op('@@')(func.phraseto_tsquery(phrase)))
+                # the configuration must match the indexed column
+                tsquery = func.phraseto_tsquery(cast('simple', REGCONFIG), phrase)
+                cte_where_and.append(NoteComment.body_tsvector.bool_op('@@')(tsquery))
             if user_id is not None:
                 cte_where_and.append(NoteComment.user_id == user_id)
             if event is not None:
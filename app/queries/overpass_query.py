@@ -40,7 +40,7 @@ class OverpassQuery:
             r.raise_for_status()
             return r.content
 
-        cache = await CacheService.get(query, _cache_context, factory, ttl=OVERPASS_CACHE_EXPIRE)
+        cache = await CacheService.get(query, _cache_context, factory, ttl=OVERPASS_CACHE_EXPIRE, lock=True)
         elements: list[dict[str, Any]] = JSON_DECODE(cache.value)['elements']  # pyright: ignore[reportInvalidTypeForm]
         elements.sort(key=_get_bounds_size)
 
@@ -1,4 +1,4 @@
-from collections.abc import Sequence
+from collections.abc import Collection, Sequence
 from typing import Literal
 
 from sqlalchemy import any_, func, select, text
@@ -8,7 +8,10 @@ from app.lib.auth_context import auth_scopes, auth_user_scopes
 from app.lib.exceptions_context import raise_for
 from app.lib.options_context import apply_options_context
 from app.lib.trace_file import TraceFile
+from app.lib.trace_preview import TracePreview
+from app.limits import TRACE_PREVIEW_MAX_POINTS, TRACE_PREVIEW_RESOLUTION
 from app.models.db.trace_ import Trace
+from app.queries.trace_segment_query import TraceSegmentQuery
 from app.storage import TRACES_STORAGE
 
 
@@ -43,7 +46,8 @@ class TraceQuery:
         """
         trace = await TraceQuery.get_one_by_id(trace_id)
         file_buffer = await TRACES_STORAGE.load(trace.file_id)
-        file_bytes = TraceFile.decompress_if_needed(file_buffer, trace.file_id)
+        dict_data = await TraceFile.get_dictionary(file_buffer, trace.file_id)
+        file_bytes = TraceFile.decompress_if_needed(file_buffer, trace.file_id, dict_data)
         return file_bytes
 
     @staticmethod
@@ -124,3 +128,25 @@ class TraceQuery:
 
             stmt = apply_options_context(stmt)
             return (await session.scalars(stmt)).all()
+
+    @staticmethod
+    async def resolve_preview_coords(traces: Collection[Trace]) -> None:
+        """
+        Resolve preview coords for traces.
+
+        Uses the stored previews, falling back to the trace segments when missing.
+        """
+        missing: list[Trace] = []
+        for trace in traces:
+            preview = trace.preview
+            if preview is not None:
+                trace.coords = TracePreview.decode(preview)
+            else:
+                missing.append(trace)
+
+        if missing:
+            await TraceSegmentQuery.resolve_coords(
+                missing,
+                limit_per_trace=TRACE_PREVIEW_MAX_POINTS,
+                resolution=TRACE_PREVIEW_RESOLUTION,
+            )
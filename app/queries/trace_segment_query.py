@@ -5,7 +5,7 @@ import cython
 import numpy as np
 from shapely import GeometryType, MultiPoint, STRtree, from_wkb, get_parts, lib
 from shapely.geometry.base import BaseGeometry
-from sqlalchemy import func, literal_column, select, text, union_all
+from sqlalchemy import and_, func, literal_column, or_, select, text, tuple_, union_all
 from sqlalchemy.sql.selectable import Select
 
 from app.db import db
@@ -13,6 +13,7 @@ from app.lib.mercator import mercator
 from app.lib.options_context import apply_options_context
 from app.models.db.trace_ import Trace
 from app.models.db.trace_segment import TraceSegment
+from app.models.trace_point_cursor import TraceSegmentPosition
 
 
 # TODO: limit offset for safety
@@ -40,12 +41,12 @@ class TraceSegmentQuery:
         *,
         identifiable_trackable: bool,
         limit: int | None,
-        legacy_offset: int | None = None,
-    ) -> Sequence[TraceSegment]:
+        position: TraceSegmentPosition | None = None,
+    ) -> tuple[Sequence[TraceSegment], TraceSegmentPosition | None]:
         """
-        Find trace segments by geometry.
+        Find trace segments by geometry, starting at the given position.
 
-        Returns modified segments, containing only points within the geometry.
+        Returns modified segments, containing only points within the geometry, and the next page position.
         """
         visibility = ('identifiable', 'trackable') if identifiable_trackable else ('public', 'private')
 
@@ -63,15 +64,26 @@ class TraceSegmentQuery:
                     TraceSegment.segment_num.asc(),
                 )
             )
+            if position is not None:
+                # seek to the position, matching the ordering
+                stmt = stmt.where(
+                    or_(
+                        TraceSegment.trace_id < position.trace_id,
+                        and_(
+                            TraceSegment.trace_id == position.trace_id,
+                            tuple_(TraceSegment.track_num, TraceSegment.segment_num)
+                            >= tuple_(position.track_num, position.segment_num),
+                        ),
+                    )
+                )
             stmt = apply_options_context(stmt)
-            if legacy_offset is not None:
-                stmt = stmt.offset(legacy_offset)
             if limit is not None:
-                stmt = stmt.limit(limit)
+                # every segment has at least one point within the geometry
+                stmt = stmt.limit(limit + 1)
             segments = (await session.scalars(stmt)).all()
 
         if not segments:
-            return ()
+            return (), None
 
         # extract points and check for intersections
         segments_points = tuple(segment.points for segment in segments)
@@ -80,13 +92,23 @@ class TraceSegmentQuery:
         segments_indices = segments_parts_[1]
         tree = STRtree((geometry,))
         intersect_indices = tree.query(segments_parts, predicate='intersects')[0]
+        next_position = None
+        if limit is not None:
+            intersect_indices, next_position = _paginate(
+                segments,
+                segments_indices[intersect_indices],
+                intersect_indices,
+                position,
+                limit,
+            )
         if not intersect_indices.size:
-            return ()
+            return (), next_position
 
         # filter non-intersecting points
         segments_parts = segments_parts[intersect_indices]
         segments_indices = segments_indices[intersect_indices]
-        split_indices = np.unique(segments_indices, return_index=True)[1][1:]
+        unique_indices, split_indices = np.unique(segments_indices, return_index=True)
+        split_indices = split_indices[1:]
         new_parts = np.split(segments_parts, split_indices)
         new_parts_flat = np.concatenate(new_parts)
 
@@ -103,13 +125,10 @@ class TraceSegmentQuery:
             new_parts_fixed[mask] = new_parts_flat
             new_points_list: Sequence[MultiPoint] = lib.create_collection(new_parts_fixed, GeometryType.MULTIPOINT)
 
-            # assign filtered multipoints and return
-            for segment, points in zip(segments, new_points_list, strict=True):
-                segment.points = points
-
             # filter extra attributes
             data_flat = np.empty(segments_parts_[0].size, dtype=object)
             data_lens = Counter(segments_parts_[1]).values()
+            new_data_map: dict[str, list[np.ndarray]] = {}
             dirty: cython.char = False
             for attr_name in ('capture_times', 'elevations'):
                 if dirty:
@@ -123,11 +142,17 @@ class TraceSegmentQuery:
                         dirty = True
                     i += data_len
                 if dirty:
-                    new_data = np.split(data_flat[intersect_indices], split_indices)
-                    for segment, data in zip(segments, new_data, strict=True):
-                        setattr(segment, attr_name, data.tolist())
+                    new_data_map[attr_name] = np.split(data_flat[intersect_indices], split_indices)
+
+            # assign filtered data and return
+            result = [segments[i] for i in unique_indices.tolist()]
+            for segment, points in zip(result, new_points_list, strict=True):
+                segment.points = points
+            for attr_name, new_data in new_data_map.items():
+                for segment, data in zip(result, new_data, strict=True):
+                    setattr(segment, attr_name, data.tolist())
 
-            return segments
+            return result, next_position
         else:
             # reconstruct dummy multipoint
             new_points: MultiPoint = lib.create_collection(new_parts_flat, GeometryType.MULTIPOINT)
@@ -139,7 +164,7 @@ class TraceSegmentQuery:
                     capture_times=None,
                     elevations=None,
                 ),
-            )
+            ), next_position
 
     @staticmethod
     async def resolve_coords(
@@ -213,3 +238,47 @@ class TraceSegmentQuery:
                     continue
                 coords = mercator(coords, resolution, resolution).astype(int)
             trace.coords = coords.flatten().tolist()
+
+
+@cython.cfunc
+def _paginate(
+    segments: Sequence[TraceSegment],
+    points_segment_indices: np.ndarray,
+    intersect_indices: np.ndarray,
+    position: TraceSegmentPosition | None,
+    limit: int,
+) -> tuple[np.ndarray, TraceSegmentPosition | None]:
+    """
+    Limit the intersecting points to the page, skipping the points before the position.
+
+    Returns the page points indices and the next page position.
+    """
+    # offset of each point within its segment
+    offsets = np.arange(points_segment_indices.size) - np.searchsorted(points_segment_indices, points_segment_indices)
+
+    if position is not None:
+        first = segments[0]
+        if (first.trace_id, first.track_num, first.segment_num) == position[:3]:
+            mask = (points_segment_indices != 0) | (offsets >= position.point_offset)
+            points_segment_indices = points_segment_indices[mask]
+            offsets = offsets[mask]
+            intersect_indices = intersect_indices[mask]
+
+    if points_segment_indices.size > limit:
+        # the page is full, continue at the first skipped point
+        segment = segments[points_segment_indices[limit]]
+        point_offset = int(offsets[limit])
+        intersect_indices = intersect_indices[:limit]
+    elif len(segments) > limit and points_segment_indices.size:
+        # more segments remain, continue after the last point
+        segment = segments[points_segment_indices[-1]]
+        point_offset = int(offsets[-1]) + 1
+    else:
+        return intersect_indices, None
+
+    return intersect_indices, TraceSegmentPosition(
+        trace_id=segment.trace_id,
+        track_num=segment.track_num,
+        segment_num=segment.segment_num,
+        point_offset=point_offset,
+    )
@@ -0,0 +1,33 @@
+from datetime import date
+
+from sqlalchemy import select
+
+from app.db import db
+from app.models.db.user_stats import UserActivity, UserStats
+
+
+class UserStatsQuery:
+    @staticmethod
+    async def get_by_user_id(user_id: int) -> UserStats:
+        """
+        Get the user statistics.
+
+        Returns zero counters if the user has no statistics yet.
+        """
+        async with db() as session:
+            stats = await session.get(UserStats, user_id)
+        return stats if (stats is not None) else UserStats(user_id=user_id)
+
+    @staticmethod
+    async def get_activity_by_user_id(user_id: int, since: date) -> dict[date, int]:
+        """
+        Get the user changesets count per day since given date.
+        """
+        async with db() as session:
+            stmt = select(UserActivity.day, UserActivity.changesets).where(
+                UserActivity.user_id == user_id,
+                UserActivity.day >= since,
+                UserActivity.changesets > 0,
+            )
+            rows = (await session.execute(stmt)).all()
+        return dict(rows)  # pyright: ignore[reportArgumentType]
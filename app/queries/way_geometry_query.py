@@ -0,0 +1,28 @@
+from collections.abc import Collection, Iterable
+
+from shapely import LineString
+from sqlalchemy import select, text
+
+from app.db import db
+from app.models.db.way_geometry import WayGeometry
+from app.models.element import ElementId
+
+
+class WayGeometryQuery:
+    @staticmethod
+    async def get_by_ids(way_ids: Collection[ElementId], *, at_sequence_id: int) -> dict[ElementId, LineString]:
+        """
+        Get the cached way geometries by their ids.
+
+        Ways without a geometry valid at the given sequence_id are omitted.
+        Used by the partial element endpoints, the web map still renders ways from their nodes.
+        """
+        if not way_ids:
+            return {}
+        async with db() as session:
+            stmt = select(WayGeometry.id, WayGeometry.geometry).where(
+                WayGeometry.id.in_(text(','.join(map(str, way_ids)))),
+                WayGeometry.sequence_id <= at_sequence_id,
+            )
+            rows: Iterable[tuple[ElementId, LineString]] = (await session.execute(stmt)).all()  # pyright: ignore[reportAssignmentType]
+            return dict(rows)
@@ -1,16 +1,19 @@
-from collections.abc import Callable, Mapping, Sequence
+from collections.abc import AsyncIterator, Callable, Iterator, Mapping, Sequence
 from functools import wraps
+from itertools import chain
 from typing import Any, NoReturn, override
 
 import cython
 from fastapi import APIRouter, Response
 from fastapi.dependencies.utils import get_dependant
 from fastapi.routing import APIRoute
+from starlette.responses import StreamingResponse
 from starlette.routing import request_response
 
 from app.config import ATTRIBUTION_URL, COPYRIGHT, GENERATOR, LICENSE_URL
 from app.lib.format_style_context import format_style
 from app.lib.xmltodict import XMLToDict
+from app.limits import RESPONSE_STREAM_CHUNK_SIZE
 from app.middlewares.request_context_middleware import get_request
 from app.utils import JSON_ENCODE
 
@@ -63,17 +66,32 @@ class OSMResponse(Response):
                 else:
                     raise TypeError(f'Invalid json content type {type(content)}')
 
+            if _is_stream(content):
+                return StreamingResponse(
+                    _iterate(_json_stream(content)),
+                    media_type='application/json; charset=utf-8',
+                )
+
             encoded = JSON_ENCODE(content)
             return Response(encoded, media_type='application/json; charset=utf-8')
 
         elif style == 'xml':
+            is_stream = _is_stream(content)
             if isinstance(content, Mapping):
                 content = {cls.xml_root: {**_xml_attributes, **content}}
             elif isinstance(content, Sequence) and not isinstance(content, str):
                 content = {cls.xml_root: (*_xml_attributes.items(), *content)}
+            elif isinstance(content, Iterator):
+                content = {cls.xml_root: chain(_xml_attributes.items(), content)}
             else:
                 raise TypeError(f'Invalid xml content type {type(content)}')
 
+            if is_stream:
+                return StreamingResponse(
+                    _iterate(XMLToDict.unparse_stream(content)),
+                    media_type='application/xml; charset=utf-8',
+                )
+
             encoded = XMLToDict.unparse(content, raw=True)
             return Response(encoded, media_type='application/xml; charset=utf-8')
 
@@ -134,6 +152,59 @@ def setup_api_router_response(router: APIRouter) -> None:
         route.app = request_response(route.get_route_handler())
 
 
+@cython.cfunc
+def _is_stream(content: Any) -> cython.char:
+    """
+    Check if the content contains lazy iterators, which should be streamed.
+    """
+    if isinstance(content, Iterator):
+        return True
+    if isinstance(content, Mapping):
+        return any(isinstance(v, Iterator) for v in content.values())
+    return False
+
+
+def _json_stream(content: Mapping) -> Iterator[bytes]:
+    """
+    Encode the JSON mapping in chunks, consuming iterator values lazily.
+
+    The output is identical to JSON_ENCODE(content).
+    """
+    yield b'{'
+    for i, k in enumerate(sorted(content)):
+        v = content[k]
+        prefix = (b',' if i else b'') + JSON_ENCODE(k) + b':'
+        if not isinstance(v, Iterator):
+            yield prefix + JSON_ENCODE(v)
+            continue
+
+        chunk: list[bytes] = [prefix, b'[']
+        chunk_size: cython.int = 0
+        for j, item in enumerate(v):
+            item_bytes = JSON_ENCODE(item)
+            if j:
+                chunk.append(b',')
+            chunk.append(item_bytes)
+            chunk_size += len(item_bytes)
+
+            if chunk_size >= RESPONSE_STREAM_CHUNK_SIZE:
+                yield b''.join(chunk)
+                chunk.clear()
+                chunk_size = 0
+
+        chunk.append(b']')
+        yield b''.join(chunk)
+    yield b'}'
+
+
+async def _iterate(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Iterate the chunks on the event loop, preserving the request context.
+    """
+    for chunk in chunks:
+        yield chunk
+
+
 @cython.cfunc
 def _get_serializing_endpoint(endpoint: Callable, response_class: type[OSMResponse]):
     @wraps(endpoint)
@@ -1,17 +1,26 @@
 import logging
+from asyncio import get_running_loop, sleep
 from base64 import b64decode
+from contextlib import asynccontextmanager
+from time import monotonic
 
 from pydantic import SecretStr
 from sqlalchemy import update
 from sqlalchemy.orm import joinedload
 
 from app.config import SECRET, TEST_ENV
-from app.db import db_commit
+from app.db import db_commit, valkey
 from app.lib.crypto import hash_bytes
 from app.lib.exceptions_context import raise_for
+from app.lib.lru_cache import LRUCache
 from app.lib.options_context import options_context
 from app.lib.password_hash import PasswordHash
-from app.limits import AUTH_CREDENTIALS_CACHE_EXPIRE
+from app.limits import (
+    AUTH_CREDENTIALS_CACHE_EXPIRE,
+    AUTH_TOKEN_CACHE_EXPIRE,
+    AUTH_TOKEN_CACHE_MAX_SIZE,
+    AUTH_TOKEN_INVALIDATE_RETRY_INTERVAL,
+)
 from app.middlewares.request_context_middleware import get_request
 from app.models.db.oauth2_token import OAuth2Token
 from app.models.db.user import User
@@ -22,7 +31,15 @@ from app.queries.user_query import UserQuery
 from app.services.cache_service import CacheContext, CacheService
 from app.validators.email import validate_email
 
-_credentials_context = CacheContext('AuthCredentials')
+_credentials_context = CacheService.enable_local(CacheContext('AuthCredentials'))
+
+# authorized tokens by token hash, with the local expiration time
+_token_cache: LRUCache[bytes, tuple[OAuth2Token, float]] = LRUCache(AUTH_TOKEN_CACHE_MAX_SIZE)
+
+# incremented on every invalidation, prevents caching tokens loaded before it
+_token_cache_generation: int = 0
+
+_token_invalidate_channel = 'AuthTokenInvalidate'
 
 # default scopes when using basic auth
 _basic_auth_scopes: tuple[Scope, ...] = Scope.get_basic()
@@ -32,6 +49,17 @@ _session_auth_scopes: tuple[Scope, ...] = (*_basic_auth_scopes, Scope.web_user)
 
 
 class AuthService:
+    @asynccontextmanager
+    @staticmethod
+    async def context():
+        """
+        Context manager for the token cache invalidation listener.
+        """
+        loop = get_running_loop()
+        task = loop.create_task(_invalidate_listener())
+        yield
+        task.cancel()  # avoid "Task was destroyed" warning during tests
+
     @staticmethod
     async def authenticate_request() -> tuple[User | None, tuple[Scope, ...]]:
         """
@@ -136,13 +164,13 @@ class AuthService:
 
         async def factory() -> bytes:
             logging.debug('Credentials auth cache miss for user %d', user.id)
-            verified = PasswordHash.verify(user.password_hashed, password)
+            verified = await PasswordHash.verify(user.password_hashed, password)
 
             if not verified.success:
                 return b'\x00'
 
             if verified.rehash_needed:
-                new_hash = PasswordHash.hash(password)
+                new_hash = await PasswordHash.hash(password)
 
                 async with db_commit() as session:
                     stmt = (
@@ -194,10 +222,77 @@ class AuthService:
             param = get_request().cookies.get('auth')
             if param is None:
                 return None
+        token_hashed = hash_bytes(param)
+        cached = _token_cache.get(token_hashed)
+        if cached is not None:
+            token, expires_at = cached
+            if expires_at > monotonic():
+                return token
+            _token_cache.pop(token_hashed)
+
+        generation = _token_cache_generation
         with options_context(joinedload(OAuth2Token.user)):
             token = await OAuth2TokenQuery.find_one_authorized_by_token(param)
         if token is None:
             return None
         if token.authorized_at is None:
             raise_for().oauth_bad_user_token()
+
+        # skip caching if an invalidation happened during the query
+        if generation == _token_cache_generation:
+            _token_cache[token_hashed] = (token, monotonic() + AUTH_TOKEN_CACHE_EXPIRE.total_seconds())
         return token
+
+    @staticmethod
+    async def invalidate_tokens(*, user_id: int | None = None, app_id: int | None = None) -> None:
+        """
+        Invalidate the cached tokens of the given user or application, in all processes.
+        """
+        if (user_id is None) == (app_id is None):
+            raise ValueError('Exactly one of user_id or app_id must be set')
+        message = f'user:{user_id}' if (user_id is not None) else f'app:{app_id}'
+        _invalidate_local(message)
+        async with valkey() as conn:
+            await conn.publish(_token_invalidate_channel, message)
+
+
+def _invalidate_local(message: str) -> None:
+    """
+    Remove the matching tokens from the local cache.
+
+    Message format is "user:<id>" or "app:<id>", unknown messages clear the entire cache.
+    """
+    global _token_cache_generation
+    _token_cache_generation += 1
+
+    kind, _, id_str = message.partition(':')
+    if kind == 'user':
+        attr = 'user_id'
+    elif kind == 'app':
+        attr = 'application_id'
+    else:
+        _token_cache.clear()
+        return
+
+    id_ = int(id_str)
+    for token_hashed, (token, _) in _token_cache.items():
+        if getattr(token, attr) == id_:
+            _token_cache.pop(token_hashed)
+
+
+async def _invalidate_listener() -> None:
+    """
+    Listen for the token invalidations from other processes.
+    """
+    retry_interval = AUTH_TOKEN_INVALIDATE_RETRY_INTERVAL.total_seconds()
+    while True:
+        try:
+            async with valkey() as conn, conn.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(_token_invalidate_channel)
+                # invalidations may have been missed while not subscribed
+                _invalidate_local('')
+                async for message in pubsub.listen():
+                    _invalidate_local(message['data'].decode())
+        except Exception:
+            logging.warning('Token invalidation listener failed, retrying', exc_info=True)
+            await sleep(retry_interval)
@@ -1,18 +1,27 @@
 import logging
-from collections.abc import Awaitable, Callable
+from asyncio import Task, TaskGroup, create_task, shield, sleep
+from collections import Counter
+from collections.abc import Awaitable, Callable, Sequence
 from datetime import timedelta
+from time import monotonic
 from typing import NamedTuple, NewType
 
+import cython
 from zstandard import ZstdCompressor, ZstdDecompressor
 
 from app.db import valkey
 from app.lib.crypto import hash_bytes
+from app.lib.lru_cache import SizedLRUCache
 from app.lib.naturalsize import naturalsize
 from app.limits import (
     CACHE_COMPRESS_MIN_SIZE,
     CACHE_COMPRESS_ZSTD_LEVEL,
     CACHE_COMPRESS_ZSTD_THREADS,
     CACHE_DEFAULT_EXPIRE,
+    CACHE_LOCAL_MAX_EXPIRE,
+    CACHE_LOCAL_MAX_SIZE,
+    CACHE_LOCK_EXPIRE,
+    CACHE_LOCK_POLL_INTERVAL,
 )
 
 CacheContext = NewType('CacheContext', str)
@@ -20,6 +29,14 @@ CacheContext = NewType('CacheContext', str)
 _compress = ZstdCompressor(level=CACHE_COMPRESS_ZSTD_LEVEL, threads=CACHE_COMPRESS_ZSTD_THREADS).compress
 _decompress = ZstdDecompressor().decompress
 
+# in-process cache tier, in front of valkey, for the opted-in contexts
+_local_cache: SizedLRUCache[str] = SizedLRUCache(CACHE_LOCAL_MAX_SIZE)
+_local_contexts: set[CacheContext] = set()
+_local_hits: Counter[CacheContext] = Counter()
+_local_misses: Counter[CacheContext] = Counter()
+
+_inflight: dict[str, Task[bytes]] = {}
+
 
 class CacheEntry(NamedTuple):
     id: bytes
@@ -35,11 +52,14 @@ class CacheService:
         *,
         hash_key: bool = False,
         ttl: timedelta = CACHE_DEFAULT_EXPIRE,
+        lock: bool = False,
     ) -> CacheEntry:
         """
         Get a value from the cache.
 
         If the value is not in the cache, call the async factory to obtain it.
+        Concurrent misses within the process share a single factory call.
+        If lock is set, concurrent misses across processes wait for the first one to finish.
         """
         if hash_key:
             cache_id = hash_bytes(key)
@@ -50,29 +70,199 @@ class CacheService:
 
         cache_key = f'{context}:{cache_id.hex()}'
 
+        value = _get_local(context, cache_key)
+        if value is not None:
+            return CacheEntry(id=cache_id, value=value)
+
         async with valkey() as conn:
             value_stored: bytes | None = await conn.get(cache_key)
 
-            if value_stored is not None:
-                # on cache hit, decompress the value if needed (first byte is compression marker)
-                if value_stored[0] == 0xFF:
-                    value = _decompress(value_stored[1:], allow_extra_data=False)
-                else:
-                    value = value_stored[1:]
+        if value_stored is not None:
+            value = _decode(value_stored)
+        else:
+            value = await _produce_shared(cache_key, factory, ttl=ttl, lock=lock)
+
+        _set_local(context, cache_key, value, ttl)
+        return CacheEntry(id=cache_id, value=value)
+
+    @staticmethod
+    async def get_many(
+        items: Sequence[tuple[bytes, CacheContext, Callable[[], Awaitable[bytes]]]],
+        *,
+        ttl: timedelta = CACHE_DEFAULT_EXPIRE,
+    ) -> list[CacheEntry]:
+        """
+        Get many values from the cache, given as (cache_id, context, factory) items.
 
+        Uses a single round-trip for the cache hits, then calls the async factories for the misses.
+        """
+        result: list[CacheEntry | None] = [None] * len(items)
+        remote_indices: list[int] = []
+        remote_keys: list[str] = []
+
+        i: cython.int
+        for i, (cache_id, context, _) in enumerate(items):
+            cache_key = f'{context}:{cache_id.hex()}'
+            value = _get_local(context, cache_key)
+            if value is not None:
+                result[i] = CacheEntry(id=cache_id, value=value)
             else:
-                # on cache miss, call the factory to generate the value and cache it
-                value = await factory()
+                remote_indices.append(i)
+                remote_keys.append(cache_key)
 
-                if not isinstance(value, bytes):  # pyright: ignore[reportUnnecessaryIsInstance]
-                    raise TypeError(f'Cache factory returned {type(value)!r}, expected bytes')
+        if remote_keys:
+            async with valkey() as conn:
+                values_stored: list[bytes | None] = await conn.mget(remote_keys)
 
-                if len(value) >= CACHE_COMPRESS_MIN_SIZE:
-                    logging.debug('Compressing cache %r value of size %s', cache_key, naturalsize(len(value)))
-                    value_stored = b'\xff' + _compress(value)
-                else:
-                    value_stored = b'\x00' + value
+            missing: list[tuple[int, str]] = []
+            for i, cache_key, value_stored in zip(remote_indices, remote_keys, values_stored, strict=True):
+                if value_stored is None:
+                    missing.append((i, cache_key))
+                    continue
+                cache_id, context, _ = items[i]
+                value = _decode(value_stored)
+                _set_local(context, cache_key, value, ttl)
+                result[i] = CacheEntry(id=cache_id, value=value)
 
-                await conn.set(cache_key, value_stored, ex=ttl, nx=True)
+            if missing:
+                logging.debug('Cache miss for %d of %d values', len(missing), len(items))
+                async with TaskGroup() as tg:
+                    tasks = tuple(
+                        tg.create_task(_produce_shared(cache_key, items[i][2], ttl=ttl, lock=False))
+                        for i, cache_key in missing
+                    )
+                for (i, cache_key), task in zip(missing, tasks, strict=True):
+                    cache_id, context, _ = items[i]
+                    value = task.result()
+                    _set_local(context, cache_key, value, ttl)
+                    result[i] = CacheEntry(id=cache_id, value=value)
 
-        return CacheEntry(id=cache_id, value=value)
+        return result  # pyright: ignore[reportReturnType]
+
+    @staticmethod
+    def enable_local(context: CacheContext) -> CacheContext:
+        """
+        Enable the in-process cache tier for the given context.
+
+        Use only for small and frequently accessed values.
+        """
+        _local_contexts.add(context)
+        return context
+
+    @staticmethod
+    def get_local_stats(context: CacheContext) -> tuple[int, int]:
+        """
+        Get the in-process cache (hits, misses) for the given context.
+        """
+        return _local_hits[context], _local_misses[context]
+
+
+def _get_local(context: CacheContext, cache_key: str) -> bytes | None:
+    """
+    Get the value from the in-process cache tier, if enabled for the context.
+    """
+    if context not in _local_contexts:
+        return None
+
+    value = _local_cache.get(cache_key)
+    if value is not None:
+        _local_hits[context] += 1
+    else:
+        _local_misses[context] += 1
+    return value
+
+
+def _set_local(context: CacheContext, cache_key: str, value: bytes, ttl: timedelta) -> None:
+    """
+    Set the value in the in-process cache tier, if enabled for the context.
+    """
+    if context in _local_contexts:
+        _local_cache.set(cache_key, value, min(ttl, CACHE_LOCAL_MAX_EXPIRE).total_seconds())
+
+
+async def _produce_shared(
+    cache_key: str,
+    factory: Callable[[], Awaitable[bytes]],
+    *,
+    ttl: timedelta,
+    lock: bool,
+) -> bytes:
+    """
+    Produce the value, sharing a single factory call between the concurrent requests.
+    """
+    task = _inflight.get(cache_key)
+    if task is None:
+        task = create_task(_produce(cache_key, factory, ttl=ttl, lock=lock))
+        task.add_done_callback(lambda _: _inflight.pop(cache_key, None))
+        _inflight[cache_key] = task
+    else:
+        logging.debug('Cache %r factory call coalesced', cache_key)
+
+    # shield the shared factory call from the cancellation of a single waiter
+    return await shield(task)
+
+
+async def _produce(
+    cache_key: str,
+    factory: Callable[[], Awaitable[bytes]],
+    *,
+    ttl: timedelta,
+    lock: bool,
+) -> bytes:
+    """
+    Call the factory to generate the value and cache it.
+
+    If lock is set, wait for the other process that is already generating the value.
+    """
+    lock_key = f'{cache_key}:lock'
+    acquired: bool | None = False
+    if lock:
+        async with valkey() as conn:
+            acquired = await conn.set(lock_key, b'', ex=CACHE_LOCK_EXPIRE, nx=True)
+        if not acquired:
+            logging.debug('Cache %r is locked, waiting for the value', cache_key)
+            deadline = monotonic() + CACHE_LOCK_EXPIRE.total_seconds()
+            while monotonic() < deadline:
+                await sleep(CACHE_LOCK_POLL_INTERVAL.total_seconds())
+                # don't hold the connection while sleeping, the pool is shared by all requests
+                async with valkey() as conn:
+                    value_stored, lock_stored = await conn.mget(cache_key, lock_key)
+                if value_stored is not None:
+                    return _decode(value_stored)
+                if lock_stored is None:
+                    logging.debug('Cache %r lock was released without the value', cache_key)
+                    break
+            else:
+                logging.warning('Cache %r lock wait timed out', cache_key)
+
+    try:
+        value = await factory()
+
+        if not isinstance(value, bytes):  # pyright: ignore[reportUnnecessaryIsInstance]
+            raise TypeError(f'Cache factory returned {type(value)!r}, expected bytes')
+
+        if len(value) >= CACHE_COMPRESS_MIN_SIZE:
+            logging.debug('Compressing cache %r value of size %s', cache_key, naturalsize(len(value)))
+            value_stored = b'\xff' + _compress(value)
+        else:
+            value_stored = b'\x00' + value
+
+        async with valkey() as conn:
+            await conn.set(cache_key, value_stored, ex=ttl, nx=True)
+
+    finally:
+        if acquired:
+            async with valkey() as conn:
+                await conn.delete(lock_key)
+
+    return value
+
+
+def _decode(value_stored: bytes) -> bytes:
+    """
+    Decode the stored value, decompressing it if needed (first byte is compression marker).
+    """
+    if value_stored[0] == 0xFF:
+        return _decompress(value_stored[1:], allow_extra_data=False)
+    else:
+        return value_stored[1:]
@@ -9,6 +9,7 @@ from app.lib.exceptions_context import raise_for
 from app.models.db.changeset import Changeset
 from app.models.db.changeset_comment import ChangesetComment
 from app.models.db.changeset_subscription import ChangesetSubscription
+from app.services.user_stats_service import UserStatsService
 
 
 class ChangesetCommentService:
@@ -23,13 +24,15 @@ class ChangesetCommentService:
             if changeset is None:
                 raise_for().changeset_not_found(changeset_id)
 
+            user_id = auth_user(required=True).id
             changeset_comment = ChangesetComment(
-                user_id=auth_user(required=True).id,
+                user_id=user_id,
                 changeset_id=changeset_id,
                 body=text,
             )
             session.add(changeset_comment)
             await session.flush()
+            await UserStatsService.update(session, user_id, changeset_comments=1)
 
             changeset.updated_at = changeset_comment.created_at
 
@@ -54,6 +57,7 @@ class ChangesetCommentService:
                 raise_for().changeset_comment_not_found(comment_id)
 
             await session.delete(comment)
+            await UserStatsService.update(session, comment.user_id, changeset_comments=-1)
             changeset.updated_at = func.statement_timestamp()
 
             return changeset.id
@@ -1,6 +1,6 @@
 import logging
 
-from sqlalchemy import and_, delete, func, null, or_, select, update
+from sqlalchemy import Date, and_, cast, delete, func, null, or_, select, update
 from sqlalchemy.orm import load_only
 
 from app.db import db_commit
@@ -10,6 +10,7 @@ from app.lib.exceptions_context import raise_for
 from app.limits import CHANGESET_EMPTY_DELETE_TIMEOUT, CHANGESET_IDLE_TIMEOUT, CHANGESET_OPEN_TIMEOUT
 from app.models.db.changeset import Changeset
 from app.services.changeset_comment_service import ChangesetCommentService
+from app.services.user_stats_service import UserStatsService
 
 
 class ChangesetService:
@@ -26,6 +27,8 @@ class ChangesetService:
                 tags=tags,
             )
             session.add(changeset)
+            await UserStatsService.update(session, user_id, changesets=1)
+            await UserStatsService.update_activity(session, user_id, day=None, changesets=1)
 
         logging.debug('Created changeset %d for user %d', changeset.id, user_id)
         await ChangesetCommentService.subscribe(changeset.id)
@@ -108,9 +111,14 @@ class ChangesetService:
         """
         async with db_commit() as session:
             now = utcnow()
-            stmt = delete(Changeset).where(
-                Changeset.closed_at != null(),
-                Changeset.closed_at < now - CHANGESET_EMPTY_DELETE_TIMEOUT,
-                Changeset.size == 0,
+            stmt = (
+                delete(Changeset)
+                .where(
+                    Changeset.closed_at != null(),
+                    Changeset.closed_at < now - CHANGESET_EMPTY_DELETE_TIMEOUT,
+                    Changeset.size == 0,
+                )
+                .returning(Changeset.user_id, cast(Changeset.created_at, Date))
             )
-            await session.execute(stmt)
+            rows = (await session.execute(stmt)).all()
+            await UserStatsService.remove_changesets(session, rows)  # pyright: ignore[reportArgumentType]
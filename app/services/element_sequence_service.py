@@ -0,0 +1,77 @@
+import logging
+from time import monotonic
+
+from app.db import valkey
+from app.limits import ELEMENT_SEQUENCE_HEAD_EXPIRE, ELEMENT_SEQUENCE_HEAD_POLL_INTERVAL
+from app.queries.element_query import ElementQuery
+
+_key = 'ElementSequenceHead'
+
+# raise the shared sequence head, never lowering it (diffs may finish out of order)
+_advance_script = """
+local current = redis.call('GET', KEYS[1])
+if (not current) or tonumber(current) < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return tonumber(ARGV[1])
+end
+return tonumber(current)
+"""
+
+_local_sequence_id: int = 0
+_local_checked_at: float = float('-inf')
+
+
+class ElementSequenceService:
+    @staticmethod
+    async def get_current_sequence_id() -> int:
+        """
+        Get the current sequence id, avoiding the database query when possible.
+
+        The result may lag behind the database by ELEMENT_SEQUENCE_HEAD_POLL_INTERVAL,
+        but it is always a consistent snapshot to read at.
+        Use only for the website reads, the uploads and the API reads must see the previous writes.
+        """
+        global _local_sequence_id, _local_checked_at
+        now = monotonic()
+        if now - _local_checked_at < ELEMENT_SEQUENCE_HEAD_POLL_INTERVAL.total_seconds():
+            return _local_sequence_id
+
+        async with valkey() as conn:
+            value: bytes | None = await conn.get(_key)
+
+        if value is not None:
+            sequence_id = int(value)
+        else:
+            # the tracker is stale, fall back to the database
+            logging.debug('Element sequence head is stale, querying the database')
+            sequence_id = await _advance(await ElementQuery.get_current_sequence_id())
+
+        # the local value may be ahead if this process has just applied a diff
+        if sequence_id > _local_sequence_id:
+            _local_sequence_id = sequence_id
+        _local_checked_at = now
+        return _local_sequence_id
+
+    @staticmethod
+    async def advance(sequence_id: int) -> None:
+        """
+        Advance the sequence head to the given sequence id, after the elements were committed.
+        """
+        global _local_sequence_id
+        if sequence_id > _local_sequence_id:
+            _local_sequence_id = sequence_id
+        await _advance(sequence_id)
+
+
+async def _advance(sequence_id: int) -> int:
+    """
+    Advance the shared sequence head and return its new value.
+    """
+    async with valkey() as conn:
+        return await conn.eval(  # pyright: ignore[reportGeneralTypeIssues]
+            _advance_script,
+            1,
+            _key,
+            sequence_id,
+            int(ELEMENT_SEQUENCE_HEAD_EXPIRE.total_seconds()),
+        )
@@ -0,0 +1,393 @@
+import logging
+from asyncio import Semaphore, TaskGroup
+from collections import defaultdict
+from collections.abc import Collection, Iterable, Sequence
+from math import floor
+
+import msgspec
+import numpy as np
+from shapely import MultiPolygon, Point, Polygon, box, get_coordinates, intersects
+from zstandard import ZstdCompressor, ZstdDecompressor
+
+from app.db import valkey
+from app.lib.exceptions_context import raise_for
+from app.limits import (
+    CACHE_COMPRESS_ZSTD_LEVEL,
+    CACHE_COMPRESS_ZSTD_THREADS,
+    MAP_QUERY_LEGACY_NODES_LIMIT,
+    MAP_TILE_CACHE_BUILD_CONCURRENCY,
+    MAP_TILE_CACHE_EXPIRE,
+    MAP_TILE_CACHE_MAX_TILES,
+    MAP_TILE_CACHE_SIZE,
+)
+from app.models.db.element import Element
+from app.models.db.element_member import ElementMember
+from app.models.element import ElementId, ElementRef, ElementType
+from app.models.map_tile import MapTile, MapTileElement
+from app.queries.element_member_query import ElementMemberQuery
+from app.queries.element_query import ElementQuery
+
+Tile = tuple[int, int]
+
+_compress = ZstdCompressor(level=CACHE_COMPRESS_ZSTD_LEVEL, threads=CACHE_COMPRESS_ZSTD_THREADS).compress
+_decompress = ZstdDecompressor().decompress
+_encode = msgspec.msgpack.Encoder().encode
+_decode = msgspec.msgpack.Decoder(MapTile).decode
+
+# raised when the tiles invalidation fails, all the older tiles are rebuilt
+_global_dirty_key = 'MapTileDirty'
+
+# raise the tile dirty markers, never lowering them (diffs may finish out of order)
+_mark_dirty_script = """
+local sequence_id = tonumber(ARGV[1])
+for _, key in ipairs(KEYS) do
+    local current = redis.call('GET', key)
+    if (not current) or tonumber(current) < sequence_id then
+        redis.call('SET', key, ARGV[1], 'EX', ARGV[2])
+    end
+end
+"""
+
+
+class MapTileCacheService:
+    @staticmethod
+    async def find_many_by_geom(
+        geometry: Polygon | MultiPolygon,
+        *,
+        nodes_limit: int | None,
+        legacy_nodes_limit: bool = False,
+    ) -> list[Element]:
+        """
+        Find elements within the given geometry, using the tile-partitioned cache.
+
+        Returns the same elements as ElementQuery.find_many_by_geom, with members resolved.
+        """
+        tiles = _get_tiles(geometry)
+        if len(tiles) <= MAP_TILE_CACHE_MAX_TILES:
+            elements = await _get_tiles_elements(tiles)
+            if elements is not None:
+                return await _filter_elements(
+                    geometry,
+                    elements,
+                    nodes_limit=nodes_limit,
+                    legacy_nodes_limit=legacy_nodes_limit,
+                )
+
+        logging.debug('Map tile cache bypassed for %d tiles', len(tiles))
+        result = await ElementQuery.find_many_by_geom(
+            geometry,
+            nodes_limit=nodes_limit,
+            legacy_nodes_limit=legacy_nodes_limit,
+        )
+        await ElementMemberQuery.resolve_members(result)
+        return result
+
+    @staticmethod
+    async def invalidate(points: Collection[Point], relation_ids: Collection[int], sequence_id: int) -> None:
+        """
+        Mark the tiles containing the given points and the given relations as changed at the given sequence_id.
+
+        Tiles built before the sequence_id will be rebuilt on the next read.
+        """
+        if points:
+            coords = get_coordinates(points)
+            tiles: set[Tile] = set(map(tuple, np.floor(coords / MAP_TILE_CACHE_SIZE).astype(np.int64).tolist()))
+        else:
+            tiles = set()
+        keys = (
+            *(_dirty_key(tile) for tile in tiles),
+            *(_relation_dirty_key(relation_id) for relation_id in relation_ids),
+        )
+        if not keys:
+            return
+
+        logging.debug(
+            'Invalidating %d map tiles and %d relations at sequence_id %d',
+            len(tiles),
+            len(relation_ids),
+            sequence_id,
+        )
+        await _mark_dirty(keys, sequence_id)
+
+    @staticmethod
+    async def invalidate_all(sequence_id: int) -> None:
+        """
+        Mark all the tiles as changed at the given sequence_id.
+        """
+        logging.info('Invalidating all map tiles at sequence_id %d', sequence_id)
+        await _mark_dirty((_global_dirty_key,), sequence_id)
+
+
+async def _mark_dirty(keys: Sequence[str], sequence_id: int) -> None:
+    async with valkey() as conn:
+        await conn.eval(  # pyright: ignore[reportGeneralTypeIssues]
+            _mark_dirty_script,
+            len(keys),
+            *keys,
+            sequence_id,
+            int(MAP_TILE_CACHE_EXPIRE.total_seconds()),
+        )
+
+
+async def _get_tiles_elements(tiles: Sequence[Tile]) -> Iterable[Element] | None:
+    """
+    Get the current elements of the given tiles, building the missing or stale tiles.
+
+    Returns None if any of the tiles is too dense to be cached.
+    """
+    async with valkey() as conn:
+        values: list[bytes | None] = await conn.mget(
+            _global_dirty_key,
+            *(_tile_key(tile) for tile in tiles),
+            *(_dirty_key(tile) for tile in tiles),
+        )
+
+    num_tiles = len(tiles)
+    global_dirty = int(values[0]) if values[0] is not None else 0
+    cached_tiles: dict[Tile, MapTile] = {}
+    build_tiles: list[Tile] = []
+    for tile, value, dirty_value in zip(tiles, values[1 : num_tiles + 1], values[num_tiles + 1 :], strict=True):
+        if value is None:
+            build_tiles.append(tile)
+            continue
+        tile_data = _decode_tile(value)
+        dirty = max(global_dirty, int(dirty_value) if dirty_value is not None else 0)
+        if dirty > tile_data.built_at:
+            build_tiles.append(tile)
+            continue
+        cached_tiles[tile] = tile_data
+
+    # relations may change without changing their members positions
+    relations_tiles: dict[int, list[Tile]] = defaultdict(list)
+    for tile, tile_data in cached_tiles.items():
+        for tile_element in tile_data.elements:
+            if tile_element.type == 'relation':
+                relations_tiles[tile_element.id].append(tile)
+    if relations_tiles:
+        async with valkey() as conn:
+            relations_values: list[bytes | None] = await conn.mget(
+                *(_relation_dirty_key(relation_id) for relation_id in relations_tiles)
+            )
+        for relation_tiles, dirty_value in zip(relations_tiles.values(), relations_values, strict=True):
+            if dirty_value is None:
+                continue
+            dirty = int(dirty_value)
+            for tile in relation_tiles:
+                tile_data = cached_tiles.get(tile)
+                if tile_data is not None and dirty > tile_data.built_at:
+                    del cached_tiles[tile]
+                    build_tiles.append(tile)
+
+    result: list[Element] = []
+    for tile_data in cached_tiles.values():
+        result.extend(_decode_tile_elements(tile_data))
+
+    if build_tiles:
+        logging.debug('Map tile cache miss for %d of %d tiles', len(build_tiles), num_tiles)
+        semaphore = Semaphore(MAP_TILE_CACHE_BUILD_CONCURRENCY)
+        async with TaskGroup() as tg:
+            tasks = tuple(tg.create_task(_build_tile(tile, semaphore)) for tile in build_tiles)
+        for task in tasks:
+            elements = task.result()
+            if elements is None:
+                return None
+            result.extend(elements)
+
+    # tiles built concurrently with a diff may contain both the superseded and the new version
+    latest: dict[tuple[ElementType, ElementId], Element] = {}
+    for element in result:
+        key = (element.type, element.id)
+        current = latest.get(key)
+        if current is None or current.version < element.version:
+            latest[key] = element
+    return latest.values()
+
+
+async def _build_tile(tile: Tile, semaphore: Semaphore) -> list[Element] | None:
+    """
+    Build the tile and store it in the cache.
+
+    The tile contains its nodes, their ways and relations, with members resolved.
+    Returns None if the tile is too dense to be cached.
+    """
+    tile_geometry = _get_tile_geometry(tile)
+
+    async with semaphore:
+        # read before querying, newer changes will mark the tile as dirty
+        built_at = await ElementQuery.get_current_sequence_id()
+        elements = await ElementQuery.find_many_by_geom(
+            tile_geometry,
+            partial_ways=True,
+            nodes_limit=MAP_QUERY_LEGACY_NODES_LIMIT + 1,
+        )
+        await ElementMemberQuery.resolve_members(elements)
+
+    if sum(element.type == 'node' for element in elements) > MAP_QUERY_LEGACY_NODES_LIMIT:
+        logging.debug('Map tile %r is too dense to be cached', tile)
+        return None
+
+    async with valkey() as conn:
+        await conn.set(_tile_key(tile), _encode_tile(built_at, elements), ex=MAP_TILE_CACHE_EXPIRE)
+
+    return elements
+
+
+async def _filter_elements(
+    geometry: Polygon | MultiPolygon,
+    elements: Iterable[Element],
+    *,
+    nodes_limit: int | None,
+    legacy_nodes_limit: bool,
+) -> list[Element]:
+    """
+    Join the tiles elements into the result of the geometry query.
+
+    The ways nodes outside of the tiles are read from the database.
+    """
+    nodes: list[Element] = []
+    ways: list[Element] = []
+    relations: list[Element] = []
+    for element in elements:
+        element_type = element.type
+        if element_type == 'node':
+            nodes.append(element)
+        elif element_type == 'way':
+            ways.append(element)
+        else:
+            relations.append(element)
+
+    # match the nodes and their parents, like ElementQuery.find_many_by_geom
+    mask = intersects(geometry, tuple(node.point for node in nodes))
+    geom_nodes = [node for node, matched in zip(nodes, mask.tolist(), strict=True) if matched]
+    if nodes_limit is not None and len(geom_nodes) > nodes_limit:
+        if legacy_nodes_limit:
+            raise_for().map_query_nodes_limit_exceeded()
+        geom_nodes = geom_nodes[:nodes_limit]
+    if not geom_nodes:
+        return []
+
+    geom_node_ids: set[ElementId] = {node.id for node in geom_nodes}
+    result_ways = [
+        way
+        for way in ways  #
+        if any(member.id in geom_node_ids for member in way.members)  # pyright: ignore[reportOptionalIterable]
+    ]
+
+    node_id_map: dict[ElementId, Element] = {node.id: node for node in nodes}
+    ways_nodes_ids: set[ElementId] = {member.id for way in result_ways for member in way.members}  # pyright: ignore[reportOptionalIterable]
+    ways_nodes_ids.difference_update(geom_node_ids)
+    ways_nodes: list[Element] = []
+    missing_refs: list[ElementRef] = []
+    for node_id in ways_nodes_ids:
+        node = node_id_map.get(node_id)
+        if node is None:
+            missing_refs.append(ElementRef('node', node_id))
+        else:
+            ways_nodes.append(node)
+    if missing_refs:
+        logging.debug('Map tile cache reading %d outside way nodes', len(missing_refs))
+        missing_nodes = await ElementQuery.get_by_refs(missing_refs, limit=len(missing_refs))
+        await ElementMemberQuery.resolve_members(missing_nodes)
+        ways_nodes.extend(missing_nodes)
+
+    result_ways_ids: set[ElementId] = {way.id for way in result_ways}
+    result_relations = [
+        relation
+        for relation in relations
+        if any(
+            (member.type == 'node' and member.id in geom_node_ids)
+            or (member.type == 'way' and member.id in result_ways_ids)
+            for member in relation.members  # pyright: ignore[reportOptionalIterable]
+        )
+    ]
+
+    return [*geom_nodes, *result_ways, *ways_nodes, *result_relations]
+
+
+def _get_tiles(geometry: Polygon | MultiPolygon) -> list[Tile]:
+    """
+    Get the tiles covering the given geometry.
+    """
+    result: set[Tile] = set()
+    size = MAP_TILE_CACHE_SIZE
+    for polygon in geometry.geoms if isinstance(geometry, MultiPolygon) else (geometry,):
+        minx, miny, maxx, maxy = polygon.bounds
+        result.update(
+            (x, y)
+            for x in range(floor(minx / size), floor(maxx / size) + 1)
+            for y in range(floor(miny / size), floor(maxy / size) + 1)
+        )
+    return list(result)
+
+
+def _get_tile_geometry(tile: Tile) -> Polygon:
+    x, y = tile
+    size = MAP_TILE_CACHE_SIZE
+    return box(x * size, y * size, (x + 1) * size, (y + 1) * size)
+
+
+def _tile_key(tile: Tile) -> str:
+    return f'MapTile:{tile[0]}:{tile[1]}'
+
+
+def _dirty_key(tile: Tile) -> str:
+    return f'MapTileDirty:{tile[0]}:{tile[1]}'
+
+
+def _relation_dirty_key(relation_id: int) -> str:
+    return f'MapTileRelationDirty:{relation_id}'
+
+
+def _encode_tile(built_at: int, elements: Iterable[Element]) -> bytes:
+    """
+    Encode the tile elements together with their members.
+    """
+    tile = MapTile(
+        built_at=built_at,
+        elements=[
+            MapTileElement(
+                sequence_id=element.sequence_id,
+                changeset_id=element.changeset_id,
+                type=element.type,
+                id=element.id,
+                version=element.version,
+                visible=element.visible,
+                tags=element.tags,
+                point=(point.x, point.y) if (point := element.point) is not None else None,
+                members=[(member.type, member.id, member.role) for member in element.members],  # pyright: ignore[reportOptionalIterable]
+                created_at=element.created_at,
+            )
+            for element in elements
+        ],
+    )
+    return _compress(_encode(tile))
+
+
+def _decode_tile(value: bytes) -> MapTile:
+    return _decode(_decompress(value))
+
+
+def _decode_tile_elements(tile: MapTile) -> list[Element]:
+    """
+    Decode the tile into the elements with their members.
+    """
+    result: list[Element] = []
+    for tile_element in tile.elements:
+        element = Element(
+            changeset_id=tile_element.changeset_id,
+            type=tile_element.type,
+            id=ElementId(tile_element.id),
+            version=tile_element.version,
+            visible=tile_element.visible,
+            tags=tile_element.tags,
+            point=Point(point) if (point := tile_element.point) is not None else None,
+            members=[
+                ElementMember(order=order, type=member_type, id=ElementId(member_id), role=role)
+                for order, (member_type, member_id, role) in enumerate(tile_element.members)
+            ],
+        )
+        element.sequence_id = tile_element.sequence_id
+        element.next_sequence_id = None
+        element.created_at = tile_element.created_at
+        result.append(element)
+    return result
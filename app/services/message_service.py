@@ -1,6 +1,9 @@
+from collections import defaultdict
+
 from app.db import db_commit
 from app.lib.auth_context import auth_user
 from app.models.db.message import Message
+from app.services.user_stats_service import UserStatsService
 
 
 class MessageService:
@@ -8,13 +11,24 @@ class MessageService:
     async def send(to_user_id: int, subject: str, body: str) -> None:
         """
         Send a message to a user.
+
+        Marking the message as read must decrement messages_unread of the recipient,
+        and hiding it must decrement the counters of the hiding side (see UserStatsService.rebuild).
         """
+        from_user_id = auth_user(required=True).id
+        stats_changes: defaultdict[int, dict[str, int]] = defaultdict(dict)
+        stats_changes[from_user_id]['messages_sent'] = 1
+        stats_changes[to_user_id].update(messages_received=1, messages_unread=1)
+
         async with db_commit() as session:
             session.add(
                 Message(
-                    from_user_id=auth_user(required=True).id,
+                    from_user_id=from_user_id,
                     to_user_id=to_user_id,
                     subject=subject,
                     body=body,
                 )
             )
+            # update the rows in a consistent order, concurrent replies would deadlock otherwise
+            for user_id in sorted(stats_changes):
+                await UserStatsService.update(session, user_id, **stats_changes[user_id])
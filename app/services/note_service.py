@@ -13,6 +13,7 @@ from app.middlewares.request_context_middleware import get_request_ip
 from app.models.db.note import Note
 from app.models.db.note_comment import NoteComment, NoteEvent
 from app.models.db.note_subscription import NoteSubscription
+from app.services.user_stats_service import UserStatsService
 from app.validators.geometry import validate_geometry
 
 
@@ -49,6 +50,8 @@ class NoteService:
             await session.flush()
 
             note.updated_at = note_comment.created_at
+            if user_id is not None:
+                await UserStatsService.update(session, user_id, notes=1)
 
         if user_id is not None:
             logging.debug('Created note %d for user %s', note.id, user_id)
@@ -113,6 +116,7 @@ class NoteService:
             await session.flush((note_comment,))
 
             note.updated_at = note_comment.created_at
+            await UserStatsService.update(session, user.id, note_comments=1)
 
         await NoteService.subscribe(note_id)
 
@@ -12,6 +12,7 @@ from app.models.db.oauth2_application import OAuth2Application
 from app.models.db.oauth2_token import OAuth2Token
 from app.models.scope import Scope
 from app.models.types import Uri
+from app.services.auth_service import AuthService
 
 
 class OAuth2ApplicationService:
@@ -107,6 +108,7 @@ class OAuth2ApplicationService:
             await session.commit()
             stmt_delete = delete(OAuth2Token).where(OAuth2Token.application_id == app_id)
             await session.execute(stmt_delete)
+        await AuthService.invalidate_tokens(app_id=app_id)
 
     @staticmethod
     async def reset_client_secret(app_id: int) -> str:
@@ -142,3 +144,4 @@ class OAuth2ApplicationService:
                 OAuth2Application.user_id == auth_user(required=True).id,
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(app_id=app_id)
@@ -17,6 +17,7 @@ from app.models.db.oauth2_token import OAuth2CodeChallengeMethod, OAuth2Token
 from app.models.scope import Scope
 from app.queries.oauth2_application_query import OAuth2ApplicationQuery
 from app.queries.oauth2_token_query import OAuth2TokenQuery
+from app.services.auth_service import AuthService
 from app.utils import extend_query_params
 
 # TODO: limit number of access tokens per user+app
@@ -150,6 +151,7 @@ class OAuth2TokenService:
             token.code_challenge_method = None
             token.code_challenge = None
 
+        await AuthService.invalidate_tokens(user_id=token.user_id)
         return {
             'access_token': access_token,
             'token_type': 'Bearer',
@@ -169,6 +171,7 @@ class OAuth2TokenService:
                 OAuth2Token.id == token_id,
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=auth_user(required=True).id)
 
     @staticmethod
     async def revoke_by_access_token(access_token: str) -> None:
@@ -182,6 +185,7 @@ class OAuth2TokenService:
                 OAuth2Token.token_hashed == access_token_hashed,
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=auth_user(required=True).id)
 
     @staticmethod
     async def revoke_by_app_id(app_id: int, *, skip_ids: Iterable[int] | None = None) -> None:
@@ -197,6 +201,7 @@ class OAuth2TokenService:
                 OAuth2Token.id.notin_(skip_ids),
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=auth_user(required=True).id)
 
     @staticmethod
     async def revoke_by_client_id(client_id: str, *, skip_ids: Iterable[int] | None = None) -> None:
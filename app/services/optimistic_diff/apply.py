@@ -3,28 +3,86 @@ from asyncio import Lock, TaskGroup
 from collections import defaultdict
 from collections.abc import Collection, Iterable, Mapping
 from datetime import datetime
+from time import monotonic
 
 import cython
-from sqlalchemy import and_, null, or_, select, text, update
+from sqlalchemy import ARRAY, Integer, and_, bindparam, null, or_, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import DeclarativeBase, aliased
+from sqlalchemy.orm import aliased
 
 from app.db import db_commit
 from app.exceptions.optimistic_diff_error import OptimisticDiffError
 from app.lib.date_utils import utcnow
+from app.limits import OPTIMISTIC_DIFF_LOCK_MAX_REFS
+from app.middlewares.runtime_middleware import record_timing
 from app.models.db.changeset import Changeset
-from app.models.db.changeset_bounds import ChangesetBounds
 from app.models.db.element import Element
 from app.models.db.element_member import ElementMember
 from app.models.element import ElementId, ElementRef, ElementType, VersionedElementRef
 from app.queries.changeset_query import ChangesetQuery
 from app.queries.element_query import ElementQuery
+from app.services.element_sequence_service import ElementSequenceService
+from app.services.map_tile_cache_service import MapTileCacheService
 from app.services.optimistic_diff.prepare import ElementStateEntry, OptimisticDiffPrepare
-
-# allow reads but prevent writes
-_lock_tables: tuple[type[DeclarativeBase], ...] = (Changeset, ChangesetBounds, Element, ElementMember)
-_lock_tables_names = (f'"{t.__tablename__}"' for t in _lock_tables)
-_lock_tables_sql = text(f'LOCK TABLE {",".join(_lock_tables_names)} IN EXCLUSIVE MODE')
+from app.services.way_geometry_service import WayGeometryService
+
+# transaction-level advisory locks, released on commit:
+# - (namespace, -2) is held shared by the diffs, and exclusive by the large diffs and the bulk writers
+# - (namespace, key) serializes the diffs touching the same element ref
+# - (namespace, -1) serializes the sequence_id and id allocation, in a short separate transaction
+# - (commit key base + last sequence_id) is held by the diff since its allocation, the diffs wait for
+#   the lower ones before commit, so the sequence head is always a consistent snapshot
+_lock_namespace = 0x6F736D  # 'osm'
+_commit_key_base = _lock_namespace << 40
+_lock_global_sql = text('SELECT pg_advisory_xact_lock(:namespace, -2)')
+_lock_global_shared_sql = text('SELECT pg_advisory_xact_lock_shared(:namespace, -2)')
+_lock_keys_sql = text(
+    'SELECT pg_advisory_xact_lock(:namespace, key) FROM unnest(:keys) WITH ORDINALITY AS t(key, i) ORDER BY i'
+).bindparams(bindparam('keys', type_=ARRAY(Integer)))
+_lock_sequence_sql = text('SELECT pg_advisory_xact_lock(:namespace, -1)')
+_lock_commit_sql = text('SELECT pg_advisory_xact_lock(:key)')
+# shared, so the waiting diffs do not block each other
+_wait_commits_sql = text("""
+SELECT pg_advisory_xact_lock_shared(key)
+FROM (
+    SELECT (classid::bigint << 32) | objid::bigint AS key
+    FROM pg_locks
+    WHERE locktype = 'advisory' AND objsubid = 1 AND mode = 'ExclusiveLock' AND granted
+) AS t
+WHERE key BETWEEN :min_key AND :max_key
+ORDER BY key
+""")
+_type_index: dict[ElementType, int] = {'node': 0, 'way': 1, 'relation': 2}
+
+# the sequences store the last allocated values, as the uncommitted elements are not visible to max()
+_allocate_sql = text("""
+WITH current AS (
+    SELECT
+        GREATEST(
+            (SELECT last_value FROM element_sequence_id_seq),
+            (SELECT max(sequence_id) FROM element)
+        ) AS sequence_id,
+        GREATEST(
+            (SELECT last_value FROM element_node_id_seq),
+            (SELECT max(id) FROM element WHERE type = 'node')
+        ) AS node_id,
+        GREATEST(
+            (SELECT last_value FROM element_way_id_seq),
+            (SELECT max(id) FROM element WHERE type = 'way')
+        ) AS way_id,
+        GREATEST(
+            (SELECT last_value FROM element_relation_id_seq),
+            (SELECT max(id) FROM element WHERE type = 'relation')
+        ) AS relation_id
+)
+SELECT
+    sequence_id, node_id, way_id, relation_id,
+    setval('element_sequence_id_seq', sequence_id + :sequence_ids),
+    setval('element_node_id_seq', node_id + :node_ids),
+    setval('element_way_id_seq', way_id + :way_ids),
+    setval('element_relation_id_seq', relation_id + :relation_ids)
+FROM current
+""")
 
 # session.add() during .flush() is not supported
 _flush_lock = Lock()
@@ -45,8 +103,10 @@ class OptimisticDiffApply:
             return {}
 
         async with db_commit() as session, TaskGroup() as tg:
-            # obtain exclusive lock on the tables
-            await session.execute(_lock_tables_sql)
+            # obtain locks on the touched element refs and the changeset,
+            # non-overlapping diffs are validated and inserted concurrently
+            await _lock_refs(prepare, session)
+            refs_locked_at = monotonic()
 
             # check if the element_state is valid
             tg.create_task(_check_elements_latest(prepare.element_state))
@@ -62,10 +122,129 @@ class OptimisticDiffApply:
 
             now = utcnow()
             tg.create_task(_update_changeset(prepare.changeset, now, session))  # pyright: ignore[reportArgumentType]
-            tg.create_task(_update_elements(prepare.apply_elements, now, session))
-
+            update_elements_task = tg.create_task(_update_elements(prepare.apply_elements, now, session))
+
+        # the locks are released on commit
+        committed_at = monotonic()
+        sequence_lock_time = update_elements_task.result()
+        logging.debug(
+            'Optimistic apply of %d elements held the refs lock for %.3fs and the sequence lock for %.3fs',
+            len(prepare.apply_elements),
+            committed_at - refs_locked_at,
+            sequence_lock_time,
+        )
+        record_timing('refs_lock', committed_at - refs_locked_at)
+        record_timing('sequence_lock', sequence_lock_time)
+
+        # advance the sequence head and mark the changed map tiles for rebuild (after commit)
+        last_sequence_id = prepare.apply_elements[-1][0].sequence_id
+        async with TaskGroup() as tg:
+            tg.create_task(ElementSequenceService.advance(last_sequence_id))
+            tg.create_task(_invalidate_map_tiles(prepare, last_sequence_id))
         return assigned_ref_map
 
+    @staticmethod
+    async def lock_all(session: AsyncSession) -> None:
+        """
+        Obtain the exclusive diff lock, held until commit.
+
+        Used by the bulk writers that bypass the optimistic diff, like the replication import.
+        No diff is in progress while the lock is held, so max(sequence_id) and max(id) are safe to assign from.
+        """
+        await session.execute(_lock_global_sql, {'namespace': _lock_namespace})
+
+
+async def _lock_refs(prepare: OptimisticDiffPrepare, session: AsyncSession) -> None:
+    """
+    Lock the touched element refs and the changeset row.
+
+    The keys are locked in the ascending order to prevent deadlocks.
+    Diffs touching more than OPTIMISTIC_DIFF_LOCK_MAX_REFS refs lock exclusively instead.
+    """
+    keys: set[int] = set()
+    for ref in prepare.element_state:
+        if ref.id > 0:
+            keys.add(_get_lock_key(ref))
+    for ref in prepare.reference_check_element_refs:
+        keys.add(_get_lock_key(ref))
+    for element, _ in prepare.apply_elements:
+        for member in element.members:  # pyright: ignore[reportOptionalIterable]
+            if member.id > 0:
+                keys.add(_get_lock_key(ElementRef(member.type, member.id)))
+
+    if len(keys) > OPTIMISTIC_DIFF_LOCK_MAX_REFS:
+        await session.execute(_lock_global_sql, {'namespace': _lock_namespace})
+    else:
+        await session.execute(_lock_global_shared_sql, {'namespace': _lock_namespace})
+        await session.execute(_lock_keys_sql, {'namespace': _lock_namespace, 'keys': sorted(keys)})
+    changeset_id = prepare.changeset.id  # pyright: ignore[reportOptionalMemberAccess]
+    await session.execute(select(Changeset.id).where(Changeset.id == changeset_id).with_for_update())
+
+
+async def _invalidate_map_tiles(prepare: OptimisticDiffPrepare, sequence_id: int) -> None:
+    """
+    Mark the changed map tiles and relations for rebuild.
+
+    The diff is already committed, so on failure all the map tiles are invalidated instead.
+    """
+    relation_ids = {
+        element.id
+        for element, _ in prepare.apply_elements  #
+        if element.type == 'relation' and element.id > 0
+    }
+    try:
+        await MapTileCacheService.invalidate(prepare.bbox_points, relation_ids, sequence_id)
+    except Exception:
+        logging.warning('Failed to invalidate map tiles at sequence_id %d', sequence_id, exc_info=True)
+        try:
+            await MapTileCacheService.invalidate_all(sequence_id)
+        except Exception:
+            logging.exception('Failed to invalidate all map tiles at sequence_id %d', sequence_id)
+
+
+@cython.cfunc
+def _get_lock_key(ref: ElementRef) -> cython.int:
+    # collisions only serialize the unrelated diffs
+    return (ref.id * 3 + _type_index[ref.type]) & 0x7FFFFFFF
+
+
+async def _allocate(
+    session: AsyncSession,
+    num_sequence_ids: int,
+    num_ids: Mapping[ElementType, int],
+) -> tuple[int, dict[ElementType, ElementId], float]:
+    """
+    Allocate the sequence_id and id ranges, and enter the commit order.
+
+    Returns the current sequence_id, the current ids, and the time the sequence lock was held.
+    """
+    async with db_commit() as allocate_session:
+        await allocate_session.execute(_lock_sequence_sql, {'namespace': _lock_namespace})
+        lock_acquired_at = monotonic()
+        row = (
+            await allocate_session.execute(
+                _allocate_sql,
+                {
+                    'sequence_ids': num_sequence_ids,
+                    'node_ids': num_ids.get('node', 0),
+                    'way_ids': num_ids.get('way', 0),
+                    'relation_ids': num_ids.get('relation', 0),
+                },
+            )
+        ).one()
+
+        # the next allocations wait for this commit, so enter the order before releasing the sequence lock
+        current_sequence_id: int = row[0]
+        await session.execute(_lock_commit_sql, {'key': _commit_key_base + current_sequence_id + num_sequence_ids})
+
+    lock_released_at = monotonic()
+    current_id_map: dict[ElementType, ElementId] = {
+        'node': ElementId(row[1]),
+        'way': ElementId(row[2]),
+        'relation': ElementId(row[3]),
+    }
+    return current_sequence_id, current_id_map, lock_released_at - lock_acquired_at
+
 
 async def _check_elements_latest(element_state: dict[ElementRef, ElementStateEntry]) -> None:
     """
@@ -114,16 +293,17 @@ async def _update_elements(
     elements: Collection[tuple[Element, ElementRef]],
     now: datetime,
     session: AsyncSession,
-) -> None:
+) -> float:
     """
     Update the element table by creating new revisions.
+
+    Returns the time the sequence lock was held.
     """
-    async with TaskGroup() as tg:
-        current_sequence_task = tg.create_task(ElementQuery.get_current_sequence_id())
-        current_id_task = tg.create_task(ElementQuery.get_current_ids())
+    num_ids: dict[ElementType, int] = defaultdict(int)
+    for element_ref in {element_ref for element, element_ref in elements if element.id < 0}:
+        num_ids[element_ref.type] += 1
 
-    current_sequence_id = current_sequence_task.result()
-    current_id_map = current_id_task.result()
+    current_sequence_id, current_id_map, sequence_lock_time = await _allocate(session, len(elements), num_ids)
     update_type_ids: dict[ElementType, list[ElementId]] = defaultdict(list)
     insert_members: list[ElementMember] = []
     prev_map: dict[ElementRef, Element] = {}
@@ -171,6 +351,7 @@ async def _update_elements(
                 member.id = assigned_id_map[member_ref]
 
     await _update_elements_db(current_sequence_id, update_type_ids, insert_elements, insert_members, session)
+    return sequence_lock_time
 
 
 async def _update_elements_db(
@@ -222,3 +403,17 @@ async def _update_elements_db(
             .inline()
         )
         await session.execute(stmt)
+
+    # wait for the previously allocated diffs to commit (or rollback), the geometries read their nodes
+    await session.execute(
+        _wait_commits_sql,
+        {'min_key': _commit_key_base, 'max_key': _commit_key_base + current_sequence_id},
+    )
+
+    # update the cached geometries, after the previous versions were superseded
+    await WayGeometryService.update(
+        session,
+        way_ids=[element.id for element in insert_elements if element.type == 'way'],
+        node_ids=[element.id for element in insert_elements if element.type == 'node' and element.version > 1],
+        sequence_id=current_sequence_id + len(insert_elements),
+    )
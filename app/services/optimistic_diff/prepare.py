@@ -84,9 +84,9 @@ class OptimisticDiffPrepare:
     Local changeset state.
     """
 
-    _bbox_points: list[Point]
+    bbox_points: list[Point]
     """
-    Changeset bounding box collection of points.
+    Changeset bounding box collection of points, also used for the map tile cache invalidation.
     """
 
     _bbox_refs: set[ElementRef]
@@ -104,7 +104,7 @@ class OptimisticDiffPrepare:
         self.reference_check_element_refs = set()
         self._reference_override = defaultdict(set)
         self.changeset = None
-        self._bbox_points = []
+        self.bbox_points = []
         self._bbox_refs = set()
 
     async def prepare(self) -> None:
@@ -170,6 +170,9 @@ class OptimisticDiffPrepare:
     async def _set_sequence_id(self) -> None:
         """
         Set the current sequence_id.
+
+        Queries the database, the shared sequence head may lag behind on the other workers
+        and miss the elements created by the previous upload.
         """
         if self.at_sequence_id > 0:
             raise AssertionError('Sequence id must not be set')
@@ -362,7 +365,7 @@ class OptimisticDiffPrepare:
         """
         Push bbox info for a node.
         """
-        bbox_points = self._bbox_points
+        bbox_points = self.bbox_points
         element_point = element.point
         if element_point is not None:
             bbox_points.append(element_point)
@@ -385,7 +388,7 @@ class OptimisticDiffPrepare:
         node_refs: set[ElementRef] = {ElementRef('node', member.id) for member in chain(next_members, prev_members)}
 
         element_state = self.element_state
-        bbox_points = self._bbox_points
+        bbox_points = self.bbox_points
         bbox_refs = self._bbox_refs
         for node_ref in node_refs:
             entry = element_state.get(node_ref)
@@ -420,7 +423,7 @@ class OptimisticDiffPrepare:
 
         diff_refs = (prev_refs | next_refs) if full_diff else (changed_refs)
         element_state = self.element_state
-        bbox_points = self._bbox_points
+        bbox_points = self.bbox_points
         bbox_refs = self._bbox_refs
         for member_ref in diff_refs:
             member_type = member_ref.type
@@ -492,7 +495,7 @@ class OptimisticDiffPrepare:
         """
         Update changeset bounds using the collected bbox info.
         """
-        bbox_points = self._bbox_points
+        bbox_points = self.bbox_points
         bbox_refs = self._bbox_refs
 
         if bbox_refs:
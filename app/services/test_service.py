@@ -52,7 +52,7 @@ class TestService:
             """
             email = EmailType(f'{name}@{TEST_USER_DOMAIN}')
             name_available = await UserQuery.check_display_name_available(name)
-            password_hashed = PasswordHash.hash(PasswordType(SecretStr(TEST_USER_PASSWORD)))
+            password_hashed = await PasswordHash.hash(PasswordType(SecretStr(TEST_USER_PASSWORD)))
 
             async with db_commit() as session:
                 if name_available:
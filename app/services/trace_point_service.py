@@ -0,0 +1,168 @@
+from asyncio import TaskGroup
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from time import time
+
+import msgspec
+from Cryptodome.Cipher import AES
+from shapely import MultiPolygon, Polygon
+from sqlalchemy.orm import joinedload
+
+from app.config import SECRET
+from app.db import valkey
+from app.lib.buffered_random import buffered_randbytes
+from app.lib.crypto import hash_bytes
+from app.lib.exceptions_context import raise_for
+from app.lib.options_context import options_context
+from app.limits import (
+    TRACE_POINT_QUERY_CURSOR_EXPIRE,
+    TRACE_POINT_QUERY_DEFAULT_LIMIT,
+    TRACE_POINT_QUERY_LEGACY_MAX_SKIP,
+)
+from app.models.db.trace_ import Trace
+from app.models.db.trace_segment import TraceSegment
+from app.models.trace_point_cursor import TracePointCursor, TraceSegmentPosition
+from app.queries.trace_segment_query import TraceSegmentQuery
+
+_encode = msgspec.msgpack.Encoder().encode
+_decode = msgspec.msgpack.Decoder(TracePointCursor).decode
+
+# cursors are encrypted and authenticated, they must not link the anonymous points to their traces
+_cursor_key = hash_bytes(f'{SECRET}:TracePointCursor')
+_cursor_nonce_size = 12
+_cursor_tag_size = 16
+
+
+class TracePointService:
+    @staticmethod
+    async def find_many_by_geometry(
+        geometry: Polygon | MultiPolygon,
+        *,
+        cursor: str | None,
+        legacy_page: int,
+    ) -> tuple[list[TraceSegment], str | None]:
+        """
+        Find the page of trace points within the geometry.
+
+        The page starts at the cursor, or at the legacy page number if the cursor is not given.
+
+        Returns the page segments and the next page cursor.
+        """
+        if cursor is not None:
+            state = _decode_cursor(cursor)
+        elif legacy_page:
+            state = await _get_legacy_state(geometry, legacy_page)
+        else:
+            state = None
+
+        segments, next_state = await _find_page(geometry, state)
+        if next_state is None:
+            return segments, None
+
+        next_cursor = _encode_cursor(next_state)
+        if cursor is None:
+            # remember the next page for the legacy clients
+            async with valkey() as conn:
+                await conn.set(
+                    _get_legacy_key(geometry, legacy_page + 1),
+                    next_cursor,
+                    ex=TRACE_POINT_QUERY_CURSOR_EXPIRE,
+                )
+        return segments, next_cursor
+
+
+async def _find_page(
+    geometry: Polygon | MultiPolygon,
+    state: TracePointCursor | None,
+) -> tuple[list[TraceSegment], TracePointCursor | None]:
+    """
+    Find the page of trace points, starting at the state (or at the beginning if None).
+
+    Returns the page segments and the next page state (or None if exhausted).
+    """
+
+    async def public_task(position: TraceSegmentPosition | None):
+        with options_context(joinedload(TraceSegment.trace).load_only(Trace.name, Trace.description, Trace.visibility)):
+            return await TraceSegmentQuery.find_many_by_geometry(
+                geometry,
+                identifiable_trackable=True,
+                limit=TRACE_POINT_QUERY_DEFAULT_LIMIT,
+                position=position,
+            )
+
+    async def private_task(position: TraceSegmentPosition | None):
+        return await TraceSegmentQuery.find_many_by_geometry(
+            geometry,
+            identifiable_trackable=False,
+            limit=TRACE_POINT_QUERY_DEFAULT_LIMIT,
+            position=position,
+        )
+
+    async with TaskGroup() as tg:
+        # a missing position in the state means the visibility is exhausted
+        public_t = (
+            tg.create_task(public_task(state.public if state is not None else None))
+            if state is None or state.public is not None
+            else None
+        )
+        private_t = (
+            tg.create_task(private_task(state.private if state is not None else None))
+            if state is None or state.private is not None
+            else None
+        )
+
+    public_segments, public_next = public_t.result() if public_t is not None else ((), None)
+    private_segments, private_next = private_t.result() if private_t is not None else ((), None)
+    segments = [*public_segments, *private_segments]
+    if public_next is None and private_next is None:
+        return segments, None
+    return segments, TracePointCursor(created_at=int(time()), public=public_next, private=private_next)
+
+
+async def _get_legacy_state(geometry: Polygon | MultiPolygon, page: int) -> TracePointCursor:
+    """
+    Translate the legacy page number into the page state.
+
+    Sequential legacy clients resume from the remembered state, otherwise the preceding pages are walked.
+    """
+    async with valkey() as conn:
+        cursor: bytes | None = await conn.get(_get_legacy_key(geometry, page))
+    if cursor is not None:
+        return _decode_cursor(cursor.decode())
+
+    if page * TRACE_POINT_QUERY_DEFAULT_LIMIT > TRACE_POINT_QUERY_LEGACY_MAX_SKIP:
+        raise_for().cursor_expired()
+
+    state: TracePointCursor | None = None
+    for _ in range(page):
+        state = (await _find_page(geometry, state))[1]
+        if state is None:
+            # all visibilities are exhausted
+            return TracePointCursor(created_at=int(time()), public=None, private=None)
+    assert state is not None
+    return state
+
+
+def _get_legacy_key(geometry: Polygon | MultiPolygon, page: int) -> str:
+    return f'TracePointLegacyCursor:{geometry.wkt}:{page}'
+
+
+def _encode_cursor(state: TracePointCursor) -> str:
+    nonce = buffered_randbytes(_cursor_nonce_size)
+    cipher = AES.new(key=_cursor_key, mode=AES.MODE_GCM, nonce=nonce, mac_len=_cursor_tag_size)
+    cipher_text, tag = cipher.encrypt_and_digest(_encode(state))
+    return urlsafe_b64encode(b''.join((nonce, tag, cipher_text))).decode()
+
+
+def _decode_cursor(cursor: str) -> TracePointCursor:
+    try:
+        buffer = urlsafe_b64decode(cursor)
+        nonce = buffer[:_cursor_nonce_size]
+        tag = buffer[_cursor_nonce_size : _cursor_nonce_size + _cursor_tag_size]
+        cipher = AES.new(key=_cursor_key, mode=AES.MODE_GCM, nonce=nonce, mac_len=_cursor_tag_size)
+        state = _decode(cipher.decrypt_and_verify(buffer[_cursor_nonce_size + _cursor_tag_size :], tag))
+    except (BinasciiError, ValueError, msgspec.DecodeError):
+        raise_for().bad_cursor()
+    if time() - state.created_at > TRACE_POINT_QUERY_CURSOR_EXPIRE.total_seconds():
+        raise_for().cursor_expired()
+    return state
@@ -11,11 +11,13 @@ from app.lib.auth_context import auth_user
 from app.lib.date_utils import utcnow
 from app.lib.exceptions_context import raise_for
 from app.lib.trace_file import TraceFile
+from app.lib.trace_preview import TracePreview
 from app.lib.xmltodict import XMLToDict
 from app.limits import TRACE_FILE_UPLOAD_MAX_SIZE
 from app.models.db.trace_ import Trace, TraceVisibility
 from app.models.db.trace_segment import TraceSegment
 from app.models.validating.trace_ import TraceValidating
+from app.services.user_stats_service import UserStatsService
 from app.storage import TRACES_STORAGE
 
 
@@ -67,6 +69,9 @@ class TraceService:
             ).model_dump()
         )
         trace.tag_string = tags
+        trace.preview = TracePreview.encode(
+            lib.get_coordinates(np.asarray(tuple(segment.points for segment in segments), dtype=object), False, False)
+        )
         compressed_file, compressed_suffix = TraceFile.compress(file_bytes)
         trace.file_id = await TRACES_STORAGE.save(compressed_file, compressed_suffix)
 
@@ -79,6 +84,12 @@ class TraceService:
                 for segment in segments:
                     segment.trace_id = trace_id
                 session.add_all(segments)
+                await UserStatsService.update(
+                    session,
+                    trace.user_id,
+                    traces=1,
+                    traces_public=int(trace.linked_to_user_on_site),
+                )
 
         except Exception:
             # clean up trace file on error
@@ -107,10 +118,14 @@ class TraceService:
             if trace.user_id != auth_user(required=True).id:
                 raise_for().trace_access_denied(trace_id)
 
+            traces_public_change = -int(trace.linked_to_user_on_site)
             trace.name = name
             trace.description = description
             trace.tag_string = tag_string
             trace.visibility = visibility
+            traces_public_change += int(trace.linked_to_user_on_site)
+            if traces_public_change:
+                await UserStatsService.update(session, trace.user_id, traces_public=traces_public_change)
 
     @staticmethod
     async def delete(trace_id: int) -> None:
@@ -126,6 +141,12 @@ class TraceService:
                 raise_for().trace_access_denied(trace_id)
 
             await session.delete(trace)
+            await UserStatsService.update(
+                session,
+                trace.user_id,
+                traces=-1,
+                traces_public=-int(trace.linked_to_user_on_site),
+            )
 
 
 @cython.cfunc
@@ -61,6 +61,7 @@ class UserService:
                 .inline()
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=current_user.id)
 
     @staticmethod
     async def update_avatar(avatar_type: AvatarType, avatar_file: UploadFile) -> str:
@@ -78,6 +79,7 @@ class UserService:
             old_avatar_id = user.avatar_id
             user.avatar_type = avatar_type
             user.avatar_id = avatar_id
+        await AuthService.invalidate_tokens(user_id=user.id)
 
         # cleanup old avatar
         if old_avatar_id is not None:
@@ -100,6 +102,7 @@ class UserService:
             user = await session.get_one(User, auth_user(required=True).id, with_for_update=True)
             old_background_id = user.background_id
             user.background_id = background_id
+        await AuthService.invalidate_tokens(user_id=user.id)
 
         # cleanup old background
         if old_background_id is not None:
@@ -138,6 +141,7 @@ class UserService:
                 .inline()
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=auth_user(required=True).id)
 
     @staticmethod
     async def update_editor(
@@ -158,6 +162,7 @@ class UserService:
                 .inline()
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=auth_user(required=True).id)
 
     @staticmethod
     async def update_email(
@@ -175,7 +180,7 @@ class UserService:
         if user.email == new_email:
             MessageCollector.raise_error('email', t('validation.new_email_is_current'))
 
-        if not PasswordHash.verify(user.password_hashed, password).success:
+        if not (await PasswordHash.verify(user.password_hashed, password)).success:
             MessageCollector.raise_error('password', t('validation.password_is_incorrect'))
         if not await UserQuery.check_email_available(new_email):
             MessageCollector.raise_error('email', t('validation.email_address_is_taken'))
@@ -197,10 +202,10 @@ class UserService:
         Update user password.
         """
         current_user = auth_user(required=True)
-        if not PasswordHash.verify(current_user.password_hashed, old_password).success:
+        if not (await PasswordHash.verify(current_user.password_hashed, old_password)).success:
             MessageCollector.raise_error('old_password', t('validation.password_is_incorrect'))
 
-        password_hashed = PasswordHash.hash(new_password)
+        password_hashed = await PasswordHash.hash(new_password)
         async with db_commit() as session:
             stmt = (
                 update(User)
@@ -214,6 +219,7 @@ class UserService:
                 .inline()
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=current_user.id)
 
         collector.success(None, t('settings.password_has_been_changed'))
         logging.debug('Changed password for user %r', current_user.id)
@@ -247,6 +253,7 @@ class UserService:
                 .inline()
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=auth_user(required=True).id)
 
     @staticmethod
     async def abort_scheduled_delete() -> None:
@@ -264,6 +271,7 @@ class UserService:
                 )
             )
             await session.execute(stmt)
+        await AuthService.invalidate_tokens(user_id=auth_user(required=True).id)
 
     @staticmethod
     async def delete_old_pending_users():
@@ -42,7 +42,7 @@ class UserSignupService:
         if not await validate_email_deliverability(email):
             MessageCollector.raise_error('email', t('validation.invalid_email_address'))
 
-        password_hashed = PasswordHash.hash(password)
+        password_hashed = await PasswordHash.hash(password)
         created_ip = get_request_ip()
         language = primary_translation_locale()
 
@@ -0,0 +1,158 @@
+from collections import Counter
+from collections.abc import Iterable
+from datetime import date
+
+from sqlalchemy import Date, cast, false, func, null, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.db.changeset import Changeset
+from app.models.db.changeset_comment import ChangesetComment
+from app.models.db.message import Message
+from app.models.db.note_comment import NoteComment, NoteEvent
+from app.models.db.trace_ import Trace
+from app.models.db.user import User
+from app.models.db.user_stats import UserActivity, UserStats
+
+# prevent concurrent counted writes during the rebuild
+_lock_tables_sql = text(
+    f'LOCK TABLE {",".join(f'"{t.__tablename__}"' for t in (Changeset, ChangesetComment, NoteComment, Trace, Message))} '
+    'IN SHARE MODE'
+)
+
+
+class UserStatsService:
+    @staticmethod
+    async def update(session: AsyncSession, user_id: int, **changes: int) -> None:
+        """
+        Change the user counters by the given amounts.
+
+        Must be called in the same transaction that changed the counted rows.
+        """
+        stmt = insert(UserStats).values({'user_id': user_id, **changes})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=(UserStats.user_id,),
+            set_={name: UserStats.__table__.c[name] + stmt.excluded[name] for name in changes},
+        )
+        await session.execute(stmt)
+
+    @staticmethod
+    async def update_activity(session: AsyncSession, user_id: int, *, day: date | None, changesets: int) -> None:
+        """
+        Change the user daily activity by the given amount.
+
+        If day is None, the current statement day is used.
+        """
+        stmt = (
+            insert(UserActivity)
+            .values(
+                {
+                    UserActivity.user_id: user_id,
+                    UserActivity.day: day if (day is not None) else cast(func.statement_timestamp(), Date),
+                    UserActivity.changesets: changesets,
+                }
+            )
+            .inline()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=(UserActivity.user_id, UserActivity.day),
+            set_={UserActivity.changesets: UserActivity.changesets + stmt.excluded.changesets},
+        )
+        await session.execute(stmt)
+
+    @staticmethod
+    async def add_changesets(session: AsyncSession, rows: Iterable[tuple[int | None, date]]) -> None:
+        """
+        Increment the counters of the created (user_id, created day) changesets.
+        """
+        await _update_changesets(session, rows, 1)
+
+    @staticmethod
+    async def remove_changesets(session: AsyncSession, rows: Iterable[tuple[int | None, date]]) -> None:
+        """
+        Decrement the counters of the deleted (user_id, created day) changesets.
+        """
+        await _update_changesets(session, rows, -1)
+
+    @staticmethod
+    async def rebuild(session: AsyncSession) -> None:
+        """
+        Recompute the statistics of all users from the counted rows.
+        """
+        await session.execute(_lock_tables_sql)
+        await session.execute(text(f'TRUNCATE "{UserStats.__tablename__}", "{UserActivity.__tablename__}"'))
+
+        counts = (
+            _count_by(Changeset.user_id, changesets=func.count()),
+            _count_by(ChangesetComment.user_id, changeset_comments=func.count()),
+            _count_by(
+                NoteComment.user_id,
+                notes=func.count().filter(NoteComment.event == NoteEvent.opened),
+                note_comments=func.count().filter(NoteComment.event != NoteEvent.opened),
+            ),
+            _count_by(
+                Trace.user_id,
+                traces=func.count(),
+                traces_public=func.count().filter(Trace.linked_to_user_on_site),
+            ),
+            _count_by(
+                Message.to_user_id,
+                Message.to_hidden == false(),
+                messages_received=func.count(),
+                messages_unread=func.count().filter(Message.is_read == false()),
+            ),
+            _count_by(
+                Message.from_user_id,
+                Message.from_hidden == false(),
+                messages_sent=func.count(),
+            ),
+        )
+        stmt = select(User.id.label('user_id')).select_from(User)
+        names: list[str] = ['user_id']
+        for subq in counts:
+            stmt = stmt.outerjoin(subq, subq.c.user_id == User.id)
+            for column in subq.c:
+                if column.name == 'user_id':
+                    continue
+                names.append(column.name)
+                stmt = stmt.add_columns(func.coalesce(column, 0).label(column.name))
+        await session.execute(insert(UserStats).from_select(names, stmt))
+
+        created_day = cast(Changeset.created_at, Date)
+        activity_stmt = (
+            select(Changeset.user_id, created_day, func.count())
+            .where(Changeset.user_id != null())
+            .group_by(Changeset.user_id, created_day)
+        )
+        await session.execute(
+            insert(UserActivity).from_select(
+                (UserActivity.user_id, UserActivity.day, UserActivity.changesets),
+                activity_stmt,
+            )
+        )
+
+
+async def _update_changesets(session: AsyncSession, rows: Iterable[tuple[int | None, date]], sign: int) -> None:
+    """
+    Change the changeset counters by the number of the (user_id, created day) rows, times the sign.
+    """
+    user_counter: Counter[int] = Counter()
+    day_counter: Counter[tuple[int, date]] = Counter()
+    for user_id, day in rows:
+        if user_id is None:
+            continue
+        user_counter[user_id] += 1
+        day_counter[user_id, day] += 1
+
+    for user_id, count in user_counter.items():
+        await UserStatsService.update(session, user_id, changesets=sign * count)
+    for (user_id, day), count in day_counter.items():
+        await UserStatsService.update_activity(session, user_id, day=day, changesets=sign * count)
+
+
+def _count_by(user_id_column, *where, **counts):
+    """
+    Count the rows per user.
+    """
+    stmt = select(user_id_column.label('user_id'), *(count.label(name) for name, count in counts.items()))
+    return stmt.where(user_id_column != null(), *where).group_by(user_id_column).subquery()
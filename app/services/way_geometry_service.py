@@ -0,0 +1,179 @@
+from collections.abc import Collection
+
+import cython
+from sqlalchemy import BigInteger, and_, delete, func, literal, null, or_, select, text, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models.db.element import Element
+from app.models.db.element_member import ElementMember
+from app.models.db.way_geometry import WayGeometry
+from app.models.element import ElementId
+
+# prevent concurrent element writes, the geometries are computed at the current sequence_id
+_lock_element_sql = text('LOCK TABLE "element" IN SHARE MODE')
+
+
+class WayGeometryService:
+    @staticmethod
+    async def update(
+        session: AsyncSession,
+        *,
+        way_ids: Collection[ElementId],
+        node_ids: Collection[ElementId],
+        sequence_id: int,
+    ) -> None:
+        """
+        Update the geometries of the changed ways and the current parent ways of the changed nodes.
+
+        Must be called in the same transaction that changed the elements.
+        """
+        update_ids: set[ElementId] = set(way_ids)
+        if node_ids:
+            stmt = (
+                select(Element.id)
+                .join(ElementMember, ElementMember.sequence_id == Element.sequence_id)
+                .where(
+                    ElementMember.type == 'node',
+                    ElementMember.id.in_(text(','.join(map(str, node_ids)))),
+                    Element.type == 'way',
+                    Element.next_sequence_id == null(),
+                )
+                .distinct()
+            )
+            update_ids.update(await session.scalars(stmt))
+        if not update_ids:
+            return
+
+        ids_sql = text(','.join(map(str, update_ids)))
+        await session.execute(delete(WayGeometry).where(WayGeometry.id.in_(ids_sql)))
+        await session.execute(
+            insert(WayGeometry).from_select(
+                (WayGeometry.id, WayGeometry.sequence_id, WayGeometry.geometry),
+                _select_geometries(Element.id.in_(ids_sql), sequence_id),
+            )
+        )
+
+    @staticmethod
+    async def update_batch(session: AsyncSession, *, after: ElementId, limit: int) -> ElementId | None:
+        """
+        Compute the geometries of the next batch of current ways, ordered by id.
+
+        Returns the last processed way id, or None if there are no more ways.
+        """
+        await session.execute(_lock_element_sql)
+        last_id = await _get_batch_last_id(session, after, limit)
+        if last_id is None:
+            return None
+
+        sequence_id: int = await session.scalar(select(func.max(Element.sequence_id)))  # pyright: ignore[reportAssignmentType]
+        stmt = insert(WayGeometry).from_select(
+            (WayGeometry.id, WayGeometry.sequence_id, WayGeometry.geometry),
+            _select_geometries(and_(Element.id > after, Element.id <= last_id), sequence_id),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=(WayGeometry.id,),
+            set_={
+                WayGeometry.sequence_id: stmt.excluded.sequence_id,
+                WayGeometry.geometry: stmt.excluded.geometry,
+            },
+        )
+        await session.execute(stmt)
+        return last_id
+
+    @staticmethod
+    async def check_batch(
+        session: AsyncSession,
+        *,
+        after: ElementId,
+        limit: int,
+    ) -> tuple[ElementId | None, list[ElementId]]:
+        """
+        Check the cached geometries of the next batch of current ways against their nodes.
+
+        Returns a tuple of (last processed way id, inconsistent way ids).
+        """
+        await session.execute(_lock_element_sql)
+        last_id = await _get_batch_last_id(session, after, limit)
+        if last_id is None:
+            # check the remaining cached geometries of the deleted ways
+            last_id = await session.scalar(select(func.max(WayGeometry.id)).where(WayGeometry.id > after))
+            if last_id is None:
+                return None, []
+
+        computed = _select_geometries(and_(Element.id > after, Element.id <= last_id), None).subquery()
+        cached = (
+            select(WayGeometry.id, WayGeometry.geometry)
+            .where(WayGeometry.id > after, WayGeometry.id <= last_id)
+            .subquery()
+        )
+        stmt = (
+            select(func.coalesce(computed.c.id, cached.c.id))
+            .select_from(computed)
+            .join(cached, cached.c.id == computed.c.id, full=True)
+            .where(
+                or_(
+                    computed.c.id == null(),
+                    cached.c.id == null(),
+                    ~func.ST_OrderingEquals(computed.c.geometry, cached.c.geometry),
+                )
+            )
+        )
+        return last_id, list(await session.scalars(stmt))
+
+
+@cython.cfunc
+def _select_geometries(where, sequence_id: int | None):
+    """
+    Select the current way geometries from their current nodes.
+
+    Ways with less than 2 nodes are skipped, they are not valid linestrings.
+    Ways with missing or deleted nodes are skipped too, ST_MakeLine would bridge over them,
+    while the leaflet encoder splits the way on such gaps.
+    """
+    N = aliased(Element)  # noqa: N806
+    return (
+        select(
+            Element.id.label('id'),
+            literal(sequence_id, BigInteger).label('sequence_id'),
+            func.ST_MakeLine(aggregate_order_by(N.point, ElementMember.order.asc())).label('geometry'),
+        )
+        .select_from(Element)
+        .join(ElementMember, ElementMember.sequence_id == Element.sequence_id)
+        .join(
+            N,
+            and_(
+                N.type == 'node',
+                N.id == ElementMember.id,
+                N.next_sequence_id == null(),
+            ),
+            isouter=True,
+        )
+        .where(
+            where,
+            Element.type == 'way',
+            Element.visible == true(),
+            Element.next_sequence_id == null(),
+        )
+        .group_by(Element.id)
+        .having(func.count() >= 2, func.count(N.point) == func.count())
+    )
+
+
+async def _get_batch_last_id(session: AsyncSession, after: ElementId, limit: int) -> ElementId | None:
+    """
+    Get the last current way id of the next batch.
+    """
+    subq = (
+        select(Element.id)
+        .where(
+            Element.type == 'way',
+            Element.id > after,
+            Element.next_sequence_id == null(),
+        )
+        .order_by(Element.id.asc())
+        .limit(limit)
+        .subquery()
+    )
+    return await session.scalar(select(func.max(subq.c.id)))
@@ -5,3 +5,4 @@ AVATAR_STORAGE = LocalStorage('avatar')
 BACKGROUND_STORAGE = LocalStorage('background')
 GRAVATAR_STORAGE = GravatarStorage()
 TRACES_STORAGE = LocalStorage('traces')
+TRACE_DICTS_STORAGE = LocalStorage('trace_dicts')
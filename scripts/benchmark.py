@@ -1,51 +1,451 @@
+import argparse
 import asyncio
+import sys
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from time import perf_counter
 
 import numpy as np
+import polars as pl
+from httpx import ASGITransport, AsyncClient, Response
+from sqlalchemy import text
 
-from app.utils import HTTP
+from app.db import db
+from app.lib.xmltodict import XMLToDict
+from app.utils import JSON_DECODE, JSON_ENCODE
 
+# all the generated data is located within this area
+_area_center = (20.0, 50.0)  # (lon, lat)
+_area_size = 1.0  # in degrees
+# the statistics collector reports table usage asynchronously
+_pg_stat_flush_delay = 1.0  # in seconds
 
-async def benchmark(url: str, *, warmup: int = 5, num: int = 100) -> list[float]:
-    times = []
+Scenario = Callable[[AsyncClient], Awaitable[Response]]
 
+
+def generate(output_dir: Path, *, scale: int, seed: int) -> None:
+    """
+    Generate a deterministic synthetic preload dataset of approximately scale nodes.
+    """
+    rng = np.random.default_rng(seed)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    created_at = datetime(2020, 1, 1, tzinfo=UTC)
+
+    num_users = max(scale // 10_000, 1)
+    num_changesets = max(scale // 1_000, 1)
+    num_nodes = scale
+    num_ways = scale // 10
+    num_relations = scale // 1_000
+
+    # users and changesets
+    user_ids = np.arange(1, num_users + 1)
+    pl.DataFrame(
+        {
+            'id': user_ids,
+            'display_name': [f'benchmark{i}' for i in user_ids],
+            'email': [f'benchmark{i}@localhost.invalid' for i in user_ids],
+            'password_hashed': 'x',
+            'created_ip': '127.0.0.1',
+            'status': 'active',
+            'auth_provider': None,
+            'auth_uid': None,
+            'language': 'en',
+            'activity_tracking': True,
+            'crash_reporting': True,
+        }
+    ).write_parquet(output_dir.joinpath('user.parquet'))
+
+    changeset_ids = np.arange(1, num_changesets + 1)
+    pl.DataFrame(
+        {
+            'id': changeset_ids,
+            'user_id': rng.integers(1, num_users + 1, num_changesets),
+            'closed_at': created_at,
+            'size': 0,
+            'tags': '{}',
+        }
+    ).write_parquet(output_dir.joinpath('changeset.parquet'))
+
+    # nodes: half uniformly distributed, half in dense clusters
+    num_uniform = num_nodes // 2
+    num_clusters = max(num_nodes // 50_000, 1)
+    cluster_centers = rng.uniform(-0.4, 0.4, (num_clusters, 2))
+    coords = np.concatenate(
+        (
+            rng.uniform(-0.5, 0.5, (num_uniform, 2)),
+            cluster_centers[rng.integers(0, num_clusters, num_nodes - num_uniform)]
+            + rng.normal(0, 0.01, (num_nodes - num_uniform, 2)),
+        )
+    )
+    coords = coords * _area_size + _area_center
+    # order the nodes spatially, so that consecutive nodes make sensible ways
+    coords = coords[np.lexsort((coords[:, 0], np.floor(coords[:, 1] * 100)))]
+
+    node_ids = np.arange(1, num_nodes + 1)
+    way_ids = np.arange(1, num_ways + 1)
+    relation_ids = np.arange(1, num_relations + 1)
+    element_types = ['node'] * num_nodes + ['way'] * num_ways + ['relation'] * num_relations
+    element_ids = np.concatenate((node_ids, way_ids, relation_ids))
+    num_elements = len(element_ids)
+    sequence_ids = np.arange(1, num_elements + 1)
+    node_tags = np.where(rng.random(num_nodes) < 0.1, '{"amenity":"bench"}', '{}')
+
+    pl.DataFrame(
+        {
+            'sequence_id': sequence_ids,
+            'changeset_id': rng.integers(1, num_changesets + 1, num_elements),
+            'type': element_types,
+            'id': element_ids,
+            'version': 1,
+            'visible': True,
+            'tags': np.concatenate(
+                (node_tags, ['{"highway":"residential"}'] * num_ways, ['{"type":"route"}'] * num_relations)
+            ),
+            'point': [f'POINT({x:.7f} {y:.7f})' for x, y in coords.tolist()] + [None] * (num_ways + num_relations),
+            'created_at': [created_at + timedelta(seconds=i) for i in range(num_elements)],
+            'next_sequence_id': pl.Series([None] * num_elements, dtype=pl.Int64),
+        },
+    ).write_parquet(output_dir.joinpath('element.parquet'))
+
+    # ways are made of 2-20 consecutive nodes, relations of 2-10 random ways
+    members_sequence_id: list[int] = []
+    members_order: list[int] = []
+    members_type: list[str] = []
+    members_id: list[int] = []
+    way_sizes = rng.integers(2, min(num_nodes, 20) + 1, num_ways) if num_ways else ()
+    way_starts = rng.integers(1, num_nodes - way_sizes + 2) if num_ways else ()
+    for way_index, (start, size) in enumerate(zip(way_starts, way_sizes, strict=True)):
+        members_sequence_id.extend([num_nodes + way_index + 1] * size)
+        members_order.extend(range(size))
+        members_type.extend(['node'] * size)
+        members_id.extend(range(start, start + size))
+    for relation_index, size in enumerate(rng.integers(2, 11, num_relations)):
+        members_sequence_id.extend([num_nodes + num_ways + relation_index + 1] * size)
+        members_order.extend(range(size))
+        members_type.extend(['way'] * size)
+        members_id.extend(rng.integers(1, num_ways + 1, size).tolist())
+
+    pl.DataFrame(
+        {
+            'sequence_id': members_sequence_id,
+            'order': pl.Series(members_order, dtype=pl.Int16),
+            'type': members_type,
+            'id': members_id,
+            'role': '',
+        }
+    ).write_parquet(output_dir.joinpath('element_member.parquet'))
+
+    print(f'Generated {num_elements} elements and {len(members_id)} members in {output_dir}')
+    print(f'Load the dataset with: PRELOAD_DIR={output_dir} python scripts/preload_load.py')
+
+
+def _bbox(size: float) -> str:
+    x, y = _area_center
+    return f'{x - size / 2},{y - size / 2},{x + size / 2},{y + size / 2}'
+
+
+def _gpx(rng: np.random.Generator, num_points: int) -> bytes:
+    coords = np.cumsum(rng.normal(0, 0.0001, (num_points, 2)), axis=0) + _area_center
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    return XMLToDict.unparse(
+        {
+            'gpx': {
+                '@version': '1.1',
+                '@creator': 'benchmark',
+                'trk': {
+                    'trkseg': {
+                        'trkpt': [
+                            {'@lon': x, '@lat': y, 'time': start + timedelta(seconds=i)}
+                            for i, (x, y) in enumerate(coords.tolist())
+                        ]
+                    }
+                },
+            }
+        },
+        raw=True,
+    )
+
+
+def _osmchange(num_nodes: int, changeset_id: int) -> bytes:
+    x, y = _area_center
+    return XMLToDict.unparse(
+        {
+            'osmChange': {
+                'create': {
+                    'node': [
+                        {'@id': -i, '@changeset': changeset_id, '@lon': x + i * 1e-7, '@lat': y, '@version': 0}
+                        for i in range(1, num_nodes + 1)
+                    ]
+                }
+            }
+        },
+        raw=True,
+    )
+
+
+async def setup(client: AsyncClient, *, seed: int, num_traces: int, num_notes: int) -> None:
+    """
+    Create the deterministic traces and notes, which are not part of the preload dataset.
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(num_traces):
+        r = await client.post(
+            '/api/0.6/gpx/create',
+            data={'visibility': 'identifiable', 'description': f'benchmark{i}'},
+            files={'file': (f'benchmark{i}.gpx', _gpx(rng, 1_000))},
+        )
+        r.raise_for_status()
+
+    for i, (x, y) in enumerate(rng.uniform(-0.5, 0.5, (num_notes, 2)).tolist()):
+        r = await client.post(
+            '/api/0.6/notes.json',
+            json={'lon': _area_center[0] + x, 'lat': _area_center[1] + y, 'text': f'benchmark{i}'},
+        )
+        r.raise_for_status()
+
+
+async def _upload(client: AsyncClient, num_nodes: int) -> Response:
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse({'osm': {'changeset': {'tag': [{'@k': 'created_by', '@v': 'benchmark'}]}}}),
+    )
+    r.raise_for_status()
+    changeset_id = int(r.text)
+    return await client.post(f'/api/0.6/changeset/{changeset_id}/upload', content=_osmchange(num_nodes, changeset_id))
+
+
+async def _upload_modify(client: AsyncClient, num_nodes: int) -> Response:
+    """
+    Create the nodes and then modify all of them, exercising the optimistic diff checks under the lock.
+    """
+    r = await _upload(client, num_nodes)
+    r.raise_for_status()
+    nodes = XMLToDict.parse(r.content)['diffResult']['node']
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse({'osm': {'changeset': {'tag': [{'@k': 'created_by', '@v': 'benchmark'}]}}}),
+    )
+    r.raise_for_status()
+    changeset_id = int(r.text)
+    x, y = _area_center
+    osmchange = XMLToDict.unparse(
+        {
+            'osmChange': {
+                'modify': {
+                    'node': [
+                        {
+                            '@id': node['@new_id'],
+                            '@changeset': changeset_id,
+                            '@lon': x,
+                            '@lat': y,
+                            '@version': node['@new_version'],
+                        }
+                        for node in nodes
+                    ]
+                }
+            }
+        },
+        raw=True,
+    )
+    return await client.post(f'/api/0.6/changeset/{changeset_id}/upload', content=osmchange)
+
+
+async def _upload_modify_concurrent(client: AsyncClient, num_uploads: int, num_nodes: int) -> Response:
+    """
+    Run the disjoint modify uploads concurrently, exercising the sharded apply locks.
+    """
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(_upload_modify(client, num_nodes)) for _ in range(num_uploads)]
+    responses = [task.result() for task in tasks]
+    for r in responses:
+        r.raise_for_status()
+    return responses[-1]
+
+
+async def _upload_modify_mixed(client: AsyncClient, num_large_nodes: int, num_uploads: int, num_nodes: int) -> Response:
+    """
+    Run the small disjoint modify uploads concurrently with a large one.
+    """
+    async with asyncio.TaskGroup() as tg:
+        large_task = tg.create_task(_upload_modify(client, num_large_nodes))
+        tasks = [tg.create_task(_upload_modify(client, num_nodes)) for _ in range(num_uploads)]
+    large_task.result().raise_for_status()
+    responses = [task.result() for task in tasks]
+    for r in responses:
+        r.raise_for_status()
+    return responses[-1]
+
+
+def get_scenarios() -> dict[str, Scenario]:
+    return {
+        'map_sparse': lambda c: c.get('/api/0.6/map', params={'bbox': _bbox(0.005)}),
+        'map_medium': lambda c: c.get('/api/0.6/map', params={'bbox': _bbox(0.02)}),
+        'map_dense': lambda c: c.get('/api/0.6/map', params={'bbox': _bbox(0.05)}),
+        'upload_1k': lambda c: _upload(c, 1_000),
+        'upload_10k': lambda c: _upload(c, 10_000),
+        # the reported time is of the modify upload, which holds the lock for the set-based checks
+        'upload_modify_1k': lambda c: _upload_modify(c, 1_000),
+        'upload_modify_10k': lambda c: _upload_modify(c, 10_000),
+        # the reported time is of all the uploads, small disjoint uploads should not wait for each other
+        'upload_modify_concurrent_8x10': lambda c: _upload_modify_concurrent(c, 8, 10),
+        # the reported time is of a small upload, it should not wait for the whole large upload
+        'upload_modify_mixed_10k_8x10': lambda c: _upload_modify_mixed(c, 10_000, 8, 10),
+        'trackpoints': lambda c: c.get('/api/0.6/trackpoints', params={'bbox': _bbox(0.1)}),
+        'notes': lambda c: c.get('/api/0.6/notes.json', params={'bbox': _bbox(0.5)}),
+        # resolves the first comment of up to NOTE_QUERY_WEB_LIMIT notes
+        'notes_map': lambda c: c.get('/api/web/note/map', params={'bbox': _bbox(1)}),
+        'partial_node': lambda c: c.get('/api/partial/node/1'),
+        'partial_way': lambda c: c.get('/api/partial/way/1'),
+    }
+
+
+async def _get_rows_scanned() -> int:
+    await asyncio.sleep(_pg_stat_flush_delay)
+    async with db() as session:
+        return await session.scalar(
+            text('SELECT sum(coalesce(seq_tup_read, 0) + coalesce(idx_tup_fetch, 0)) FROM pg_stat_user_tables')
+        )
+
+
+async def run_scenario(client: AsyncClient, scenario: Scenario, *, warmup: int, num: int) -> dict[str, float]:
+    """
+    Run the scenario and collect its statistics.
+    """
     for _ in range(warmup):
-        await HTTP.get(url)
+        (await scenario(client)).raise_for_status()
 
+    rows_scanned = await _get_rows_scanned()
+    times: list[float] = []
+    lock_times: list[float] = []
     for _ in range(num):
-        r = await HTTP.get(url)
-        time = float(r.headers.get('X-Runtime'))
-        times.append(time)
+        ts = perf_counter()
+        r = await scenario(client)
+        r.raise_for_status()
+        runtime = r.headers.get('X-Runtime')
+        times.append(float(runtime) if runtime is not None else perf_counter() - ts)
+        lock_time = _server_timing(r).get('refs_lock')
+        if lock_time is not None:
+            lock_times.append(lock_time)
+    rows_scanned = await _get_rows_scanned() - rows_scanned
+
+    # measure allocations separately, tracing slows down the execution
+    tracemalloc.start()
+    (await scenario(client)).raise_for_status()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(times, (50, 95, 99)).tolist()
+    result = {
+        'p50': p50,
+        'p95': p95,
+        'p99': p99,
+        'rows_scanned': rows_scanned / num,
+        'peak_memory': peak_memory,
+    }
+    # the diff uploads report how long they held the apply locks
+    if lock_times:
+        result['lock_p50'], result['lock_p95'] = np.percentile(lock_times, (50, 95)).tolist()
+    return result
+
+
+def _server_timing(r: Response) -> dict[str, float]:
+    """
+    Parse the Server-Timing header into a dict of durations in seconds.
+    """
+    result: dict[str, float] = {}
+    header = r.headers.get('Server-Timing')
+    if header is None:
+        return result
+    for entry in header.split(','):
+        name, _, duration = entry.strip().partition(';dur=')
+        result[name] = float(duration) / 1000
+    return result
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], threshold: float) -> bool:
+    """
+    Compare the results with the baseline and print the regressions.
+
+    Returns True if there are no regressions.
+    """
+    success = True
+    for name, stats in results.items():
+        baseline_stats = baseline.get(name)
+        if baseline_stats is None:
+            continue
+        for key in ('p95', 'rows_scanned', 'peak_memory', 'lock_p95'):
+            value = stats.get(key)
+            baseline_value = baseline_stats.get(key)
+            if value is None or baseline_value is None:
+                continue
+            if value > baseline_value * (1 + threshold):
+                print(f'REGRESSION {name}.{key}: {value:.5g} > {baseline_value:.5g}')
+                success = False
+    return success
+
+
+async def run(args: argparse.Namespace) -> bool:
+    # import lazily, the app is not needed for generating the datasets
+    from app.main import main
+    from tests.utils.lifespan_manager import LifespanManager
 
-    return times
+    async with LifespanManager(main):
+        client = AsyncClient(base_url='http://127.0.0.1:8000', transport=ASGITransport(main))  # pyright: ignore[reportArgumentType]
+        client.headers['Authorization'] = 'User user1'
 
+        if args.setup:
+            await setup(client, seed=args.seed, num_traces=args.traces, num_notes=args.notes)
 
-# ruby
-# Min: 0.04264s
-# Median: 0.04521s
+        results: dict[str, dict[str, float]] = {}
+        for name, scenario in get_scenarios().items():
+            if args.only and name not in args.only:
+                continue
+            print(f'Benchmarking {name}...')
+            stats = results[name] = await run_scenario(client, scenario, warmup=args.warmup, num=args.num)
+            print(
+                f'  p50: {stats["p50"]:.5f}s, p95: {stats["p95"]:.5f}s, p99: {stats["p99"]:.5f}s, '
+                f'rows scanned: {stats["rows_scanned"]:.0f}, peak memory: {stats["peak_memory"] / 1024:.0f} KiB'
+            )
+            if 'lock_p50' in stats:
+                print(f'  lock held p50: {stats["lock_p50"]:.5f}s, p95: {stats["lock_p95"]:.5f}s')
 
-# official
-# Min: 0.01892s
-# Median: 0.02921s
+    if args.save is not None:
+        args.save.write_bytes(JSON_ENCODE(results))
+        print(f'Saved baseline to {args.save}')
+    if args.compare is not None:
+        return compare(results, JSON_DECODE(args.compare.read_bytes()), args.threshold)
+    return True
 
-# test
-# Min: 0.00913s
-# Median: 0.01725s
 
-# python
-# Min: 0.00314s
-# Median: 0.00325s
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the core API endpoints')
+    subparsers = parser.add_subparsers(dest='command', required=True)
 
+    generate_parser = subparsers.add_parser('generate', help='generate a synthetic preload dataset')
+    generate_parser.add_argument('--output', type=Path, default=Path('data/benchmark'))
+    generate_parser.add_argument('--scale', type=int, default=1_000_000, help='number of nodes')
+    generate_parser.add_argument('--seed', type=int, default=42)
 
-async def main():
-    for url in ['http://127.0.0.1:8000/copyright']:
-        print(f'Benchmarking {url}...')
-        times = await benchmark(url)
+    run_parser = subparsers.add_parser('run', help='run the scenarios against the loaded dataset (TEST_ENV)')
+    run_parser.add_argument('--setup', action='store_true', help='create the traces and notes first')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--traces', type=int, default=20)
+    run_parser.add_argument('--notes', type=int, default=1_000)
+    run_parser.add_argument('--warmup', type=int, default=5)
+    run_parser.add_argument('--num', type=int, default=50)
+    run_parser.add_argument('--only', nargs='*', help='run only the given scenarios')
+    run_parser.add_argument('--save', type=Path, help='save the results as a JSON baseline')
+    run_parser.add_argument('--compare', type=Path, help='compare the results with a JSON baseline')
+    run_parser.add_argument('--threshold', type=float, default=0.2, help='allowed regression ratio')
 
-        min_ = np.min(times)
-        print(f'Min: {min_:.5f}s')
-        median = np.median(times)
-        print(f'Median: {median:.5f}s')
+    args = parser.parse_args()
+    if args.command == 'generate':
+        generate(args.output, scale=args.scale, seed=args.seed)
+    elif not asyncio.run(run(args)):
+        sys.exit(1)
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    main()
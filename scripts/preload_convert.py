@@ -1,6 +1,7 @@
 import asyncio
 import gc
 import os
+import sys
 from datetime import datetime
 from functools import cache
 from multiprocessing import Pool
@@ -20,13 +21,15 @@ data_parquet_path = PRELOAD_DIR.joinpath('preload.parquet')
 if not input_path.is_file():
     raise FileNotFoundError(f'File not found: {input_path}')
 
-buffering = 32 * 1024 * 1024  # 32 MB
-read_memory_limit = 2 * 1024 * 1024 * 1024  # 2 GB => ~50 GB total memory usage
+# the elements are streamed, memory usage is bounded by the buffered rows (approx. 1 KB each)
+worker_memory_limit = int(os.getenv('PRELOAD_WORKER_MEMORY_LIMIT', 1024 * 1024 * 1024))  # 1 GB
+part_rows_limit = max(worker_memory_limit // 1024, 1)
+read_chunk_size = 1024 * 1024  # 1 MB
+task_read_size = 256 * 1024 * 1024  # 256 MB
 
 num_workers = os.cpu_count() or 1
 input_size = input_path.stat().st_size
-task_read_memory_limit = read_memory_limit // num_workers
-num_tasks = input_size // task_read_memory_limit
+num_tasks = max(input_size // task_read_size, 1)
 task_size = input_size // num_tasks
 
 # freeze all gc objects before starting for improved performance
@@ -41,14 +44,47 @@ def get_csv_path(name: str) -> Path:
 
 
 @cache
-def get_worker_output_path(i: int) -> Path:
-    return data_parquet_path.with_suffix(f'.parquet.{i}')
+def get_table_path(name: str) -> Path:
+    return PRELOAD_DIR.joinpath(f'{name}.parquet')
 
 
-def worker(args: tuple[int, int, int]) -> None:
+def get_worker_output_path(i: int, part: int) -> Path:
+    return data_parquet_path.with_suffix(f'.parquet.{i}.{part}')
+
+
+class RangeReader:
+    """
+    File-like reader of the input byte range, wrapped in the osm root element.
+    """
+
+    __slots__ = ('_f', '_remaining', '_prefix', '_suffix')
+
+    def __init__(self, f, from_seek: int, to_seek: int) -> None:
+        f.seek(from_seek)
+        self._f = f
+        self._remaining = to_seek - from_seek
+        self._prefix = b'<osm>\n' if from_seek > 0 else b''
+        self._suffix = b'</osm>\n' if to_seek < input_size else b''
+
+    def read(self, size: int = -1) -> bytes:
+        if self._prefix:
+            result, self._prefix = self._prefix, b''
+            return result
+        if self._remaining > 0:
+            result = self._f.read(min(self._remaining, size if size > 0 else read_chunk_size))
+            self._remaining -= len(result)
+            if result:
+                return result
+            self._remaining = 0
+        result, self._suffix = self._suffix, b''
+        return result
+
+
+def worker(args: tuple[int, int, int]) -> list[Path]:
     i, from_seek, to_seek = args  # from_seek(inclusive), to_seek(exclusive)
 
     data: list[tuple] = []
+    paths: list[Path] = []
     schema = {
         'changeset_id': pl.UInt64,
         'type': pl.Enum(('node', 'way', 'relation')),
@@ -72,105 +108,108 @@ def worker(args: tuple[int, int, int]) -> None:
         'display_name': pl.String,
     }
 
+    def flush() -> None:
+        path = get_worker_output_path(i, len(paths))
+        df = pl.DataFrame(data, schema=schema)
+        df.write_parquet(path, compression_level=1, statistics=False)
+        paths.append(path)
+        data.clear()
+        gc.collect()
+
     with input_path.open('rb') as f_in:
-        if from_seek > 0:
-            f_in.seek(from_seek)
-            input_buffer = b'<osm>\n' + f_in.read(to_seek - from_seek)
-        else:
-            input_buffer = f_in.read(to_seek)
-
-    root = ET.fromstring(  # noqa: S320
-        input_buffer,
-        parser=ET.XMLParser(
-            ns_clean=True,
+        for _, element in ET.iterparse(  # noqa: S320
+            RangeReader(f_in, from_seek, to_seek),
+            events=('end',),
+            tag=('node', 'way', 'relation'),
             recover=True,
             resolve_entities=False,
             remove_comments=True,
             remove_pis=True,
             collect_ids=False,
             compact=False,
-        ),
-    )
+        ):
+            data.append(parse_element(element))
 
-    # free memory
-    del input_buffer
-
-    for element in root:
-        tag: str = element.tag
-        attrib = element.attrib
-        if tag not in {'node', 'way', 'relation'}:
-            continue
-
-        tags_list: list[tuple[str, str]] = []
-        members: list[dict] = []
-
-        for child in element:
-            child_tag: str = child.tag
-            child_attrib = child.attrib
-
-            if child_tag == 'tag':
-                tags_list.append((child_attrib['k'], child_attrib['v']))  # pyright: ignore[reportArgumentType]
-            elif child_tag == 'nd':
-                members.append(
-                    {
-                        'order': len(members),
-                        'type': 'node',
-                        'id': int(child_attrib['ref']),
-                        'role': '',
-                    }
-                )
-            elif child_tag == 'member':
-                members.append(
-                    {
-                        'order': len(members),
-                        'type': child_attrib['type'],
-                        'id': int(child_attrib['ref']),
-                        'role': child_attrib['role'],
-                    }
-                )
-
-        if tag == 'node' and (lon := attrib.get('lon')) is not None and (lat := attrib.get('lat')) is not None:
-            point = f'POINT({lon} {lat})'
-        else:
-            point = None
-
-        if tag == 'node':
-            visible = point is not None
-        elif tag in {'way', 'relation'}:
-            visible = bool(tags_list or members)
-        else:
-            raise NotImplementedError(f'Unsupported element type {tag!r}')
-
-        uid = attrib.get('uid')
-        if uid is not None:
-            user_id = int(uid)
-            user_display_name = attrib['user']
-        else:
-            user_id = None
-            user_display_name = None
-
-        data.append(
-            (
-                int(attrib['changeset']),  # changeset_id
-                tag,  # type
-                int(attrib['id']),  # id
-                int(attrib['version']),  # version
-                visible,  # visible
-                JSON_ENCODE(dict(tags_list)).decode() if tags_list else '{}',  # tags
-                point,  # point
-                members,  # members
-                datetime.fromisoformat(attrib['timestamp']),  # created_at  # pyright: ignore[reportArgumentType]
-                user_id,  # user_id
-                user_display_name,  # display_name
+            # free memory of the parsed elements
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+            if len(data) >= part_rows_limit:
+                flush()
+
+    if data or not paths:
+        flush()
+    return paths
+
+
+def parse_element(element) -> tuple:
+    tag: str = element.tag
+    attrib = element.attrib
+    tags_list: list[tuple[str, str]] = []
+    members: list[dict] = []
+
+    for child in element:
+        child_tag: str = child.tag
+        child_attrib = child.attrib
+
+        if child_tag == 'tag':
+            tags_list.append((child_attrib['k'], child_attrib['v']))  # pyright: ignore[reportArgumentType]
+        elif child_tag == 'nd':
+            members.append(
+                {
+                    'order': len(members),
+                    'type': 'node',
+                    'id': int(child_attrib['ref']),
+                    'role': '',
+                }
+            )
+        elif child_tag == 'member':
+            members.append(
+                {
+                    'order': len(members),
+                    'type': child_attrib['type'],
+                    'id': int(child_attrib['ref']),
+                    'role': child_attrib['role'],
+                }
             )
-        )
 
-    df = pl.DataFrame(data, schema=schema)
-    df.write_parquet(get_worker_output_path(i), compression_level=1, statistics=False)
-    gc.collect()
+    if tag == 'node' and (lon := attrib.get('lon')) is not None and (lat := attrib.get('lat')) is not None:
+        point = f'POINT({lon} {lat})'
+    else:
+        point = None
+
+    if tag == 'node':
+        visible = point is not None
+    elif tag in {'way', 'relation'}:
+        visible = bool(tags_list or members)
+    else:
+        raise NotImplementedError(f'Unsupported element type {tag!r}')
+
+    uid = attrib.get('uid')
+    if uid is not None:
+        user_id = int(uid)
+        user_display_name = attrib['user']
+    else:
+        user_id = None
+        user_display_name = None
+
+    return (
+        int(attrib['changeset']),  # changeset_id
+        tag,  # type
+        int(attrib['id']),  # id
+        int(attrib['version']),  # version
+        visible,  # visible
+        JSON_ENCODE(dict(tags_list)).decode() if tags_list else '{}',  # tags
+        point,  # point
+        members,  # members
+        datetime.fromisoformat(attrib['timestamp']),  # created_at  # pyright: ignore[reportArgumentType]
+        user_id,  # user_id
+        user_display_name,  # display_name
+    )
 
 
-def run_workers() -> None:
+def run_workers() -> list[Path]:
     from_seek_search = (b'  <node', b'  <way', b'  <relation')
     from_seeks = []
 
@@ -194,17 +233,20 @@ def run_workers() -> None:
         to_seek = from_seeks[i + 1] if i + 1 < num_tasks else input_size
         args.append((i, from_seek, to_seek))
 
+    # keep the input order of the worker files, it is required for assigning next sequence IDs
+    worker_paths: list[list[Path]] = [None] * num_tasks  # pyright: ignore[reportAssignmentType]
     with Pool(num_workers) as pool:
-        for _ in tqdm(
-            pool.imap_unordered(worker, args),
+        for arg, paths in tqdm(
+            zip(args, pool.imap(worker, args), strict=True),
             desc='Preparing data',
             total=num_tasks,
         ):
-            ...
+            worker_paths[arg[0]] = paths
 
+    return [path for paths in worker_paths for path in paths]
 
-def merge_worker_files() -> None:
-    paths = [get_worker_output_path(i) for i in range(num_tasks)]
+
+def merge_worker_files(paths: list[Path]) -> None:
     created_at_all: list[int] = []
 
     for path in tqdm(paths, desc='Assigning sequence IDs (step 1/2)'):
@@ -256,7 +298,7 @@ def merge_worker_files() -> None:
         path.unlink()
 
 
-def write_element_csv() -> None:
+def write_element() -> None:
     df: pl.LazyFrame = pl.scan_parquet(data_parquet_path)
     df = df.select(
         'sequence_id',
@@ -270,19 +312,19 @@ def write_element_csv() -> None:
         'created_at',
         'next_sequence_id',
     )
-    df.sink_csv(get_csv_path('element'))
+    df.sink_parquet(get_table_path('element'), compression_level=3, row_group_size=50_000)
 
 
-def write_element_member_csv() -> None:
+def write_element_member() -> None:
     df: pl.LazyFrame = pl.scan_parquet(data_parquet_path)
     df = df.select('sequence_id', 'members')
     df = df.filter(pl.col('members').list.len() > 0)
     df = df.explode('members')
     df = df.unnest('members')
-    df.sink_csv(get_csv_path('element_member'))
+    df.sink_parquet(get_table_path('element_member'), compression_level=3, row_group_size=50_000)
 
 
-def write_user_csv() -> None:
+def write_user() -> None:
     df: pl.LazyFrame = pl.scan_parquet(data_parquet_path)
     df = df.select('user_id', 'display_name').unique()
     df = df.rename({'user_id': 'id'})
@@ -298,10 +340,10 @@ def write_user_csv() -> None:
         pl.lit(True).alias('activity_tracking'),
         pl.lit(True).alias('crash_reporting'),
     )
-    df.sink_csv(get_csv_path('user'))
+    df.sink_parquet(get_table_path('user'), compression_level=3, row_group_size=50_000)
 
 
-def write_changeset_csv() -> None:
+def write_changeset() -> None:
     df = pl.scan_parquet(data_parquet_path)
     df = df.select('changeset_id', 'created_at', 'user_id')
     df = df.rename({'changeset_id': 'id'})
@@ -311,21 +353,34 @@ def write_changeset_csv() -> None:
         pl.len().alias('size'),
     )
     df = df.with_columns(pl.lit('{}').alias('tags'))
-    df.sink_csv(get_csv_path('changeset'))
+    df.sink_parquet(get_table_path('changeset'), compression_level=3, row_group_size=50_000)
+
+
+def write_csv(name: str) -> None:
+    df: pl.LazyFrame = pl.scan_parquet(get_table_path(name))
+    df.sink_csv(get_csv_path(name))
 
 
 async def main() -> None:
-    run_workers()
-    merge_worker_files()
-
-    print('Writing user CSV...')
-    write_user_csv()
-    print('Writing changeset CSV...')
-    write_changeset_csv()
-    print('Writing element CSV...')
-    write_element_csv()
-    print('Writing element member CSV...')
-    write_element_member_csv()
+    paths = run_workers()
+    merge_worker_files(paths)
+
+    print('Writing user table...')
+    write_user()
+    print('Writing changeset table...')
+    write_changeset()
+    print('Writing element table...')
+    write_element()
+    print('Writing element member table...')
+    write_element_member()
+    data_parquet_path.unlink()
+
+    # the csv files are only needed for distributing the preload datasets,
+    # preload_load.py reads the parquet files directly
+    if '--csv' in sys.argv[1:]:
+        for name in ('user', 'changeset', 'element', 'element_member'):
+            print(f'Writing {name} CSV...')
+            write_csv(name)
 
 
 if __name__ == '__main__':
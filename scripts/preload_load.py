@@ -2,11 +2,15 @@ import asyncio
 import gc
 import subprocess
 from asyncio import Semaphore, TaskGroup
+from collections.abc import AsyncIterator, Iterator
 from functools import cache
+from io import BytesIO
 from pathlib import Path
 from subprocess import Popen
 
+import polars as pl
 from sqlalchemy import Index, quoted_name, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import PRELOAD_DIR
@@ -16,9 +20,15 @@ from app.models.db.changeset import Changeset
 from app.models.db.element import Element
 from app.models.db.element_member import ElementMember
 from app.models.db.user import User
+from app.models.db.way_geometry import WayGeometry
+from app.models.element import ElementId
 from app.services.migration_service import MigrationService
+from app.services.user_stats_service import UserStatsService
+from app.services.way_geometry_service import WayGeometryService
 
 _index_limiter = Semaphore(6)
+_copy_batch_size = 1_000_000
+_way_geometry_batch_size = 100_000
 
 # freeze all gc objects before starting for improved performance
 gc.collect()
@@ -26,6 +36,12 @@ gc.freeze()
 gc.disable()
 
 
+@cache
+def get_parquet_path(name: str) -> Path | None:
+    p = PRELOAD_DIR.joinpath(f'{name}.parquet')
+    return p if p.is_file() else None
+
+
 @cache
 def get_csv_path(name: str) -> Path:
     p = PRELOAD_DIR.joinpath(f'{name}.csv.zst')
@@ -51,22 +67,90 @@ def get_csv_header(path: Path) -> str:
     return line
 
 
+def iter_parquet_csv(path: Path) -> Iterator[bytes]:
+    """
+    Iterate the parquet file in batches of CSV-encoded rows.
+
+    The rows are encoded by polars, without building the Python records.
+    """
+    lf = pl.scan_parquet(path)
+    num_rows: int = lf.select(pl.len()).collect().item()
+    for offset in range(0, num_rows, _copy_batch_size):
+        df = lf.slice(offset, _copy_batch_size).collect()
+        df = df.with_columns(pl.col(pl.Datetime).dt.replace_time_zone('UTC'))
+        buffer = BytesIO()
+        df.write_csv(buffer, include_header=False)
+        yield buffer.getvalue()
+
+
+async def copy_parquet(session: AsyncSession, table_name: str, path: Path) -> None:
+    """
+    Populate the table from the parquet file, streaming the CSV-encoded batches.
+    """
+    columns = tuple(pl.read_parquet_schema(path))
+    connection = await session.connection()
+    raw_connection = (await connection.get_raw_connection()).driver_connection
+    assert raw_connection is not None
+
+    async def source() -> AsyncIterator[bytes]:
+        batches = iter_parquet_csv(path)
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            yield batch
+
+    await raw_connection.copy_to_table(
+        table_name,
+        source=source(),
+        columns=columns,
+        format='csv',
+        freeze=True,
+    )
+
+
+async def copy_csv(session: AsyncSession, table_name: str, path: Path) -> None:
+    """
+    Populate the table from the compressed CSV file.
+    """
+    header = get_csv_header(path)
+    columns = tuple(f'"{c}"' for c in header.split(','))
+    await session.execute(
+        text(
+            f'COPY "{table_name}" ({','.join(columns)}) '
+            f"FROM PROGRAM 'zstd -d --stdout \"{path.absolute()}\"' "
+            f'(FORMAT CSV, FREEZE, HEADER TRUE)'
+        ),
+    )
+
+
 async def load_tables() -> None:
     tables: tuple[type[DeclarativeBase], ...] = (User, Changeset, Element, ElementMember)
-    index_sqls: dict[quoted_name, str] = {}
+    index_sqls: dict[str, dict[quoted_name, str]] = {}
+    foreign_key_sqls: list[str] = []
 
     async with db_commit() as session:
-        # disable triggers
-        await session.execute(text('SET session_replication_role TO replica'))
-
-        # copy freeze requires truncate
         print('Truncating tables')
         await session.execute(
             text(f'TRUNCATE {','.join(f'"{t.__tablename__}"' for t in tables)} RESTART IDENTITY CASCADE')
         )
+        # the cached geometries are computed after the load
+        await session.execute(text(f'TRUNCATE "{WayGeometry.__tablename__}"'))
+
+        # copy freeze requires truncate in the same transaction,
+        # drop the foreign keys so that each table can be truncated on its own
+        rows = await session.execute(
+            text(
+                'SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint '
+                "WHERE contype = 'f' AND confrelid = ANY(CAST(:tables AS regclass[]))"
+            ),
+            {'tables': [f'"{t.__tablename__}"' for t in tables]},
+        )
+        for table_name, constraint_name, definition in rows.all():
+            print(f'Dropping foreign key {constraint_name!r}')
+            foreign_key_sqls.append(f'ALTER TABLE {table_name} ADD CONSTRAINT "{constraint_name}" {definition}')
+            await session.execute(text(f'ALTER TABLE {table_name} DROP CONSTRAINT "{constraint_name}"'))
 
         for table in tables:
             table_name = table.__tablename__
+            table_index_sqls = index_sqls[table_name] = {}
 
             indexes = (arg for arg in table.__table_args__ if isinstance(arg, Index))
             for index in indexes:
@@ -74,31 +158,43 @@ async def load_tables() -> None:
                 assert index_name is not None
                 print(f'Dropping index {index_name!r}')
                 sql = await session.scalar(text(f'SELECT pg_get_indexdef({index_name!r}::regclass)'))
-                index_sqls[index_name] = sql
+                table_index_sqls[index_name] = sql
                 await session.execute(text(f'DROP INDEX {index_name}'))
 
-            path = get_csv_path(table_name)
-            header = get_csv_header(path)
-            columns = tuple(f'"{c}"' for c in header.split(','))
-
-            print(f'Populating {table_name} table ({len(columns)} columns)...')
-            await session.execute(
-                text(
-                    f'COPY "{table_name}" ({','.join(columns)}) '
-                    f"FROM PROGRAM 'zstd -d --stdout \"{path.absolute()}\"' "
-                    f'(FORMAT CSV, FREEZE, HEADER TRUE)'
-                ),
-            )
-
-    async def index_task(sql: str) -> None:
+    async def index_task(key: quoted_name, sql: str) -> None:
         async with _index_limiter, db() as session:
+            print(f'Recreating index {key!r}')
             await session.connection(execution_options={'isolation_level': 'AUTOCOMMIT'})
             await session.execute(text(sql))
 
+    # tables are loaded concurrently, each table indexes are built as soon as its data is loaded
+    async def table_task(table_name: str, tg: TaskGroup) -> None:
+        async with db_commit() as session:
+            # disable triggers (and foreign key checks)
+            await session.execute(text('SET session_replication_role TO replica'))
+            await session.execute(text(f'TRUNCATE "{table_name}"'))
+
+            path = get_parquet_path(table_name)
+            if path is not None:
+                print(f'Populating {table_name} table from {path.name}...')
+                await copy_parquet(session, table_name, path)
+            else:
+                path = get_csv_path(table_name)
+                print(f'Populating {table_name} table from {path.name}...')
+                await copy_csv(session, table_name, path)
+
+        for key, sql in index_sqls[table_name].items():
+            tg.create_task(index_task(key, sql))
+
     async with TaskGroup() as tg:
-        for key, sql in index_sqls.items():
-            print(f'Recreating index {key!r}')
-            tg.create_task(index_task(sql))
+        for table in tables:
+            tg.create_task(table_task(table.__tablename__, tg))
+
+    # the loaded data is not checked, like with the triggers disabled
+    async with db_commit() as session:
+        for sql in foreign_key_sqls:
+            print(f'Recreating foreign key: {sql}')
+            await session.execute(text(f'{sql} NOT VALID'))
 
 
 async def main() -> None:
@@ -116,6 +212,19 @@ async def main() -> None:
     print('Fixing sequence counters consistency')
     await MigrationService.fix_sequence_counters()
 
+    print('Computing way geometries')
+    after = ElementId(0)
+    while True:
+        async with db_commit() as session:
+            last_id = await WayGeometryService.update_batch(session, after=after, limit=_way_geometry_batch_size)
+        if last_id is None:
+            break
+        after = last_id
+
+    print('Computing user statistics')
+    async with db_commit() as session:
+        await UserStatsService.rebuild(session)
+
 
 if __name__ == '__main__':
     asyncio.run(main())
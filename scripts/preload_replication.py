@@ -0,0 +1,476 @@
+import asyncio
+import gc
+import gzip
+import re
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+
+import lxml.etree as ET
+import shapely
+from shapely import Point
+from sqlalchemy import and_, func, null, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import PRELOAD_DIR
+from app.db import db_commit
+from app.models.db import *  # noqa: F403
+from app.models.db.changeset import Changeset
+from app.models.db.element import Element
+from app.models.db.element_member import ElementMember
+from app.models.db.user import User
+from app.services.element_sequence_service import ElementSequenceService
+from app.services.map_tile_cache_service import MapTileCacheService
+from app.services.migration_service import MigrationService
+from app.services.optimistic_diff.apply import OptimisticDiffApply
+from app.services.user_stats_service import UserStatsService
+from app.services.way_geometry_service import WayGeometryService
+from app.utils import JSON_ENCODE
+
+replication_dir = PRELOAD_DIR.joinpath('replication')
+state_path = replication_dir.joinpath('state.txt')
+batch_elements_limit = 1_000_000
+
+_element_columns = (
+    'sequence_id',
+    'changeset_id',
+    'type',
+    'id',
+    'version',
+    'visible',
+    'tags',
+    'point',
+    'created_at',
+    'next_sequence_id',
+)
+_element_member_columns = ('sequence_id', 'order', 'type', 'id', 'role')
+
+
+class Change:
+    __slots__ = (
+        'changeset_id',
+        'type',
+        'id',
+        'version',
+        'visible',
+        'tags',
+        'point',
+        'members',
+        'created_at',
+        'user_id',
+        'display_name',
+    )
+
+    def __init__(self, action: str, element) -> None:
+        tag: str = element.tag
+        attrib = element.attrib
+        tags: dict[str, str] = {}
+        members: list[tuple[str, int, str]] = []
+
+        for child in element:
+            child_tag: str = child.tag
+            child_attrib = child.attrib
+
+            if child_tag == 'tag':
+                tags[child_attrib['k']] = child_attrib['v']
+            elif child_tag == 'nd':
+                members.append(('node', int(child_attrib['ref']), ''))
+            elif child_tag == 'member':
+                members.append((child_attrib['type'], int(child_attrib['ref']), child_attrib['role']))
+
+        visible = action != 'delete'
+        if (
+            visible
+            and tag == 'node'
+            and (lon := attrib.get('lon')) is not None
+            and (lat := attrib.get('lat')) is not None
+        ):
+            point = f'POINT({lon} {lat})'
+        else:
+            point = None
+
+        uid = attrib.get('uid')
+        self.changeset_id = int(attrib['changeset'])
+        self.type = tag
+        self.id = int(attrib['id'])
+        self.version = int(attrib['version'])
+        self.visible = visible
+        self.tags = tags
+        self.point = point
+        self.members = members
+        self.created_at = datetime.fromisoformat(attrib['timestamp'])
+        self.user_id = int(uid) if uid is not None else None
+        self.display_name = attrib['user'] if uid is not None else None
+
+
+def get_replication_files() -> list[tuple[int, Path]]:
+    """
+    Get the replication files ordered by their sequence number (e.g., 006/123/456.osc.gz -> 6123456).
+    """
+    result: list[tuple[int, Path]] = []
+    for path in replication_dir.rglob('*.osc.gz'):
+        digits = re.sub(r'\D', '', str(path.relative_to(replication_dir)))
+        result.append((int(digits), path))
+    result.sort()
+    return result
+
+
+def read_state() -> int:
+    return int(state_path.read_text()) if state_path.is_file() else 0
+
+
+def write_state(sequence_number: int) -> None:
+    tmp_path = state_path.with_suffix('.tmp')
+    tmp_path.write_text(str(sequence_number))
+    tmp_path.replace(state_path)
+
+
+def parse_changes(path: Path) -> Iterator[Change]:
+    """
+    Stream the changes of the osmChange file, in the file order.
+    """
+    action = ''
+    with gzip.open(path, 'rb') as f:
+        for event, element in ET.iterparse(  # noqa: S320
+            f,
+            events=('start', 'end'),
+            resolve_entities=False,
+            remove_comments=True,
+            remove_pis=True,
+            collect_ids=False,
+        ):
+            tag = element.tag
+            if event == 'start':
+                if tag in {'create', 'modify', 'delete'}:
+                    action = tag
+                continue
+            if tag not in {'node', 'way', 'relation'}:
+                continue
+
+            yield Change(action, element)
+
+            # free memory of the parsed elements
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+async def get_current_versions(session: AsyncSession, changes: Iterable[Change]) -> dict[tuple[str, int], int]:
+    """
+    Get the current versions of the changed elements.
+    """
+    type_ids: dict[str, set[int]] = defaultdict(set)
+    for change in changes:
+        type_ids[change.type].add(change.id)
+
+    stmt = select(Element.type, Element.id, Element.version).where(
+        Element.next_sequence_id == null(),
+        or_(
+            *(
+                and_(
+                    Element.type == type,
+                    Element.id.in_(text(','.join(map(str, ids)))),
+                )
+                for type, ids in type_ids.items()
+            )
+        ),
+    )
+    rows = (await session.execute(stmt)).all()
+    return {(type, id): version for type, id, version in rows}
+
+
+async def upsert_users_changesets(session: AsyncSession, changes: Iterable[Change]) -> None:
+    """
+    Create the missing users and changesets, and update the changesets statistics.
+    """
+    users: dict[int, str] = {}
+    changesets: dict[int, dict] = {}
+    for change in changes:
+        user_id = change.user_id
+        if user_id is not None:
+            users[user_id] = change.display_name  # pyright: ignore[reportArgumentType]
+
+        changeset = changesets.get(change.changeset_id)
+        if changeset is None:
+            changesets[change.changeset_id] = {
+                'id': change.changeset_id,
+                'user_id': user_id,
+                'tags': {},
+                'created_at': change.created_at,
+                'closed_at': change.created_at,
+                'size': 1,
+            }
+        else:
+            changeset['created_at'] = min(changeset['created_at'], change.created_at)
+            changeset['closed_at'] = max(changeset['closed_at'], change.created_at)
+            changeset['size'] += 1
+
+    if users:
+        await insert_users(session, users)
+
+    stmt = select(Changeset.id).where(Changeset.id.in_(text(','.join(map(str, changesets)))))
+    existing_ids: set[int] = set(await session.scalars(stmt))
+
+    stmt = insert(Changeset)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=(Changeset.id,),
+        set_={
+            Changeset.closed_at: func.greatest(Changeset.closed_at, stmt.excluded.closed_at),
+            Changeset.size: Changeset.size + stmt.excluded.size,
+        },
+    )
+    await session.execute(stmt, list(changesets.values()))
+
+    await UserStatsService.add_changesets(
+        session,
+        (
+            (changeset['user_id'], changeset['created_at'].date())
+            for changeset_id, changeset in changesets.items()
+            if changeset_id not in existing_ids
+        ),
+    )
+
+
+async def insert_users(session: AsyncSession, users: dict[int, str]) -> None:
+    """
+    Create the missing users.
+
+    Display names taken by other users (e.g., after a rename) are suffixed with the user id.
+    """
+    stmt = insert(User).on_conflict_do_nothing()
+    await session.execute(stmt, [_user_record(user_id, display_name) for user_id, display_name in users.items()])
+
+    stmt = select(User.id).where(User.id.in_(text(','.join(map(str, users)))))
+    missing_ids = users.keys() - set(await session.scalars(stmt))
+    if missing_ids:
+        print(f'Renaming {len(missing_ids)} users with conflicting display names')
+        await session.execute(
+            insert(User),
+            [_user_record(user_id, f'{users[user_id]}_{user_id}') for user_id in missing_ids],
+        )
+
+
+def _user_record(user_id: int, display_name: str) -> dict:
+    return {
+        'id': user_id,
+        'email': f'{user_id}@localhost.invalid',
+        'display_name': display_name,
+        'password_hashed': 'x',
+        'created_ip': '127.0.0.1',
+        'status': 'active',
+        'language': 'en',
+        'activity_tracking': True,
+        'crash_reporting': True,
+    }
+
+
+async def get_invalidate_points(
+    session: AsyncSession, changes: Iterable[Change], after_sequence_id: int
+) -> list[Point]:
+    """
+    Get the points of the map tiles gaining or losing the changed elements.
+
+    Includes the versions superseded after the given sequence_id.
+    """
+    node_ids: set[int] = set()
+    way_ids: set[int] = set()
+    for change in changes:
+        if change.type == 'node':
+            node_ids.add(change.id)
+        elif change.type == 'way':
+            way_ids.add(change.id)
+        for type, id, _ in change.members:
+            if type == 'node':
+                node_ids.add(id)
+            elif type == 'way':
+                way_ids.add(id)
+
+    if way_ids:
+        stmt = (
+            select(ElementMember.id)
+            .join(Element, Element.sequence_id == ElementMember.sequence_id)
+            .where(
+                Element.type == 'way',
+                Element.id.in_(text(','.join(map(str, way_ids)))),
+                or_(Element.next_sequence_id == null(), Element.next_sequence_id > after_sequence_id),
+                ElementMember.type == 'node',
+            )
+        )
+        node_ids.update(await session.scalars(stmt))
+
+    if not node_ids:
+        return []
+
+    stmt = select(Element.point).where(
+        Element.type == 'node',
+        Element.id.in_(text(','.join(map(str, node_ids)))),
+        or_(Element.next_sequence_id == null(), Element.next_sequence_id > after_sequence_id),
+        Element.point != null(),
+    )
+    return list(await session.scalars(stmt))  # pyright: ignore[reportArgumentType]
+
+
+async def apply_batch(changes: list[Change]) -> int:
+    """
+    Apply the changes in a single transaction, with the same sequence semantics as the optimistic diff.
+
+    Returns the number of the applied changes.
+    """
+    async with db_commit() as session:
+        # exclude the concurrent diffs and serialize the sequence assignment with them
+        await OptimisticDiffApply.lock_all(session)
+
+        # skip the already applied changes (e.g., after an interrupted run)
+        current_version_map = await get_current_versions(session, changes)
+        changes = [c for c in changes if c.version > current_version_map.get((c.type, c.id), 0)]
+        if not changes:
+            return 0
+
+        await upsert_users_changesets(session, changes)
+        current_sequence_id: int = await session.scalar(select(func.max(Element.sequence_id))) or 0
+
+        points = shapely.from_wkt([change.point for change in changes])
+        points = shapely.to_wkb(shapely.set_srid(points, 4326), include_srid=True)
+        element_records: list[list] = []
+        member_records: list[tuple] = []
+        prev_map: dict[tuple[str, int], list] = {}
+        update_type_ids: dict[str, list[int]] = defaultdict(list)
+
+        for sequence_id, (change, point) in enumerate(zip(changes, points, strict=True), current_sequence_id + 1):
+            record = [
+                sequence_id,
+                change.changeset_id,
+                change.type,
+                change.id,
+                change.version,
+                change.visible,
+                JSON_ENCODE(change.tags).decode(),
+                point,
+                change.created_at,
+                None,
+            ]
+            element_records.append(record)
+            member_records.extend(
+                (sequence_id, order, type, id, role)  #
+                for order, (type, id, role) in enumerate(change.members)
+            )
+
+            # assign next_sequence_id
+            ref = (change.type, change.id)
+            prev = prev_map.get(ref)
+            if prev is not None:
+                prev[-1] = sequence_id  # update locally
+            elif ref in current_version_map:
+                update_type_ids[change.type].append(change.id)  # update remotely
+            prev_map[ref] = record
+
+        connection = await session.connection()
+        raw_connection = (await connection.get_raw_connection()).driver_connection
+        assert raw_connection is not None
+        await raw_connection.set_type_codec(
+            'geometry',
+            schema='public',
+            encoder=bytes,
+            decoder=bytes,
+            format='binary',
+        )
+        await raw_connection.copy_records_to_table('element', records=element_records, columns=_element_columns)
+        if member_records:
+            await raw_connection.copy_records_to_table(
+                'element_member',
+                records=member_records,
+                columns=_element_member_columns,
+            )
+
+        if update_type_ids:
+            E = aliased(Element)  # noqa: N806
+            stmt = (
+                update(Element)
+                .where(
+                    Element.sequence_id <= current_sequence_id,
+                    Element.next_sequence_id == null(),
+                    or_(
+                        *(
+                            and_(
+                                Element.type == type,
+                                Element.id.in_(text(','.join(map(str, ids)))),
+                            )
+                            for type, ids in update_type_ids.items()
+                        ),
+                    ),
+                )
+                .values(
+                    {
+                        Element.next_sequence_id: select(E.sequence_id)
+                        .where(
+                            E.type == Element.type,
+                            E.id == Element.id,
+                            E.version > Element.version,
+                        )
+                        .order_by(E.version.asc())
+                        .limit(1)
+                        .scalar_subquery()
+                    }
+                )
+                .inline()
+            )
+            await session.execute(stmt)
+
+        # update the cached geometries, after the previous versions were superseded
+        await WayGeometryService.update(
+            session,
+            way_ids=[change.id for change in changes if change.type == 'way'],
+            node_ids=[change.id for change in changes if change.type == 'node' and change.version > 1],
+            sequence_id=current_sequence_id + len(changes),
+        )
+        invalidate_points = await get_invalidate_points(session, changes, current_sequence_id)
+
+    # advance the sequence head and mark the changed map tiles for rebuild (after commit)
+    last_sequence_id = current_sequence_id + len(changes)
+    await ElementSequenceService.advance(last_sequence_id)
+    await MapTileCacheService.invalidate(
+        invalidate_points,
+        {change.id for change in changes if change.type == 'relation'},
+        last_sequence_id,
+    )
+    return len(changes)
+
+
+async def main() -> None:
+    # freeze all gc objects before starting for improved performance
+    gc.collect()
+    gc.freeze()
+
+    state = read_state()
+    files = [(n, path) for n, path in get_replication_files() if n > state]
+    print(f'Replication state is {state}, found {len(files)} new files')
+
+    batch: list[Change] = []
+    batch_last_number = state
+
+    async def flush() -> None:
+        applied = await apply_batch(batch)
+        write_state(batch_last_number)
+        print(f'Applied {applied} of {len(batch)} changes, replication state is {batch_last_number}')
+        batch.clear()
+        gc.collect()
+
+    for sequence_number, path in files:
+        batch.extend(parse_changes(path))
+        batch_last_number = sequence_number
+        if len(batch) >= batch_elements_limit:
+            await flush()
+
+    if batch:
+        await flush()
+
+    print('Fixing sequence counters consistency')
+    await MigrationService.fix_sequence_counters()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
+    print('Done! Done! Done!')
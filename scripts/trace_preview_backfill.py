@@ -0,0 +1,46 @@
+import asyncio
+
+import numpy as np
+from shapely import lib
+from sqlalchemy import null, select, update
+
+from app.db import db, db_commit
+from app.lib.trace_preview import TracePreview
+from app.models.db import *  # noqa: F403
+from app.models.db.trace_ import Trace
+from app.queries.trace_segment_query import TraceSegmentQuery
+
+batch_size = 100
+
+
+async def main() -> None:
+    after = 0
+    total = 0
+    while True:
+        async with db() as session:
+            stmt = (
+                select(Trace.id)
+                .where(Trace.id > after, Trace.preview == null())
+                .order_by(Trace.id.asc())
+                .limit(batch_size)
+            )
+            trace_ids = (await session.scalars(stmt)).all()
+        if not trace_ids:
+            break
+
+        for trace_id in trace_ids:
+            segments = await TraceSegmentQuery.get_many_by_trace_id(trace_id)
+            points = np.asarray(tuple(segment.points for segment in segments), dtype=object)
+            preview = TracePreview.encode(lib.get_coordinates(points, False, False))
+            async with db_commit() as session:
+                stmt = update(Trace).where(Trace.id == trace_id).values({Trace.preview: preview}).inline()
+                await session.execute(stmt)
+
+        after = trace_ids[-1]
+        total += len(trace_ids)
+        print(f'Generated previews for {total} traces')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
+    print('Done! Done! Done!')
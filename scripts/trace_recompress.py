@@ -0,0 +1,135 @@
+import asyncio
+import os
+from argparse import ArgumentParser
+from asyncio import Semaphore, TaskGroup, get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy import func, select, update
+from zstandard import ZstdCompressionDict
+
+from app.config import FILE_STORE_DIR
+from app.db import db, db_commit
+from app.lib.naturalsize import naturalsize
+from app.lib.trace_file import TraceFile
+from app.limits import TRACE_FILE_RECOMPRESS_WORKERS
+from app.models.db import *  # noqa: F403
+from app.models.db.trace_ import Trace
+from app.storage import TRACES_STORAGE
+
+state_path = FILE_STORE_DIR.joinpath('traces_recompress.txt')
+batch_size = 100
+dict_samples_limit = 1000
+
+
+def read_state() -> int:
+    return int(state_path.read_text()) if state_path.is_file() else 0
+
+
+def write_state(trace_id: int) -> None:
+    tmp_path = state_path.with_suffix('.tmp')
+    tmp_path.write_text(str(trace_id))
+    tmp_path.replace(state_path)
+
+
+async def train_dictionary() -> None:
+    async with db() as session:
+        stmt = select(Trace.file_id).order_by(func.random()).limit(dict_samples_limit)
+        file_ids = (await session.scalars(stmt)).all()
+
+    samples: list[bytes] = []
+    for file_id in file_ids:
+        buffer = await TRACES_STORAGE.load(file_id)
+        dict_data = await TraceFile.get_dictionary(buffer, file_id)
+        samples.append(TraceFile.decompress_if_needed(buffer, file_id, dict_data))
+
+    print(f'Training dictionary from {len(samples)} samples')
+    dict_id = await TraceFile.train_dictionary(samples)
+    print(f'Trained dictionary {dict_id}, recompress with --dict-id {dict_id} to use it')
+
+
+async def recompress(
+    trace_id: int,
+    file_id: str,
+    dict_data: ZstdCompressionDict | None,
+    executor: ThreadPoolExecutor,
+) -> int:
+    """
+    Recompress the trace file and swap it in.
+
+    Returns the number of saved bytes.
+    """
+    buffer = await TRACES_STORAGE.load(file_id)
+    source_dict = await TraceFile.get_dictionary(buffer, file_id)
+    loop = get_running_loop()
+    result = await loop.run_in_executor(
+        executor,
+        partial(TraceFile.recompress, buffer, file_id, source_dict=source_dict, dict_data=dict_data),
+    )
+    if result is None:
+        return 0
+
+    new_file, new_suffix = result
+    new_file_id = await TRACES_STORAGE.save(new_file, new_suffix)
+
+    # swap only if the trace was not modified in the meantime
+    async with db_commit() as session:
+        stmt = (
+            update(Trace)
+            .where(Trace.id == trace_id, Trace.file_id == file_id)
+            .values({Trace.file_id: new_file_id})
+            .inline()
+        )
+        swapped = (await session.execute(stmt)).rowcount
+
+    await TRACES_STORAGE.delete(file_id if swapped else new_file_id)
+    return len(buffer) - len(new_file) if swapped else 0
+
+
+async def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument('--train-dict', action='store_true', help='train the compression dictionary and exit')
+    parser.add_argument('--dict-id', type=int, help='compress with the trained dictionary')
+    parser.add_argument('--workers', type=int, default=TRACE_FILE_RECOMPRESS_WORKERS)
+    args = parser.parse_args()
+
+    # recompression is a background job, yield the CPU to the application
+    os.nice(10)
+
+    if args.train_dict:
+        await train_dictionary()
+        return
+
+    dict_data = (await TraceFile.load_dictionary(args.dict_id)) if args.dict_id else None
+    state = read_state()
+    print(f'Recompression state is {state}')
+    limiter = Semaphore(args.workers)
+    saved_total = 0
+
+    async def task(trace_id: int, file_id: str, executor: ThreadPoolExecutor) -> None:
+        nonlocal saved_total
+        async with limiter:
+            saved_total += await recompress(trace_id, file_id, dict_data, executor)
+
+    with ThreadPoolExecutor(args.workers) as executor:
+        while True:
+            async with db() as session:
+                stmt = (
+                    select(Trace.id, Trace.file_id).where(Trace.id > state).order_by(Trace.id.asc()).limit(batch_size)
+                )
+                rows = (await session.execute(stmt)).all()
+            if not rows:
+                break
+
+            async with TaskGroup() as tg:
+                for trace_id, file_id in rows:
+                    tg.create_task(task(trace_id, file_id, executor))
+
+            state = rows[-1][0]
+            write_state(state)
+            print(f'Recompressed traces up to {state}, saved {naturalsize(saved_total)}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
+    print('Done! Done! Done!')
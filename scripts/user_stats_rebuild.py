@@ -0,0 +1,15 @@
+import asyncio
+
+from app.db import db_commit
+from app.models.db import *  # noqa: F403
+from app.services.user_stats_service import UserStatsService
+
+
+async def main() -> None:
+    async with db_commit() as session:
+        await UserStatsService.rebuild(session)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
+    print('Done! Done! Done!')
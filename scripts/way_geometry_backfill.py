@@ -0,0 +1,27 @@
+import asyncio
+
+from app.db import db_commit
+from app.models.db import *  # noqa: F403
+from app.models.element import ElementId
+from app.services.way_geometry_service import WayGeometryService
+
+batch_size = 10_000
+
+
+async def main() -> None:
+    after = ElementId(0)
+    total = 0
+    while True:
+        async with db_commit() as session:
+            last_id = await WayGeometryService.update_batch(session, after=after, limit=batch_size)
+        if last_id is None:
+            break
+
+        after = last_id
+        total += batch_size
+        print(f'Computed geometries for ~{total} ways (last id {last_id})')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
+    print('Done! Done! Done!')
@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.db import db_commit
+from app.models.db import *  # noqa: F403
+from app.models.db.element import Element
+from app.models.element import ElementId
+from app.services.way_geometry_service import WayGeometryService
+
+batch_size = 10_000
+
+
+async def main(fix: bool) -> None:
+    after = ElementId(0)
+    total = 0
+    inconsistent = 0
+    while True:
+        async with db_commit() as session:
+            last_id, way_ids = await WayGeometryService.check_batch(session, after=after, limit=batch_size)
+            if way_ids and fix:
+                sequence_id: int = await session.scalar(select(func.max(Element.sequence_id)))  # pyright: ignore[reportAssignmentType]
+                await WayGeometryService.update(session, way_ids=way_ids, node_ids=(), sequence_id=sequence_id)
+        if last_id is None:
+            break
+
+        if way_ids:
+            print(f'Inconsistent geometries for ways: {", ".join(map(str, way_ids))}')
+        after = last_id
+        total += batch_size
+        inconsistent += len(way_ids)
+
+    print(f'Checked ~{total} ways, found {inconsistent} inconsistent' + (' (fixed)' if fix and inconsistent else ''))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the cached way geometries against the current nodes')
+    parser.add_argument('--fix', action='store_true', help='recompute the inconsistent geometries')
+    args = parser.parse_args()
+    asyncio.run(main(args.fix))
+    print('Done! Done! Done!')
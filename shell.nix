@@ -317,7 +317,7 @@ let
     # -- Preload
     (makeScript "preload-clean" "rm -rf data/preload/")
     (makeScript "preload-convert" ''
-      python scripts/preload_convert.py
+      python scripts/preload_convert.py --csv
       for file in data/preload/*.csv; do
         zstd \
           --rm \
@@ -431,6 +431,11 @@ let
     (makeScript "feature-icons-popular-update" "python scripts/feature_icons_popular_update.py")
     (makeScript "timezone-bbox-update" "python scripts/timezone_bbox_update.py")
     (makeScript "wiki-pages-update" "python scripts/wiki_pages_update.py")
+    (makeScript "trace-preview-backfill" "python scripts/trace_preview_backfill.py")
+    (makeScript "trace-recompress" "python scripts/trace_recompress.py")
+    (makeScript "way-geometry-backfill" "python scripts/way_geometry_backfill.py")
+    (makeScript "way-geometry-check" "python scripts/way_geometry_check.py")
+    (makeScript "user-stats-rebuild" "python scripts/user_stats_rebuild.py")
     (makeScript "open-mailpit" "python -m webbrowser http://127.0.0.1:8025")
     (makeScript "open-app" "python -m webbrowser http://127.0.0.1:8000")
     (makeScript "nixpkgs-update" ''
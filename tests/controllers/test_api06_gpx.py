@@ -209,3 +209,58 @@ async def test_trackpoints(client: AsyncClient, gpx: dict):
     assert trkpt['@lat'] == 51.8583922
     assert datetime.fromisoformat(trkpt['time']) == datetime(2023, 7, 3, 10, 36, 21, tzinfo=UTC)
     assert isclose(float(trkpt['ele']), 190.8, abs_tol=0.01)
+
+
+async def test_trackpoints_pagination(client: AsyncClient, gpx: dict):
+    client.headers['Authorization'] = 'User user1'
+    file = XMLToDict.unparse(gpx, raw=True)
+
+    # create enough points for multiple pages
+    for visibility in ('identifiable', 'private') * 6:
+        r = await client.post(
+            '/api/0.6/gpx/create',
+            data={
+                'visibility': visibility,
+                'description': 'test_trackpoints_pagination',
+            },
+            files={
+                'file': ('test_trackpoints_pagination.gpx', file),
+            },
+        )
+        assert r.is_success, r.text
+
+    bbox = '20.86,51.858,20.873,51.866'
+
+    # read all pages by cursor
+    cursor_pages: list[list] = []
+    params = {'bbox': bbox}
+    while True:
+        r = await client.get('/api/0.6/trackpoints', params=params)
+        assert r.is_success, r.text
+        cursor_pages.append(_trackpoints(r.content))
+        next_cursor = r.headers.get('X-Next-Cursor')
+        if next_cursor is None:
+            break
+        params = {'bbox': bbox, 'cursor': next_cursor}
+
+    assert len(cursor_pages) > 1
+
+    # the legacy page numbers must return the same pages
+    for page_number, page in enumerate(cursor_pages):
+        r = await client.get('/api/0.6/trackpoints', params={'bbox': bbox, 'pageNumber': page_number})
+        assert r.is_success, r.text
+        assert _trackpoints(r.content) == page
+
+    r = await client.get('/api/0.6/trackpoints', params={'bbox': bbox, 'pageNumber': len(cursor_pages)})
+    assert r.is_success, r.text
+    assert not _trackpoints(r.content)
+
+
+def _trackpoints(content: bytes) -> list[tuple[float, float]]:
+    trks = XMLToDict.parse(content)['gpx'].get('trk', ())
+    return [
+        (trkpt['@lon'], trkpt['@lat'])
+        for trk in trks
+        for trkseg in trk['trkseg']
+        for trkpt in trkseg['trkpt']  #
+    ]
@@ -90,3 +90,190 @@ async def test_map_read(client: AsyncClient):
         nodes = (value for key, value in data if key == 'node')
         with pytest.raises(StopIteration):
             node = next(node for node in nodes if node['@id'] == node_id)
+
+
+async def test_map_read_after_cached(client: AsyncClient):
+    client.headers['Authorization'] = 'User user1'
+
+    # create changeset
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse(
+            {
+                'osm': {
+                    'changeset': {
+                        'tag': [
+                            {'@k': 'created_by', '@v': test_map_read_after_cached.__name__},
+                        ]
+                    }
+                }
+            }
+        ),
+    )
+    assert r.is_success, r.text
+    changeset_id = int(r.text)
+
+    # read map (warm up the tile cache)
+    r = await client.get('/api/0.6/map?bbox=3.456,4.567,3.457,4.568')
+    assert r.is_success, r.text
+
+    # create node
+    r = await client.put(
+        '/api/0.6/node/create',
+        content=XMLToDict.unparse(
+            {
+                'osm': {
+                    'node': {
+                        '@changeset': changeset_id,
+                        '@lon': 3.4565,
+                        '@lat': 4.5675,
+                        'tag': [
+                            {'@k': 'created_by', '@v': test_map_read_after_cached.__name__},
+                        ],
+                    }
+                }
+            }
+        ),
+    )
+    assert r.is_success, r.text
+    node_id = int(r.text)
+
+    # read map, must include the new node
+    r = await client.get('/api/0.6/map?bbox=3.456,4.567,3.457,4.568')
+    assert r.is_success, r.text
+
+    data: Sequence[tuple[ElementType, dict]] = XMLToDict.parse(r.content)['osm']
+    nodes = (value for key, value in data if key == 'node')
+    node = next(node for node in nodes if node['@id'] == node_id)
+    assert node['@version'] == 1
+
+    # move node outside of the bbox
+    r = await client.put(
+        f'/api/0.6/node/{node_id}',
+        content=XMLToDict.unparse(
+            {
+                'osm': {
+                    'node': {
+                        '@changeset': changeset_id,
+                        '@version': 1,
+                        '@lon': 3.4585,
+                        '@lat': 4.5695,
+                    }
+                }
+            }
+        ),
+    )
+    assert r.is_success, r.text
+
+    # read map, must not include the moved node
+    r = await client.get('/api/0.6/map?bbox=3.456,4.567,3.457,4.568')
+    assert r.is_success, r.text
+
+    data = XMLToDict.parse(r.content)['osm']
+
+    # completely empty map will be parsed as dict
+    if isinstance(data, Sequence):
+        nodes = (value for key, value in data if key == 'node')
+        with pytest.raises(StopIteration):
+            node = next(node for node in nodes if node['@id'] == node_id)
+
+
+async def test_map_read_cached_relation_and_way_nodes(client: AsyncClient):
+    client.headers['Authorization'] = 'User user1'
+
+    # create changeset
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse(
+            {
+                'osm': {
+                    'changeset': {
+                        'tag': [
+                            {'@k': 'created_by', '@v': test_map_read_cached_relation_and_way_nodes.__name__},
+                        ]
+                    }
+                }
+            }
+        ),
+    )
+    assert r.is_success, r.text
+    changeset_id = int(r.text)
+
+    # create nodes, the second one outside of the bbox tiles
+    node_ids: list[int] = []
+    for lon, lat in ((5.4565, 6.5675), (5.5565, 6.6675)):
+        r = await client.put(
+            '/api/0.6/node/create',
+            content=XMLToDict.unparse({'osm': {'node': {'@changeset': changeset_id, '@lon': lon, '@lat': lat}}}),
+        )
+        assert r.is_success, r.text
+        node_ids.append(int(r.text))
+
+    # create way and relation
+    r = await client.put(
+        '/api/0.6/way/create',
+        content=XMLToDict.unparse(
+            {'osm': {'way': {'@changeset': changeset_id, 'nd': [{'@ref': node_id} for node_id in node_ids]}}}
+        ),
+    )
+    assert r.is_success, r.text
+    way_id = int(r.text)
+
+    def relation_members(outer_role: str) -> list[dict]:
+        return [
+            {'@type': 'node', '@ref': node_ids[0], '@role': 'inner'},
+            {'@type': 'node', '@ref': node_ids[1], '@role': outer_role},
+        ]
+
+    r = await client.put(
+        '/api/0.6/relation/create',
+        content=XMLToDict.unparse(
+            {'osm': {'relation': {'@changeset': changeset_id, 'member': relation_members('before')}}}
+        ),
+    )
+    assert r.is_success, r.text
+    relation_id = int(r.text)
+
+    # read map (warm up the tile cache)
+    r = await client.get('/api/0.6/map?bbox=5.456,6.567,5.457,6.568')
+    assert r.is_success, r.text
+
+    # change the outside member role only, no tiles are affected by the member positions
+    r = await client.put(
+        f'/api/0.6/relation/{relation_id}',
+        content=XMLToDict.unparse(
+            {
+                'osm': {
+                    'relation': {
+                        '@changeset': changeset_id,
+                        '@version': 1,
+                        'member': relation_members('after'),
+                    }
+                }
+            }
+        ),
+    )
+    assert r.is_success, r.text
+
+    # move the outside way node
+    r = await client.put(
+        f'/api/0.6/node/{node_ids[1]}',
+        content=XMLToDict.unparse(
+            {'osm': {'node': {'@changeset': changeset_id, '@version': 1, '@lon': 5.5575, '@lat': 6.6685}}}
+        ),
+    )
+    assert r.is_success, r.text
+
+    # read map, must include the current relation and way node
+    r = await client.get('/api/0.6/map?bbox=5.456,6.567,5.457,6.568')
+    assert r.is_success, r.text
+
+    data: Sequence[tuple[ElementType, dict]] = XMLToDict.parse(r.content)['osm']
+    way = next(value for key, value in data if key == 'way' and value['@id'] == way_id)
+    assert [nd['@ref'] for nd in way['nd']] == node_ids
+    node = next(value for key, value in data if key == 'node' and value['@id'] == node_ids[1])
+    assert node['@version'] == 2
+    assert node['@lon'] == 5.5575
+    relation = next(value for key, value in data if key == 'relation' and value['@id'] == relation_id)
+    assert relation['@version'] == 2
+    assert [member['@role'] for member in relation['member']] == ['inner', 'after']
@@ -54,3 +54,24 @@ async def test_note_crud(client: AsyncClient):
     assert comments[-1]['user'] == 'user1'
     assert comments[-1]['action'] == 'closed'
     assert comments[-1]['text'] == 'resolve'
+
+
+async def test_note_search_phrase(client: AsyncClient):
+    client.headers['Authorization'] = 'User user1'
+
+    # create note
+    r = await client.post(
+        '/api/0.6/notes.json',
+        json={'lon': 0, 'lat': 0, 'text': f'{test_note_search_phrase.__name__} with a Phrase'},
+    )
+    assert r.is_success, r.text
+    note_id: int = r.json()['properties']['id']
+
+    # search note
+    r = await client.get('/api/0.6/notes/search.json', params={'q': 'with a phrase'})
+    assert r.is_success, r.text
+    assert any(feature['properties']['id'] == note_id for feature in r.json()['features'])
+
+    r = await client.get('/api/0.6/notes/search.json', params={'q': 'phrase with a'})
+    assert r.is_success, r.text
+    assert all(feature['properties']['id'] != note_id for feature in r.json()['features'])
@@ -0,0 +1,27 @@
+import pytest
+
+from app.exceptions.api_error import APIError
+from app.exceptions06 import Exceptions06
+from app.format import Format06
+from app.lib.exceptions_context import exceptions_context
+
+
+def test_decode_osmchange_stream():
+    elements = Format06.decode_osmchange_stream(
+        b'<osmChange version="0.6"><create><node id="-1" lat="1" lon="2"/></create></osmChange>',
+        changeset_id=1,
+    )
+    assert len(elements) == 1
+    assert elements[0].type == 'node'
+    assert elements[0].id == -1
+
+
+def test_decode_osmchange_stream_no_changes():
+    assert Format06.decode_osmchange_stream(b'<osmChange version="0.6"/>', changeset_id=1) == []
+
+
+@pytest.mark.parametrize('xml', [b'<osmChange/>', b'<osm version="0.6"/>'])
+def test_decode_osmchange_stream_bad_xml(xml: bytes):
+    with exceptions_context(Exceptions06()), pytest.raises(APIError) as e:
+        Format06.decode_osmchange_stream(xml, changeset_id=1)
+    assert e.value.status_code == 400
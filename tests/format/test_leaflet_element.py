@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from shapely import Point, lib
+
+from app.format import FormatLeaflet
+from app.format.leaflet_element import _is_way_area
+from app.models.db.element import Element
+from app.models.db.element_member import ElementMember
+from app.models.element import ElementId
+from app.models.leaflet import ElementLeaflet, ElementLeafletNode, ElementLeafletWay
+
+
+def _node(id: int, point: Point | None, tags: dict[str, str] | None = None) -> Element:
+    return Element(
+        changeset_id=1,
+        type='node',
+        id=ElementId(id),
+        version=1,
+        visible=point is not None,
+        tags=tags or {},
+        point=point,
+        members=[],
+    )
+
+
+def _way(id: int, node_ids: list[int], tags: dict[str, str] | None = None) -> Element:
+    return Element(
+        changeset_id=1,
+        type='way',
+        id=ElementId(id),
+        version=1,
+        visible=True,
+        tags=tags or {},
+        point=None,
+        members=[ElementMember(order=i, type='node', id=ElementId(n), role='') for i, n in enumerate(node_ids)],
+    )
+
+
+def _encode_reference(elements: list[Element], *, detailed: bool, areas: bool) -> list[ElementLeaflet]:
+    """
+    The per-way loop encoder, replaced by the columnar implementation.
+    """
+    nodes = {e.id: e for e in elements if e.type == 'node'}
+    ways = {e.id: e for e in elements if e.type == 'way'}
+    way_nodes_ids = {member.id for way in ways.values() for member in way.members}  # pyright: ignore[reportOptionalIterable]
+    result: list[ElementLeaflet] = []
+
+    def coords(points: list[Point]) -> list[list[float]]:
+        return np.fliplr(lib.get_coordinates(np.asarray(points, dtype=object), False, False)).tolist()
+
+    for way in ways.values():
+        segment: list[Point] = []
+        segments = [segment]
+        for member in way.members:  # pyright: ignore[reportOptionalIterable]
+            node = nodes.get(member.id)
+            if node is None:
+                if segment:
+                    segment = []
+                    segments.append(segment)
+                continue
+            if node.point is not None:
+                segment.append(node.point)
+
+        is_area = _is_way_area(way.tags, way.members) if areas and len(segments) == 1 else False  # pyright: ignore[reportArgumentType]
+        result.extend(ElementLeafletWay('way', way.id, coords(s), is_area) for s in segments if s)
+
+    for node in nodes.values():
+        if node.point is None:
+            continue
+        is_member = node.id in way_nodes_ids
+        if (not is_member) or (detailed and node.tags):
+            result.append(ElementLeafletNode('node', node.id, coords([node.point])[0]))
+    return result
+
+
+_area_tags = {'building': 'yes'}
+_cases = {
+    'empty': [],
+    'nodes_only': [_node(1, Point(1, 2)), _node(2, None), _node(3, Point(3, 4), {'name': 'a'})],
+    'gaps': [
+        _node(1, Point(0, 0)),
+        _node(2, Point(1, 1)),
+        _node(3, Point(2, 2)),
+        _way(1, [99, 1, 2, 98, 97, 3, 96]),
+    ],
+    'pointless_nodes': [
+        _node(1, Point(0, 0)),
+        _node(2, None),
+        _node(3, Point(2, 2), {'name': 'a'}),
+        _way(1, [1, 2, 3]),
+        _way(2, [2]),
+    ],
+    'empty_ways': [_node(1, Point(0, 0)), _way(1, []), _way(2, [98, 99]), _way(3, [1])],
+    'areas': [
+        _node(1, Point(0, 0)),
+        _node(2, Point(1, 0)),
+        _node(3, Point(1, 1), {'name': 'a'}),
+        _way(1, [1, 2, 3, 1], _area_tags),
+        _way(2, [1, 2, 99, 3, 1], _area_tags),
+        _way(3, [1, 2, 3, 1, 99], _area_tags),
+        _way(4, [1, 2, 3, 1]),
+        _way(5, [1, 2, 3, 1], {'area:highway': 'yes'}),
+        _way(6, [1, 3, 1], _area_tags),
+    ],
+    'duplicates': [
+        _node(1, Point(0, 0)),
+        _node(2, Point(1, 1)),
+        _way(1, [1, 2]),
+        _node(1, Point(5, 5)),
+        _way(1, [2, 1, 2]),
+    ],
+}
+
+
+@pytest.mark.parametrize('name', _cases)
+@pytest.mark.parametrize('detailed', [False, True])
+@pytest.mark.parametrize('areas', [False, True])
+def test_encode_elements_reference(name: str, detailed: bool, areas: bool):
+    elements = _cases[name]
+    expected = _encode_reference(elements, detailed=detailed, areas=areas)
+    assert FormatLeaflet.encode_elements(elements, detailed=detailed, areas=areas) == expected
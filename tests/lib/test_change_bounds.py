@@ -1,7 +1,9 @@
-from shapely import Point, box
+import numpy as np
+import pytest
+from shapely import Point, box, points
 
 from app.lib.change_bounds import change_bounds
-from app.limits import CHANGESET_NEW_BBOX_MIN_DISTANCE, CHANGESET_NEW_BBOX_MIN_RATIO
+from app.limits import CHANGESET_BBOX_LIMIT, CHANGESET_NEW_BBOX_MIN_DISTANCE, CHANGESET_NEW_BBOX_MIN_RATIO
 from app.models.db.changeset_bounds import ChangesetBounds
 
 
@@ -82,3 +84,45 @@ def test_change_bounds_late_separate():
     assert len(new_bounds) == 2
     assert any(cb.bounds.bounds == (-1, -1, 0, 0) for cb in new_bounds)
     assert any(cb.bounds.bounds == (x, x, x, x) for cb in new_bounds)
+
+
+def test_change_bounds_limit():
+    x = CHANGESET_NEW_BBOX_MIN_DISTANCE * 10
+    points = tuple(Point(i * x, (i % 7) * x) for i in range(CHANGESET_BBOX_LIMIT * 5))
+    new_bounds = change_bounds((), points)
+    assert len(new_bounds) <= CHANGESET_BBOX_LIMIT
+    assert all(any(cb.bounds.covers(p) for cb in new_bounds) for p in points)
+
+
+def test_change_bounds_limit_collinear():
+    x = CHANGESET_NEW_BBOX_MIN_DISTANCE * 40
+    # zero-area merges must not win over the nearby cell
+    new_bounds = change_bounds(
+        (),
+        (
+            *(Point(i * x, (i % 2) * x) for i in range(CHANGESET_BBOX_LIMIT)),
+            Point((CHANGESET_BBOX_LIMIT - 1) * x + 1, x),
+        ),
+    )
+    assert len(new_bounds) == CHANGESET_BBOX_LIMIT
+    assert all(cb.bounds.bounds[2] - cb.bounds.bounds[0] <= 1 for cb in new_bounds)
+
+
+@pytest.mark.parametrize(
+    ('seed', 'expected_area'),
+    [
+        # total area of the previous (agglomerative clustering) implementation
+        (47, 8.205861343208227),
+        (94, 52.03537999442834),
+        (213, 48.2971292232641),
+    ],
+)
+def test_change_bounds_limit_sparse_clusters(seed, expected_area):
+    rng = np.random.default_rng(seed)
+    num_clusters = int(rng.integers(11, 21))
+    centers = np.column_stack((rng.uniform(-170, 170, num_clusters), rng.uniform(-80, 80, num_clusters)))
+    coords = np.concatenate([c + rng.normal(0, 0.05, (int(rng.integers(1, 30)), 2)) for c in centers])
+    rng.shuffle(coords)
+    new_bounds = change_bounds((), points(coords).tolist())
+    assert len(new_bounds) <= CHANGESET_BBOX_LIMIT
+    assert sum(cb.bounds.area for cb in new_bounds) <= expected_area * (1 + 1e-9)
@@ -1,7 +1,8 @@
 import asyncio
 from datetime import timedelta
 
-from app.lib.file_cache import FileCache
+from app.lib.file_cache import FileCache, _caches
+from app.limits import FILE_CACHE_ACCESS_UPDATE_INTERVAL
 
 
 async def test_file_cache():
@@ -17,3 +18,49 @@ async def test_file_cache_expire():
     await cache.set('key', b'value', ttl=timedelta())
     await asyncio.sleep(1)
     assert await cache.get('key') is None
+
+
+async def test_file_cache_cleanup(tmp_path):
+    cache = FileCache('test', cache_dir=tmp_path, max_size=100)
+    await cache.set('expired', b'value', ttl=timedelta())
+    await cache.set('old', b'x' * 60, ttl=None)
+    await cache.set('new', b'x' * 30, ttl=None)
+    await asyncio.sleep(1)
+    await cache.set('newest', b'x' * 30, ttl=None)
+    await cache.cleanup()
+    assert await cache.get('expired') is None
+    assert await cache.get('old') is None
+    assert await cache.get('new') is not None
+    assert await cache.get('newest') is not None
+
+
+def test_file_cache_touch_throttle(tmp_path):
+    index = FileCache('test', cache_dir=tmp_path)._index  # noqa: SLF001
+    interval = FILE_CACHE_ACCESS_UPDATE_INTERVAL.total_seconds()
+    assert index.should_touch('name', 0)
+    assert not index.should_touch('name', interval / 2)
+    assert index.should_touch('name', interval * 2)
+    assert index.should_touch('other', interval * 2)
+
+
+def test_file_cache_cleanup_settings(tmp_path):
+    cache = FileCache('test', cache_dir=tmp_path, max_size=100)
+    assert _caches[tmp_path.joinpath('test')] is cache
+
+
+async def test_file_cache_cleanup_failed_index_write(tmp_path):
+    cache = FileCache('test', cache_dir=tmp_path, max_size=100)
+    await cache.cleanup()
+    index = cache._index  # noqa: SLF001
+    assert index.is_complete()
+
+    conn = index._conn  # noqa: SLF001
+    conn.execute("CREATE TEMP TRIGGER entry_fail BEFORE INSERT ON entry BEGIN SELECT RAISE(ABORT, 'test'); END")
+    await cache.set('unindexed', b'x' * 200, ttl=None)
+    conn.execute('DROP TRIGGER entry_fail')
+    assert not index.is_complete()
+
+    # the next cleanup rebuilds the index and enforces the size limit
+    await cache.cleanup()
+    assert index.is_complete()
+    assert await cache.get('unindexed') is None
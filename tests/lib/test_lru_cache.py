@@ -1,4 +1,4 @@
-from app.lib.lru_cache import LRUCache
+from app.lib.lru_cache import LRUCache, SizedLRUCache
 
 
 def test_lru_cache_maxsize():
@@ -31,3 +31,38 @@ def test_lru_cache_move_to_end():
     assert cache.get('2') == 2
     assert cache.get('3') is None
     assert cache.get('4') == 4
+
+
+def test_sized_lru_cache_maxsize():
+    cache: SizedLRUCache[str] = SizedLRUCache(4)
+    cache.set('1', b'11', 60)
+    cache.set('2', b'22', 60)
+    assert cache.size == 4
+    cache.get('1')
+    cache.set('3', b'3', 60)
+    assert cache.get('1') == b'11'
+    assert cache.get('2') is None
+    assert cache.get('3') == b'3'
+    assert cache.size == 3
+
+    cache.set('4', b'too large', 60)
+    assert cache.get('4') is None
+    assert cache.size == 3
+
+
+def test_sized_lru_cache_expire():
+    cache: SizedLRUCache[str] = SizedLRUCache(4)
+    cache.set('1', b'1', 0)
+    assert cache.get('1') is None
+    assert cache.size == 0
+    assert not cache
+
+
+def test_lru_cache_update_pop():
+    cache: LRUCache[str, int] = LRUCache(2)
+    cache['1'] = 1
+    cache['1'] = 2
+    assert cache.get('1') == 2
+    assert cache.pop('1') == 2
+    assert cache.get('1') is None
+    assert len(cache) == 0
@@ -1,35 +1,66 @@
+from asyncio import create_task, gather, sleep
+from threading import Event
+
+import pytest
 from pydantic import SecretStr
 
-from app.lib.password_hash import PasswordHash
+from app.exceptions.api_error import APIError
+from app.exceptions06 import Exceptions06
+from app.lib.exceptions_context import exceptions_context
+from app.lib.password_hash import PasswordHash, _run
+from app.limits import PASSWORD_HASH_QUEUE_LIMIT
 from app.models.types import PasswordType
 
 
-def test_password_hash_current():
+async def test_password_hash_current():
     password = PasswordType(SecretStr('password'))
-    hashed = PasswordHash.hash(password)
-    verified = PasswordHash.verify(hashed, password)
+    hashed = await PasswordHash.hash(password)
+    verified = await PasswordHash.verify(hashed, password)
     assert verified.success
     assert not verified.rehash_needed
 
 
-def test_password_hash_argon():
+async def test_password_hash_argon():
     password = PasswordType(SecretStr('password'))
     hashed = '$argon2id$v=19$m=65536,t=3,p=4$7kKuyNHOoa7+DuH9fNie9A$HeP8nKGegW/SZpf6kxiAPJvFZ0bVIYEzeZwZe3sbjkQ'
-    assert PasswordHash.verify(hashed, password).success
+    assert (await PasswordHash.verify(hashed, password)).success
 
 
-def test_password_hash_md5():
+async def test_password_hash_md5():
     password = PasswordType(SecretStr('password'))
     hashed = '67a1e09bb1f83f5007dc119c14d663aa.salt'
-    verified = PasswordHash.verify(hashed, password)
+    verified = await PasswordHash.verify(hashed, password)
     assert verified.success
     assert verified.rehash_needed
 
 
-def test_password_hash_invalid():
+async def test_password_hash_invalid():
     password1 = PasswordType(SecretStr('password1'))
     password2 = PasswordType(SecretStr('password2'))
-    hashed = PasswordHash.hash(password1)
-    verified = PasswordHash.verify(hashed, password2)
+    hashed = await PasswordHash.hash(password1)
+    verified = await PasswordHash.verify(hashed, password2)
     assert not verified.success
     assert not verified.rehash_needed
+
+
+async def test_password_hash_verify_concurrent():
+    password = PasswordType(SecretStr('password'))
+    hashed = await PasswordHash.hash(password)
+    results = await gather(*(PasswordHash.verify(hashed, password) for _ in range(10)))
+    assert all(verified.success for verified in results)
+    assert PasswordHash.get_queue_depth() == 0
+
+
+async def test_password_hash_queue_full():
+    event = Event()
+    tasks = [create_task(_run(event.wait)) for _ in range(PASSWORD_HASH_QUEUE_LIMIT)]
+    await sleep(0)
+    assert PasswordHash.get_queue_depth() == PASSWORD_HASH_QUEUE_LIMIT
+    try:
+        with exceptions_context(Exceptions06()), pytest.raises(APIError) as e:
+            await PasswordHash.hash(PasswordType(SecretStr('password')))
+        assert e.value.status_code == 429
+    finally:
+        event.set()
+        await gather(*tasks)
+    assert PasswordHash.get_queue_depth() == 0
@@ -0,0 +1,41 @@
+from httpx import ASGITransport
+from shapely import Point
+from sqlalchemy import select
+
+from app.db import db, db_commit
+from app.lib.buffered_random import buffered_randbytes
+from app.lib.crypto import hash_bytes
+from app.lib.rich_text import TextFormat, process_rich_text, resolve_rich_text_many
+from app.models.db.note import Note
+from app.models.db.note_comment import NoteComment, NoteEvent
+
+
+async def test_resolve_rich_text_many(transport: ASGITransport):
+    bodies = tuple(f'https://example.com/{buffered_randbytes(8).hex()}' for _ in range(3))
+    async with db_commit() as session:
+        note = Note(point=Point(0, 0))
+        session.add(note)
+        await session.flush()
+        comments = [
+            NoteComment(user_id=None, user_ip=None, note_id=note.id, event=NoteEvent.commented, body=body)
+            for body in bodies
+        ]
+        session.add_all(comments)
+
+    # cache miss, the hashes are stored
+    await resolve_rich_text_many(comments)
+    for comment, body in zip(comments, bodies, strict=True):
+        assert comment.body_rich == process_rich_text(body, TextFormat.plain)
+        assert comment.body_rich_hash == hash_bytes(body)
+
+    async with db() as session:
+        stmt = select(NoteComment).where(NoteComment.id.in_(comment.id for comment in comments))
+        comments_selected = (await session.scalars(stmt)).all()
+
+    assert {comment.body_rich_hash for comment in comments_selected} == {hash_bytes(body) for body in bodies}
+
+    # cache hit by the stored hash
+    await resolve_rich_text_many(comments_selected)
+    for comment in comments_selected:
+        assert comment.body_rich == process_rich_text(comment.body, TextFormat.plain)
+        assert comment.body_rich_hash == hash_bytes(comment.body)
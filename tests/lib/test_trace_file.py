@@ -6,3 +6,33 @@ def test_trace_file_compression():
     file_id = 'test' + suffix
     assert TraceFile.decompress_if_needed(compressed, file_id) == b'hello'
     assert TraceFile.decompress_if_needed(compressed, '') != b'hello'
+
+
+def test_trace_file_recompression():
+    buffer = b'<gpx>' + b'<trkpt lat="0" lon="0"/>' * 1000 + b'</gpx>'
+    compressed, suffix = TraceFile.compress(buffer)
+    file_id = 'test' + suffix
+    recompressed, suffix = TraceFile.recompress(compressed, file_id)  # pyright: ignore[reportGeneralTypeIssues]
+    assert TraceFile.decompress_if_needed(recompressed, 'test' + suffix) == buffer
+
+
+async def test_trace_file_recompression_dictionary():
+    samples = [b'<gpx>' + f'<trkpt lat="{i}" lon="{i}"/>'.encode() * 100 + b'</gpx>' for i in range(100)]
+    dict_id = await TraceFile.train_dictionary(samples)
+    dict_data = await TraceFile.load_dictionary(dict_id)
+
+    buffer = samples[0]
+    compressed, suffix = TraceFile.compress(buffer)
+    file_id = 'test' + suffix
+    recompressed, suffix = TraceFile.recompress(compressed, file_id, dict_data=dict_data)  # pyright: ignore[reportGeneralTypeIssues]
+    file_id = 'test' + suffix
+
+    # the dictionary is resolved from the frame header
+    source_dict = await TraceFile.get_dictionary(recompressed, file_id)
+    assert source_dict is not None
+    assert source_dict.dict_id() == dict_id
+    assert TraceFile.decompress_if_needed(recompressed, file_id, source_dict) == buffer
+
+    # a newer dictionary does not replace the older one
+    await TraceFile.train_dictionary(samples)
+    assert (await TraceFile.load_dictionary(dict_id)).dict_id() == dict_id
@@ -0,0 +1,26 @@
+import numpy as np
+
+from app.lib.trace_preview import TracePreview
+from app.limits import TRACE_PREVIEW_MAX_POINTS
+
+
+def test_trace_preview_coords():
+    coords = TracePreview.get_coords(np.array([[0, 0], [0, 0], [1, 1]]))
+    expected = np.array([[0, 100], [100, 0]])
+    assert coords.shape == expected.shape
+    assert np.isclose(coords, expected, atol=1).all()
+
+
+def test_trace_preview_coords_max_points():
+    coords = np.column_stack((np.linspace(0, 1, 1000), np.zeros(1000)))
+    assert len(TracePreview.get_coords(coords)) == TRACE_PREVIEW_MAX_POINTS
+
+
+def test_trace_preview_coords_single():
+    assert not TracePreview.get_coords(np.array([[1, 1]])).size
+
+
+def test_trace_preview_encode_decode():
+    coords = np.column_stack((np.linspace(0, 1, 10), np.linspace(0, 1, 10)))
+    expected = TracePreview.get_coords(coords).flatten().tolist()
+    assert TracePreview.decode(TracePreview.encode(coords)) == expected
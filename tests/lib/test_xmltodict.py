@@ -124,3 +124,46 @@ def test_xml_unparse_empty():
     unparsed = XMLToDict.unparse({'root': []})
     expected = "<?xml version='1.0' encoding='UTF-8'?>\n<root/>"
     assert unparsed == expected
+
+
+@pytest.mark.parametrize(
+    ('input', 'expected'),
+    [
+        (
+            {'osm': {'@version': '0.6', 'node': iter(({'@id': 1}, {'@id': 2, 'tag': [{'@k': 'k', '@v': 'ąę'}]}))}},
+            {'osm': {'@version': '0.6', 'node': [{'@id': 1}, {'@id': 2, 'tag': [{'@k': 'k', '@v': 'ąę'}]}]}},
+        ),
+        (
+            {'osm': {'@version': '0.6', 'bounds': {'@minlon': 1}, 'way': iter(({'@id': 1, 'nd': [{'@ref': 1}]},))}},
+            {'osm': {'@version': '0.6', 'bounds': {'@minlon': 1}, 'way': [{'@id': 1, 'nd': [{'@ref': 1}]}]}},
+        ),
+        (
+            {
+                'osmChange': iter(
+                    (('@version', '0.6'), ('create', {'node': {'@id': 1}}), ('delete', {'way': {'@id': 2}}))
+                )
+            },
+            {'osmChange': (('@version', '0.6'), ('create', {'node': {'@id': 1}}), ('delete', {'way': {'@id': 2}}))},
+        ),
+        (
+            {'osm': {'@version': '0.6', 'node': iter(())}},
+            {'osm': {'@version': '0.6', 'node': []}},
+        ),
+        (
+            {'root': []},
+            {'root': []},
+        ),
+    ],
+)
+def test_xml_unparse_stream(input, expected):
+    assert b''.join(XMLToDict.unparse_stream(input)) == XMLToDict.unparse(expected, raw=True)
+
+
+def test_xml_parse_stream():
+    input = b'<osmChange><delete if-unused="1"><node id="1"/><way id="2"><nd ref="1"/></way></delete></osmChange>'
+    assert list(XMLToDict.parse_stream(input, depth=2)) == [
+        (0, 'osmChange', {}),
+        (1, 'delete', {'@if-unused': '1'}),
+        (2, 'node', {'@id': 1}),
+        (2, 'way', {'@id': 2, 'nd': [{'@ref': 1}]}),
+    ]
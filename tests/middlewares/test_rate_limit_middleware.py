@@ -0,0 +1,85 @@
+import asyncio
+from math import isclose
+
+import pytest
+from fastapi import HTTPException
+from httpx import ASGITransport
+
+from app.db import valkey
+from app.lib.buffered_random import buffered_randbytes
+from app.middlewares.rate_limit_middleware import _increase_counter
+
+
+def _remaining(headers: dict[str, str]) -> int:
+    return int(headers['RateLimit'].split('remaining=')[1].split(',')[0])
+
+
+async def test_rate_limit_tolerance(transport: ASGITransport):
+    key = f'RateLimit:test:{buffered_randbytes(16).hex()}'
+    quota = 10_000  # tolerance of 100 tokens
+
+    # the first request is always synced
+    await _increase_counter(key, 1, quota, raise_on_limit=True)
+
+    # the consumption below the tolerance is aggregated locally
+    for _ in range(50):
+        headers = await _increase_counter(key, 1, quota, raise_on_limit=True)
+    assert _remaining(headers) == 9949
+    async with valkey() as conn:
+        assert isclose(float(await conn.hget(key, 'tokens')), 9999, abs_tol=5)
+
+    # exceeding the tolerance syncs the aggregated consumption
+    await _increase_counter(key, 100, quota, raise_on_limit=True)
+    async with valkey() as conn:
+        assert isclose(float(await conn.hget(key, 'tokens')), 9849, abs_tol=5)
+
+
+async def test_rate_limit_exceeded(transport: ASGITransport):
+    key = f'RateLimit:test:{buffered_randbytes(16).hex()}'
+    quota = 10
+
+    for i in range(quota):
+        headers = await _increase_counter(key, 1, quota, raise_on_limit=True)
+        assert _remaining(headers) == quota - i - 1
+
+    with pytest.raises(HTTPException) as e:
+        await _increase_counter(key, 1, quota, raise_on_limit=True)
+    assert e.value.status_code == 429
+    assert e.value.headers is not None
+    assert int(e.value.headers['Retry-After']) > 0
+
+    # the weight overrides never raise
+    headers = await _increase_counter(key, 1, quota, raise_on_limit=False)
+    assert _remaining(headers) == 0
+
+
+async def test_rate_limit_refill(transport: ASGITransport):
+    key = f'RateLimit:test:{buffered_randbytes(16).hex()}'
+    quota = 3600  # refills 1 token per second
+
+    await _increase_counter(key, quota, quota, raise_on_limit=True)
+    with pytest.raises(HTTPException):
+        await _increase_counter(key, 1, quota, raise_on_limit=True)
+
+    await asyncio.sleep(2.5)
+    await _increase_counter(key, 1, quota, raise_on_limit=True)
+
+
+async def test_rate_limit_retry_recovers(transport: ASGITransport):
+    key = f'RateLimit:test:{buffered_randbytes(16).hex()}'
+    quota = 3600  # refills 1 token per second
+
+    await _increase_counter(key, quota, quota, raise_on_limit=True)
+
+    # retrying faster than the refill rate must not extend the limit
+    for _ in range(20):
+        try:
+            await _increase_counter(key, 1, quota, raise_on_limit=True)
+            break
+        except HTTPException:
+            await asyncio.sleep(0.25)
+    else:
+        pytest.fail('Rate limit did not recover while retrying')
+
+    async with valkey() as conn:
+        assert float(await conn.hget(key, 'tokens')) >= 0
@@ -0,0 +1,18 @@
+from httpx import AsyncClient
+
+from app.lib.xmltodict import XMLToDict
+
+
+async def test_runtime_server_timing(client: AsyncClient, changeset_id: int):
+    client.headers['Authorization'] = 'User user1'
+
+    r = await client.put(
+        '/api/0.6/node/create',
+        content=XMLToDict.unparse({'osm': {'node': {'@changeset': changeset_id, '@lon': 1, '@lat': 2}}}),
+    )
+    assert r.is_success, r.text
+    assert float(r.headers['X-Runtime']) > 0
+
+    timings = dict(entry.split(';dur=') for entry in r.headers['Server-Timing'].split(', '))
+    assert set(timings) == {'refs_lock', 'sequence_lock'}
+    assert all(float(duration) >= 0 for duration in timings.values())
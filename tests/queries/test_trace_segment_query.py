@@ -0,0 +1,51 @@
+import numpy as np
+from shapely import MultiPoint
+
+from app.models.db.trace_segment import TraceSegment
+from app.models.trace_point_cursor import TraceSegmentPosition
+from app.queries.trace_segment_query import _paginate
+
+
+def _segments(*keys: tuple[int, int, int]) -> list[TraceSegment]:
+    result: list[TraceSegment] = []
+    for trace_id, track_num, segment_num in keys:
+        segment = TraceSegment(
+            track_num=track_num,
+            segment_num=segment_num,
+            points=MultiPoint(((0, 0),)),
+            capture_times=None,
+            elevations=None,
+        )
+        segment.trace_id = trace_id
+        result.append(segment)
+    return result
+
+
+def test_paginate_page_full():
+    segments = _segments((2, 0, 0), (2, 0, 1), (1, 0, 0))
+    points_segment_indices = np.array([0, 0, 0, 1, 1, 2])
+    intersect_indices = np.arange(10, 16)
+    indices, position = _paginate(segments, points_segment_indices, intersect_indices, None, 4)
+    assert indices.tolist() == [10, 11, 12, 13]
+    # continue at the second point of the second segment
+    assert position == TraceSegmentPosition(trace_id=2, track_num=0, segment_num=1, point_offset=1)
+
+
+def test_paginate_skip_before_position():
+    segments = _segments((2, 0, 1), (1, 0, 0))
+    points_segment_indices = np.array([0, 0, 1])
+    intersect_indices = np.arange(3)
+    position = TraceSegmentPosition(trace_id=2, track_num=0, segment_num=1, point_offset=1)
+    indices, next_position = _paginate(segments, points_segment_indices, intersect_indices, position, 4)
+    assert indices.tolist() == [1, 2]
+    assert next_position is None
+
+
+def test_paginate_more_segments():
+    # the query fetched limit + 1 segments, the page ends after the last point
+    segments = _segments((3, 0, 0), (2, 0, 0), (1, 0, 0))
+    points_segment_indices = np.array([0, 1])
+    intersect_indices = np.array([0, 1])
+    indices, position = _paginate(segments, points_segment_indices, intersect_indices, None, 2)
+    assert indices.tolist() == [0, 1]
+    assert position == TraceSegmentPosition(trace_id=2, track_num=0, segment_num=0, point_offset=1)
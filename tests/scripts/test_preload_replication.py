@@ -0,0 +1,84 @@
+import gzip
+from pathlib import Path
+
+from httpx import ASGITransport
+from sqlalchemy import func, select
+
+from app.db import db_commit
+from app.models.element import ElementId, ElementRef
+from app.queries.element_query import ElementQuery
+from app.queries.user_query import UserQuery
+from app.queries.user_stats_query import UserStatsQuery
+from scripts.preload_replication import apply_batch, parse_changes
+
+
+def _write_change(path: Path, *, user_id: int, changeset_id: int, node_id: int, way_id: int) -> None:
+    common = f'changeset="{changeset_id}" timestamp="2024-01-01T00:00:00Z" user="user1" uid="{user_id}"'
+    path.write_bytes(
+        gzip.compress(
+            f"""<?xml version="1.0" encoding="UTF-8"?>
+<osmChange version="0.6">
+<create>
+<node id="{node_id}" version="1" lat="1.5" lon="2.5" {common}><tag k="amenity" v="bench"/></node>
+<way id="{way_id}" version="1" {common}><nd ref="{node_id}"/><nd ref="{node_id}"/></way>
+</create>
+<delete>
+<node id="{node_id}" version="2" {common}/>
+</delete>
+</osmChange>""".encode()
+        )
+    )
+
+
+def test_parse_changes(tmp_path: Path):
+    path = tmp_path.joinpath('000.osc.gz')
+    _write_change(path, user_id=1, changeset_id=2, node_id=3, way_id=4)
+    node, way, deleted = parse_changes(path)
+
+    assert node.type == 'node'
+    assert node.id == 3
+    assert node.version == 1
+    assert node.visible
+    assert node.tags == {'amenity': 'bench'}
+    assert node.point == 'POINT(2.5 1.5)'
+    assert node.user_id == 1
+    assert node.display_name == 'user1'
+    assert node.changeset_id == 2
+
+    assert way.type == 'way'
+    assert way.members == [('node', 3, ''), ('node', 3, '')]
+    assert way.point is None
+
+    assert not deleted.visible
+    assert deleted.version == 2
+    assert deleted.point is None
+
+
+async def test_apply_batch(transport: ASGITransport, tmp_path: Path):
+    # allocate the ids like the regular inserts, not to shift the ids of the other tests
+    async with db_commit() as session:
+        user_id: int = await session.scalar(select(func.nextval('user_id_seq')))  # pyright: ignore[reportAssignmentType]
+        changeset_id: int = await session.scalar(select(func.nextval('changeset_id_seq')))  # pyright: ignore[reportAssignmentType]
+    current_ids = await ElementQuery.get_current_ids()
+    node_id = current_ids['node'] + 1
+    way_id = current_ids['way'] + 1
+
+    path = tmp_path.joinpath('000.osc.gz')
+    _write_change(path, user_id=user_id, changeset_id=changeset_id, node_id=node_id, way_id=way_id)
+    changes = list(parse_changes(path))
+
+    assert await apply_batch(changes) == 3
+    # the already applied changes are skipped
+    assert await apply_batch(changes) == 0
+
+    elements = await ElementQuery.get_by_refs((ElementRef('node', ElementId(node_id)),), limit=1)
+    assert elements[0].version == 2
+    assert not elements[0].visible
+
+    # the display name is taken by the test user
+    user = await UserQuery.find_one_by_id(user_id)
+    assert user is not None
+    assert user.display_name == f'user1_{user_id}'
+
+    stats = await UserStatsQuery.get_by_user_id(user_id)
+    assert stats.changesets == 1
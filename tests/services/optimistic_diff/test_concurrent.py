@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from shapely import Point
+
+from app.lib.xmltodict import XMLToDict
+from app.models.db.element import Element
+from app.models.element import ElementId, ElementRef
+from app.queries.element_query import ElementQuery
+from app.services.optimistic_diff import OptimisticDiff
+from app.services.optimistic_diff import apply as optimistic_diff_apply
+
+
+async def _create_changeset(client: AsyncClient) -> int:
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse({'osm': {'changeset': {'tag': [{'@k': 'created_by', '@v': 'tests'}]}}}),
+    )
+    assert r.is_success, r.text
+    return int(r.text)
+
+
+def _modify_nodes(changeset_id: int, node_ids: list[ElementId]) -> list[Element]:
+    return [
+        Element(
+            changeset_id=changeset_id,
+            type='node',
+            id=node_id,
+            version=2,
+            visible=True,
+            tags={'modified': 'yes'},
+            point=Point(1, 1),
+            members=[],
+        )
+        for node_id in node_ids
+    ]
+
+
+async def test_concurrent_large_and_small(client: AsyncClient, changeset_id: int, monkeypatch: pytest.MonkeyPatch):
+    num_large = 1000
+    num_small = 8
+    elements = [
+        Element(
+            changeset_id=changeset_id,
+            type='node',
+            id=ElementId(-i),
+            version=1,
+            visible=True,
+            tags={},
+            point=Point(0, 0),
+            members=[],
+        )
+        for i in range(1, num_large + num_small + 1)
+    ]
+    assigned_ref_map = await OptimisticDiff.run(elements)
+    node_ids = [assigned_ref_map[ElementRef('node', ElementId(-i))][0].id for i in range(1, num_large + num_small + 1)]
+    large_node_ids, small_node_ids = node_ids[:num_large], node_ids[num_large:]
+
+    # pause the large diff while it holds its locks
+    paused = asyncio.Event()
+    resume = asyncio.Event()
+    allocate = optimistic_diff_apply._allocate  # noqa: SLF001
+
+    async def allocate_paused(session, num_sequence_ids, num_ids):
+        if num_sequence_ids == num_large:
+            paused.set()
+            await resume.wait()
+        return await allocate(session, num_sequence_ids, num_ids)
+
+    monkeypatch.setattr(optimistic_diff_apply, '_allocate', allocate_paused)
+
+    large_changeset_id = await _create_changeset(client)
+    large_task = asyncio.create_task(OptimisticDiff.run(_modify_nodes(large_changeset_id, large_node_ids)))
+    await asyncio.wait_for(paused.wait(), 30)
+
+    # the small disjoint diffs must not wait for the large one
+    small_changeset_ids = [await _create_changeset(client) for _ in range(num_small)]
+    small_results = await asyncio.wait_for(
+        asyncio.gather(
+            *(
+                OptimisticDiff.run(_modify_nodes(small_changeset_id, [node_id]))
+                for small_changeset_id, node_id in zip(small_changeset_ids, small_node_ids, strict=True)
+            )
+        ),
+        30,
+    )
+    assert not large_task.done()
+
+    resume.set()
+    large_result = await large_task
+
+    # the large diff was allocated last, and all the modifications are applied
+    small_sequence_ids = [e.sequence_id for result in small_results for elements in result.values() for e in elements]
+    large_sequence_ids = [e.sequence_id for elements in large_result.values() for e in elements]
+    assert max(small_sequence_ids) < min(large_sequence_ids)
+
+    elements = await ElementQuery.get_by_refs(
+        [ElementRef('node', node_id) for node_id in node_ids],
+        limit=len(node_ids),
+    )
+    assert len(elements) == len(node_ids)
+    assert all(element.version == 2 for element in elements)
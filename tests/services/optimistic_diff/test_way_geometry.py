@@ -0,0 +1,124 @@
+from shapely import LineString, Point
+from sqlalchemy import null, update
+
+from app.db import db_commit
+from app.models.db.element import Element
+from app.models.db.element_member import ElementMember
+from app.models.element import ElementId, ElementRef
+from app.queries.element_query import ElementQuery
+from app.queries.way_geometry_query import WayGeometryQuery
+from app.services.optimistic_diff import OptimisticDiff
+from app.services.way_geometry_service import WayGeometryService
+
+
+async def test_way_geometry_node_move(changeset_id: int):
+    elements = (
+        Element(
+            changeset_id=changeset_id,
+            type='node',
+            id=ElementId(-1),
+            version=1,
+            visible=True,
+            tags={},
+            point=Point(0, 0),
+            members=[],
+        ),
+        Element(
+            changeset_id=changeset_id,
+            type='node',
+            id=ElementId(-2),
+            version=1,
+            visible=True,
+            tags={},
+            point=Point(1, 1),
+            members=[],
+        ),
+        Element(
+            changeset_id=changeset_id,
+            type='way',
+            id=ElementId(-1),
+            version=1,
+            visible=True,
+            tags={},
+            point=None,
+            members=[
+                ElementMember(order=0, type='node', id=ElementId(-1), role=''),
+                ElementMember(order=1, type='node', id=ElementId(-2), role=''),
+            ],
+        ),
+    )
+
+    assigned_ref_map = await OptimisticDiff.run(elements)
+    node_id = assigned_ref_map[ElementRef('node', ElementId(-1))][0].id
+    way_id = assigned_ref_map[ElementRef('way', ElementId(-1))][0].id
+
+    at_sequence_id = await ElementQuery.get_current_sequence_id()
+    way_geometries = await WayGeometryQuery.get_by_ids((way_id,), at_sequence_id=at_sequence_id)
+    assert way_geometries[way_id].equals(LineString(((0, 0), (1, 1))))
+
+    # moving the node must update the parent way geometry
+    element = Element(
+        changeset_id=changeset_id,
+        type='node',
+        id=node_id,
+        version=2,
+        visible=True,
+        tags={},
+        point=Point(2, 2),
+        members=[],
+    )
+    await OptimisticDiff.run((element,))
+
+    # the previous snapshot must not see the new geometry
+    assert not await WayGeometryQuery.get_by_ids((way_id,), at_sequence_id=at_sequence_id)
+
+    at_sequence_id = await ElementQuery.get_current_sequence_id()
+    way_geometries = await WayGeometryQuery.get_by_ids((way_id,), at_sequence_id=at_sequence_id)
+    assert way_geometries[way_id].equals(LineString(((2, 2), (1, 1))))
+
+
+async def test_way_geometry_skip_gaps(changeset_id: int):
+    elements = [
+        Element(
+            changeset_id=changeset_id,
+            type='node',
+            id=ElementId(-i),
+            version=1,
+            visible=True,
+            tags={},
+            point=Point(i, i),
+            members=[],
+        )
+        for i in range(1, 4)
+    ]
+    elements.append(
+        Element(
+            changeset_id=changeset_id,
+            type='way',
+            id=ElementId(-1),
+            version=1,
+            visible=True,
+            tags={},
+            point=None,
+            members=[ElementMember(order=i, type='node', id=ElementId(-i - 1), role='') for i in range(3)],
+        )
+    )
+
+    assigned_ref_map = await OptimisticDiff.run(elements)
+    node_id = assigned_ref_map[ElementRef('node', ElementId(-2))][0].id
+    way_id = assigned_ref_map[ElementRef('way', ElementId(-1))][0].id
+
+    at_sequence_id = await ElementQuery.get_current_sequence_id()
+    assert way_id in await WayGeometryQuery.get_by_ids((way_id,), at_sequence_id=at_sequence_id)
+
+    # a point-less middle node must not be bridged over, the way is left to the leaflet encoder
+    async with db_commit() as session:
+        stmt = (
+            update(Element)
+            .where(Element.type == 'node', Element.id == node_id, Element.next_sequence_id == null())
+            .values({Element.point: None})
+        )
+        await session.execute(stmt)
+        await WayGeometryService.update(session, way_ids=(way_id,), node_ids=(), sequence_id=at_sequence_id)
+
+    assert not await WayGeometryQuery.get_by_ids((way_id,), at_sequence_id=at_sequence_id)
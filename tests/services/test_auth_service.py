@@ -0,0 +1,23 @@
+from httpx import ASGITransport
+
+from app.lib.auth_context import auth_context
+from app.queries.user_query import UserQuery
+from app.services.auth_service import AuthService
+from app.services.oauth2_token_service import OAuth2TokenService
+from app.services.system_app_service import SystemAppService
+
+
+async def test_authenticate_oauth2_cache_revoke(transport: ASGITransport):
+    user = await UserQuery.find_one_by_display_name('user1')
+    assert user is not None
+    access_token = await SystemAppService.create_access_token('SystemApp.web', user_id=user.id)
+
+    token = await AuthService.authenticate_oauth2(access_token)
+    assert token is not None
+    assert token.user.id == user.id
+    assert await AuthService.authenticate_oauth2(access_token) is token
+
+    # revocation must not be served from the cache
+    with auth_context(user, ()):
+        await OAuth2TokenService.revoke_by_access_token(access_token)
+    assert await AuthService.authenticate_oauth2(access_token) is None
@@ -0,0 +1,53 @@
+from asyncio import Event, gather
+from datetime import timedelta
+from time import monotonic
+
+from httpx import ASGITransport
+
+from app.db import valkey
+from app.lib.buffered_random import buffered_randbytes
+from app.services.cache_service import CacheContext, CacheService
+
+_context = CacheContext('Test')
+
+
+async def test_cache_get_coalesced(transport: ASGITransport):
+    key = buffered_randbytes(16).hex()
+    calls = 0
+    event = Event()
+
+    async def factory() -> bytes:
+        nonlocal calls
+        calls += 1
+        await event.wait()
+        return b'value'
+
+    async def release() -> None:
+        event.set()
+
+    results = await gather(
+        *(CacheService.get(key, _context, factory, ttl=timedelta(minutes=1)) for _ in range(10)),
+        release(),
+    )
+    assert calls == 1
+    assert all(entry.value == b'value' for entry in results[:-1])
+
+    # the value is now served from the cache
+    assert (await CacheService.get(key, _context, factory)).value == b'value'
+    assert calls == 1
+
+
+async def test_cache_get_lock_released(transport: ASGITransport):
+    key = buffered_randbytes(16).hex()
+
+    async def factory() -> bytes:
+        return b'value'
+
+    # simulate another process holding the lock and failing to produce the value
+    async with valkey() as conn:
+        await conn.set(f'{_context}:{key.encode().hex()}:lock', b'', px=300)
+
+    ts = monotonic()
+    entry = await CacheService.get(key, _context, factory, ttl=timedelta(minutes=1), lock=True)
+    assert entry.value == b'value'
+    assert 0.3 <= monotonic() - ts < 5
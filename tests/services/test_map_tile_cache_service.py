@@ -0,0 +1,85 @@
+from datetime import UTC, datetime
+
+import pytest
+from httpx import ASGITransport
+from shapely import Point
+
+from app.db import valkey
+from app.models.db.element import Element
+from app.models.db.element_member import ElementMember
+from app.models.element import ElementId
+from app.queries.element_query import ElementQuery
+from app.services.map_tile_cache_service import (
+    MapTileCacheService,
+    _decode_tile,
+    _decode_tile_elements,
+    _encode_tile,
+)
+from app.services.optimistic_diff.apply import _invalidate_map_tiles
+from app.services.optimistic_diff.prepare import OptimisticDiffPrepare
+
+
+def test_map_tile_encode_decode():
+    created_at = datetime(2024, 1, 2, 3, 4, 5, 678901, UTC)
+    node = Element(
+        changeset_id=1,
+        type='node',
+        id=ElementId(1),
+        version=2,
+        visible=True,
+        tags={'name': 'node'},
+        point=Point(1.2345678, 2.3456789),
+        members=(),
+    )
+    way = Element(
+        changeset_id=1,
+        type='way',
+        id=ElementId(2),
+        version=1,
+        visible=True,
+        tags={},
+        point=None,
+        members=[
+            ElementMember(order=0, type='node', id=ElementId(1), role=''),
+            ElementMember(order=1, type='node', id=ElementId(3), role=''),
+        ],
+    )
+    for sequence_id, element in enumerate((node, way), 10):
+        element.sequence_id = sequence_id
+        element.created_at = created_at
+
+    tile = _decode_tile(_encode_tile(9, (node, way)))
+    assert tile.built_at == 9
+
+    decoded_node, decoded_way = _decode_tile_elements(tile)
+    for element, decoded in ((node, decoded_node), (way, decoded_way)):
+        assert decoded.sequence_id == element.sequence_id
+        assert decoded.next_sequence_id is None
+        assert decoded.changeset_id == element.changeset_id
+        assert decoded.type == element.type
+        assert decoded.id == element.id
+        assert decoded.version == element.version
+        assert decoded.visible == element.visible
+        assert decoded.tags == element.tags
+        assert decoded.created_at == created_at
+        assert [(m.order, m.type, m.id, m.role) for m in decoded.members] == [  # pyright: ignore[reportOptionalIterable]
+            (m.order, m.type, m.id, m.role)
+            for m in element.members  # pyright: ignore[reportOptionalIterable]
+        ]
+    assert decoded_node.point == node.point
+    assert decoded_way.point is None
+
+
+async def test_map_tile_invalidate_failure(transport: ASGITransport, monkeypatch: pytest.MonkeyPatch):
+    async def invalidate(*_) -> None:
+        raise ConnectionError
+
+    monkeypatch.setattr(MapTileCacheService, 'invalidate', invalidate)
+    sequence_id = await ElementQuery.get_current_sequence_id()
+    prepare = OptimisticDiffPrepare(())
+    prepare.bbox_points.append(Point(1, 2))
+
+    # all the tiles built before the diff are invalidated instead
+    await _invalidate_map_tiles(prepare, sequence_id)
+    async with valkey() as conn:
+        assert int(await conn.get('MapTileDirty')) >= sequence_id
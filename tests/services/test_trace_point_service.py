@@ -0,0 +1,51 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from time import time
+
+import msgspec
+import pytest
+
+from app.exceptions.api_error import APIError
+from app.exceptions06 import Exceptions06
+from app.lib.exceptions_context import exceptions_context
+from app.models.trace_point_cursor import TracePointCursor, TraceSegmentPosition
+from app.services.trace_point_service import _decode_cursor, _encode_cursor
+
+
+def test_trace_point_cursor_round_trip():
+    state = TracePointCursor(
+        created_at=int(time()),
+        public=TraceSegmentPosition(trace_id=123456, track_num=1, segment_num=2, point_offset=3),
+        private=None,
+    )
+    cursor = _encode_cursor(state)
+    assert _decode_cursor(cursor) == state
+
+    # the trace id must not be readable
+    assert msgspec.msgpack.encode(state) not in urlsafe_b64decode(cursor)
+    assert _encode_cursor(state) != cursor
+
+
+@pytest.mark.parametrize(
+    'cursor',
+    [
+        '',
+        'invalid',
+        urlsafe_b64encode(msgspec.msgpack.encode(TracePointCursor(int(time()), None, None))).decode(),
+    ],
+)
+def test_trace_point_cursor_invalid(cursor: str):
+    with exceptions_context(Exceptions06()), pytest.raises(APIError) as e:
+        _decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def test_trace_point_cursor_tampered():
+    state = TracePointCursor(
+        created_at=int(time()),
+        public=None,
+        private=TraceSegmentPosition(trace_id=1, track_num=0, segment_num=0, point_offset=0),
+    )
+    buffer = bytearray(urlsafe_b64decode(_encode_cursor(state)))
+    buffer[-1] ^= 1
+    with exceptions_context(Exceptions06()), pytest.raises(APIError):
+        _decode_cursor(urlsafe_b64encode(buffer).decode())
@@ -0,0 +1,36 @@
+from app.db import db_commit
+from app.lib.auth_context import auth_user
+from app.lib.date_utils import utcnow
+from app.queries.user_stats_query import UserStatsQuery
+from app.services.changeset_comment_service import ChangesetCommentService
+from app.services.user_stats_service import UserStatsService
+
+
+async def test_user_stats_changeset_comment(changeset_id: int):
+    user_id = auth_user(required=True).id
+    stats = await UserStatsQuery.get_by_user_id(user_id)
+    assert stats.changesets > 0
+
+    await ChangesetCommentService.comment(changeset_id, 'comment')
+    new_stats = await UserStatsQuery.get_by_user_id(user_id)
+    assert new_stats.changeset_comments == stats.changeset_comments + 1
+
+    activity = await UserStatsQuery.get_activity_by_user_id(user_id, utcnow().date())
+    assert activity[utcnow().date()] > 0
+
+
+async def test_user_stats_rebuild(changeset_id: int):
+    user_id = auth_user(required=True).id
+    async with db_commit() as session:
+        await UserStatsService.rebuild(session)
+
+    await ChangesetCommentService.comment(changeset_id, 'comment')
+    stats = await UserStatsQuery.get_by_user_id(user_id)
+
+    async with db_commit() as session:
+        await UserStatsService.rebuild(session)
+
+    # the incremental counters must match the recomputed ones
+    rebuilt_stats = await UserStatsQuery.get_by_user_id(user_id)
+    assert rebuilt_stats.changesets == stats.changesets
+    assert rebuilt_stats.changeset_comments == stats.changeset_comments